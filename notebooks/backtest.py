@@ -0,0 +1,198 @@
+import os
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+import joblib
+
+from ml_pipeline import TARGET, select_model_features
+
+# Confusion counts stored per group and threshold, in this order
+OUTCOMES = ['TP', 'FP', 'FN', 'TN']
+
+DEFAULT_THRESHOLDS = [0.3, 0.4, 0.5, 0.6, 0.7]
+
+
+class ThresholdCounts:
+    """Streaming confusion counts per group (route, airport, day...) at several thresholds.
+
+    Each batch is folded in with a single np.bincount over (group, threshold, outcome), so the
+    accumulator only holds groups x thresholds x 4 integers however many flights it has seen.
+
+    Args:
+        groups (array): Every group value that can occur
+        thresholds (list): Probability thresholds of the delayed class
+    """
+
+    def __init__(self, groups, thresholds):
+        self.groups = pd.Index(groups)
+        self.thresholds = np.asarray(thresholds, dtype=np.float64)
+        self.counts = np.zeros((len(self.groups), len(self.thresholds), len(OUTCOMES)), dtype=np.int64)
+
+    def update(self, codes, y_true, proba):
+        """Fold in a batch of scored flights.
+
+        Args:
+            codes (array): Position of each flight's group in ``groups``
+            y_true (array): True labels (1 is delayed)
+            proba (array): Predicted probability of a delay
+        """
+        predicted = proba[:, None] >= self.thresholds[None, :]
+        delayed = (np.asarray(y_true) == 1)[:, None]
+        # 0 TP, 1 FP, 2 FN, 3 TN
+        outcome = np.where(predicted, np.where(delayed, 0, 1), np.where(delayed, 2, 3))
+        n_thresholds, n_outcomes = self.counts.shape[1:]
+        flat = ((np.asarray(codes)[:, None] * n_thresholds + np.arange(n_thresholds)[None, :]) * n_outcomes
+                + outcome).ravel()
+        self.counts += np.bincount(flat, minlength=self.counts.size).reshape(self.counts.shape)
+
+    def frame(self, name='group'):
+        """Counts, precision and recall per group and threshold (groups without flights are left out).
+
+        Returns:
+            DataFrame: name, 'threshold', 'flights', 'TP', 'FP', 'FN', 'TN', 'precision' and 'recall'
+        """
+        n_groups, n_thresholds = self.counts.shape[:2]
+        result = pd.DataFrame(self.counts.reshape(-1, len(OUTCOMES)), columns=OUTCOMES)
+        result.insert(0, name, np.repeat(np.asarray(self.groups, dtype=object), n_thresholds))
+        result.insert(1, 'threshold', np.tile(self.thresholds, n_groups))
+        result.insert(2, 'flights', result[OUTCOMES].sum(axis=1))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result['precision'] = result['TP'] / (result['TP'] + result['FP'])
+            result['recall'] = result['TP'] / (result['TP'] + result['FN'])
+        return result[result['flights'] > 0].reset_index(drop=True)
+
+
+def backtest_frame(flights_df, metar_cleaned=None, taf_store=None, lead='0h'):
+    """Pre-processed flights with the weather that was available at each scheduled departure.
+
+    With METARs that is the latest report at or before the scheduled departure (as in FIN_6);
+    with a TAF store it is the forecast of the latest TAF issued at least `lead` before it.
+
+    Args:
+        flights_df (DataFrame): Raw FlightAware records
+        metar_cleaned (DataFrame): Output of ``metar_cleaning``
+        taf_store (TafStore): Decoded TAFs (used instead of the METARs when given)
+        lead (str): TAF lead time (see ``taf_store.merge_taf_to_flights``)
+
+    Returns:
+        tuple: (pre-processed DataFrame, Series of departure dates aligned with it)
+    """
+    from preprocessing import prepare_flights, merge_metar_to_flights, preprocess_for_ml
+
+    flights = prepare_flights(flights_df)
+    if taf_store is not None:
+        from taf_store import merge_taf_to_flights
+        merged = merge_taf_to_flights(flights, taf_store, lead=lead)
+    else:
+        merged = merge_metar_to_flights(flights, metar_cleaned)
+    # preprocess_for_ml drops the schedule columns but keeps the rows in order
+    dates = pd.to_datetime(merged['scheduled_out'], utc=True).dt.tz_localize(None).dt.floor('D')
+    return preprocess_for_ml(merged), dates.reset_index(drop=True)
+
+
+def run_backtest(pipeline, df, dates, thresholds=DEFAULT_THRESHOLDS, group_by=('route_code', 'origin.code_icao'),
+                 start=None, end=None, batch_rows=100_000, log=print):
+    """Replay the model day by day over the history and accumulate its precision and recall.
+
+    Days are walked in order; consecutive days are scored together in batches of up to
+    batch_rows flights (one predict_proba call per batch), and every batch is folded into
+    per-group and per-day accumulators. The model is fixed, so train it on flights before
+    `start` for a backtest without look-ahead.
+
+    Args:
+        pipeline (Pipeline): Fitted ``pipeline_rf_rus``
+        df (DataFrame): Pre-processed flights (see ``backtest_frame``)
+        dates (Series): Departure date of each row of df
+        thresholds (list): Probability thresholds to evaluate
+        group_by (tuple): Columns of df to accumulate per value
+        start (str): First day replayed (default: first day of the data)
+        end (str): Last day replayed (default: last day of the data)
+        batch_rows (int): Largest number of flights scored per predict_proba call
+        log (callable): Progress messages
+
+    Returns:
+        dict: group column (and 'day') -> ThresholdCounts
+    """
+    dates = pd.DatetimeIndex(dates)
+    in_range = np.ones(len(df), dtype=bool)
+    if start is not None:
+        in_range &= dates >= pd.Timestamp(start)
+    if end is not None:
+        in_range &= dates <= pd.Timestamp(end)
+
+    # Flights in day order, with the first row of every day
+    order = np.flatnonzero(in_range)[np.argsort(dates[in_range], kind='stable')]
+    days, day_starts = np.unique(dates[order], return_index=True)
+    day_bounds = np.append(day_starts, len(order))
+
+    X = select_model_features(df)
+    X = X[list(pipeline.feature_names_in_)] if hasattr(pipeline, 'feature_names_in_') else X
+    y = df[TARGET].to_numpy()
+    delayed_class = list(pipeline.classes_).index(1)
+
+    accumulators, group_codes = {}, {}
+    for column in group_by:
+        codes, uniques = pd.factorize(df[column])
+        accumulators[column], group_codes[column] = ThresholdCounts(uniques, thresholds), codes
+    accumulators['day'] = ThresholdCounts(days, thresholds)
+    group_codes['day'] = np.empty(len(df), dtype=np.int64)
+    group_codes['day'][order] = np.repeat(np.arange(len(days)), np.diff(day_bounds))
+
+    start_time = time.perf_counter()
+    first_day = 0
+    while first_day < len(days):
+        # As many whole days as fit in the batch (at least one)
+        last_day = max(np.searchsorted(day_bounds, day_bounds[first_day] + batch_rows, side='right') - 1,
+                       first_day + 1)
+        rows = order[day_bounds[first_day]:day_bounds[last_day]]
+        proba = pipeline.predict_proba(X.iloc[rows])[:, delayed_class]
+        for column, accumulator in accumulators.items():
+            accumulator.update(group_codes[column][rows], y[rows], proba)
+        log(f"{pd.Timestamp(days[last_day - 1]).date()}: {day_bounds[last_day]} flights scored "
+            f"in {time.perf_counter() - start_time:.1f} s")
+        first_day = last_day
+    return accumulators
+
+
+if __name__ == '__main__':
+    # Usage: python backtest.py pipeline_rf_rus_model.pkl flightaware_data.csv metar_data.csv backtest/ [--start 2023-01-01]
+    #        python backtest.py pipeline_rf_rus_model.pkl flightaware_data.csv --taf-store taf_store.joblib --lead 6h backtest/
+    parser = argparse.ArgumentParser(description='Replay the model day by day over the flight history.')
+    parser.add_argument('model')
+    parser.add_argument('flights', help='FlightAware flight records')
+    parser.add_argument('metars', nargs='?', default=None, help='AVWX METAR export')
+    parser.add_argument('output_dir')
+    parser.add_argument('--taf-store', default=None, help='score with TAF forecasts instead (see taf_store.py)')
+    parser.add_argument('--lead', default='0h')
+    parser.add_argument('--thresholds', type=float, nargs='+', default=DEFAULT_THRESHOLDS)
+    parser.add_argument('--start', default=None)
+    parser.add_argument('--end', default=None)
+    parser.add_argument('--batch-rows', type=int, default=100_000)
+    args = parser.parse_args()
+    if args.metars is None and args.taf_store is None:
+        parser.error('give a METAR export or --taf-store')
+
+    flights_df = pd.read_csv(args.flights, low_memory=False)
+    if args.taf_store:
+        from taf_store import TafStore
+        df, dates = backtest_frame(flights_df, taf_store=TafStore.load(args.taf_store), lead=args.lead)
+    else:
+        from metar_cleaning import metar_cleaning
+        df, dates = backtest_frame(flights_df, metar_cleaning(pd.read_csv(args.metars)))
+
+    start = time.perf_counter()
+    accumulators = run_backtest(joblib.load(args.model), df, dates, args.thresholds, start=args.start, end=args.end,
+                                batch_rows=args.batch_rows, log=lambda message: None)
+    replayed = accumulators['day'].counts[:, 0].sum()
+    print(f"{replayed} flights over {len(accumulators['day'].groups)} days replayed in {time.perf_counter() - start:.1f} s")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for name, accumulator in accumulators.items():
+        accumulator.frame(name).to_csv(os.path.join(args.output_dir, f"backtest_{name.replace('.', '_')}.csv"),
+                                       index=False)
+    network = accumulators['day'].frame('day').groupby('threshold')[OUTCOMES].sum()
+    network['precision'] = network['TP'] / (network['TP'] + network['FP'])
+    network['recall'] = network['TP'] / (network['TP'] + network['FN'])
+    print(network.round(3).to_string())
@@ -0,0 +1,318 @@
+import sys
+import time
+import numpy as np
+import pandas as pd
+import joblib
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.impute import SimpleImputer, KNNImputer
+from sklearn.preprocessing import FunctionTransformer, OneHotEncoder, PowerTransformer, RobustScaler, StandardScaler
+from sklearn.ensemble import RandomForestClassifier, ExtraTreesClassifier
+
+
+def _yeo_johnson(x, lambdas):
+    """Vectorized Yeo-Johnson transform, same branches as sklearn's PowerTransformer."""
+    out = np.empty_like(x)
+    pos = x >= 0
+    lmb_zero = np.abs(lambdas) < np.spacing(1.0)
+    lmb_two = np.abs(lambdas - 2) < np.spacing(1.0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # x >= 0
+        out = np.where(pos & lmb_zero, np.log1p(np.where(pos, x, 0)), out)
+        out = np.where(pos & ~lmb_zero, (np.power(np.where(pos, x, 0) + 1, lambdas) - 1) / lambdas, out)
+        # x < 0
+        out = np.where(~pos & ~lmb_two, -(np.power(np.where(pos, 0, -x) + 1, 2 - lambdas) - 1) / (2 - lambdas), out)
+        out = np.where(~pos & lmb_two, -np.log1p(np.where(pos, 0, -x)), out)
+    return out
+
+
+def _box_cox(x, lambdas):
+    """Vectorized Box-Cox transform (strictly positive inputs)."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(lambdas == 0, np.log(x), (np.power(x, lambdas) - 1) / lambdas)
+
+
+def _is_identity(step):
+    """True for steps that leave values untouched (newer sklearn wraps passthrough this way)."""
+    if isinstance(step, str) or step is None:
+        return step in (None, 'passthrough')
+    return isinstance(step, FunctionTransformer) and step.func is None
+
+
+def _steps_of(transformer):
+    """Return the list of fitted estimators making up a ColumnTransformer block."""
+    if isinstance(transformer, Pipeline):
+        return [step for _, step in transformer.steps if not _is_identity(step)]
+    return [transformer]
+
+
+class _NumericBlock:
+    """Imputers, power transforms and scalers applied as plain NumPy arithmetic."""
+
+    def __init__(self, columns, steps):
+        self.columns = columns
+        self.width = len(columns)
+        self.ops = []
+        for step in steps:
+            if isinstance(step, KNNImputer):
+                # Neighbour search needs the training matrix, so missing values fall back to sklearn
+                self.ops.append(('knn', step))
+            elif isinstance(step, SimpleImputer):
+                if step.add_indicator:
+                    # Missing flags of the columns that had missing values in training, appended last
+                    self.ops.append(('indicator', step.indicator_.features_))
+                    self.width += len(step.indicator_.features_)
+                self.ops.append(('fill', np.asarray(step.statistics_, dtype=np.float64)))
+            elif isinstance(step, PowerTransformer):
+                kind = 'yeo' if step.method == 'yeo-johnson' else 'boxcox'
+                self.ops.append((kind, np.asarray(step.lambdas_, dtype=np.float64)))
+                if step.standardize:
+                    self.ops.append(('shift', step._scaler.mean_))
+                    self.ops.append(('divide', step._scaler.scale_))
+            elif isinstance(step, RobustScaler):
+                if step.center_ is not None:
+                    self.ops.append(('shift', step.center_))
+                if step.scale_ is not None:
+                    self.ops.append(('divide', step.scale_))
+            elif isinstance(step, StandardScaler):
+                if step.mean_ is not None:
+                    self.ops.append(('shift', step.mean_))
+                if step.scale_ is not None:
+                    self.ops.append(('divide', step.scale_))
+            else:
+                raise ValueError(f"Unsupported numeric step for the fast path: {type(step).__name__}")
+
+    def transform(self, values):
+        x = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        indicators = np.empty(0)
+        for kind, param in self.ops:
+            if kind == 'knn':
+                if np.isnan(x).any():
+                    x = np.asarray(param.transform(pd.DataFrame([x], columns=self.columns)), dtype=np.float64)[0]
+            elif kind == 'indicator':
+                indicators = np.isnan(x[param]).astype(np.float64)
+            elif kind == 'fill':
+                x = np.where(np.isnan(x), param, x)
+            elif kind == 'yeo':
+                x = _yeo_johnson(x, param)
+            elif kind == 'boxcox':
+                x = _box_cox(x, param)
+            elif kind == 'shift':
+                x = x - param
+            elif kind == 'divide':
+                x = x / param
+        return np.concatenate([x, indicators])
+
+
+class _OneHotBlock:
+    """Constant imputation followed by one-hot encoding as a dictionary lookup."""
+
+    def __init__(self, columns, steps):
+        self.columns = columns
+        self.fill_value = None
+        encoder = None
+        for step in steps:
+            if isinstance(step, SimpleImputer) and step.strategy == 'constant':
+                self.fill_value = step.fill_value
+            elif isinstance(step, OneHotEncoder):
+                encoder = step
+            else:
+                raise ValueError(f"Unsupported categorical step for the fast path: {type(step).__name__}")
+        if encoder is None:
+            raise ValueError("Categorical block has no OneHotEncoder")
+        if encoder.drop_idx_ is not None or getattr(encoder, '_infrequent_enabled', False):
+            raise ValueError("The fast path does not support dropped or infrequent categories")
+
+        self.handle_unknown = encoder.handle_unknown
+        # One {category: output offset} dictionary per input column
+        self.lookups = []
+        offset = 0
+        for categories in encoder.categories_:
+            self.lookups.append({category: offset + i for i, category in enumerate(categories)})
+            offset += len(categories)
+        self.width = offset
+
+    def hot_positions(self, values):
+        positions = []
+        for column, value, lookup in zip(self.columns, values, self.lookups):
+            if value is None or (isinstance(value, float) and np.isnan(value)):
+                value = self.fill_value
+            position = lookup.get(value)
+            if position is None:
+                if self.handle_unknown == 'error':
+                    raise ValueError(f"Unknown category {value!r} in column {column!r}")
+                continue
+            positions.append(position)
+        return positions
+
+
+class FastPredictor:
+    """Single-row scorer compiled from a fitted ``pipeline_rf_rus``-style pipeline.
+
+    The ColumnTransformer blocks are replayed as NumPy arithmetic and dictionary lookups,
+    and the forest is evaluated by walking all trees at once over flattened node arrays.
+    Results match ``pipeline.predict_proba`` for the same input row.
+    """
+
+    def __init__(self, pipeline):
+        steps = [step for _, step in pipeline.steps]
+        preprocessor = next((s for s in steps if isinstance(s, ColumnTransformer)), None)
+        if preprocessor is None:
+            raise ValueError("Pipeline has no ColumnTransformer pre-processing step")
+        self.pipeline = pipeline
+        self.model = steps[-1]
+        self.classes_ = self.model.classes_
+        self.feature_names_in_ = list(preprocessor.feature_names_in_)
+
+        # Compile every ColumnTransformer block in output order (remainder comes last)
+        self.blocks = []
+        offset = 0
+        for name, transformer, columns in preprocessor.transformers_:
+            if transformer == 'drop' or len(columns) == 0:
+                continue
+            columns = [self.feature_names_in_[c] if isinstance(c, (int, np.integer)) else c for c in columns]
+            if _is_identity(transformer):
+                block = ('passthrough', columns, None)
+                width = len(columns)
+            else:
+                block_steps = _steps_of(transformer)
+                if isinstance(block_steps[-1], OneHotEncoder):
+                    block = ('onehot', columns, _OneHotBlock(columns, block_steps))
+                else:
+                    block = ('numeric', columns, _NumericBlock(columns, block_steps))
+                width = block[2].width
+            self.blocks.append((block[0], block[1], block[2], offset))
+            offset += width
+        self.n_features = offset
+
+        # Flatten the forest into shared node arrays; leaves loop onto themselves
+        if isinstance(self.model, (RandomForestClassifier, ExtraTreesClassifier)):
+            self._compile_forest(self.model.estimators_)
+        else:
+            self._roots = None
+
+    def _compile_forest(self, estimators):
+        left, right, feature, threshold, missing_left, proba, roots = [], [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            node_ids = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+            left.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            right.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(np.where(is_leaf, 0.0, tree.threshold))
+            # Side taken by missing values (sklearn >= 1.3; older trees send them right like NaN <= t)
+            missing_left.append(np.asarray(getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count)), dtype=bool))
+            value = tree.value[:, 0, :]
+            proba.append(value / value.sum(axis=1, keepdims=True))
+            roots.append(offset)
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+
+        self._left = np.concatenate(left)
+        self._right = np.concatenate(right)
+        self._feature = np.concatenate(feature)
+        self._threshold = np.concatenate(threshold)
+        self._missing_left = np.concatenate(missing_left)
+        self._leaf_proba = np.concatenate(proba)
+        self._roots = np.array(roots)
+        self._max_depth = max_depth
+
+    def transform_one(self, row):
+        """Apply the fitted pre-processing to one row (dict or Series keyed by column name).
+
+        Returns:
+            ndarray: float32 feature vector in the model's column order
+        """
+        x = np.zeros(self.n_features, dtype=np.float64)
+        for kind, columns, block, offset in self.blocks:
+            values = [row[c] for c in columns]
+            if kind == 'numeric':
+                x[offset:offset + block.width] = block.transform(values)
+            elif kind == 'onehot':
+                x[[offset + p for p in block.hot_positions(values)]] = 1.0
+            else:
+                x[offset:offset + len(columns)] = [np.nan if v is None else v for v in values]
+        # sklearn trees compare float32 features against their thresholds
+        return x.astype(np.float32)
+
+    def predict_proba_one(self, row):
+        """Class probabilities for a single flight, same layout as one ``predict_proba`` row."""
+        x = self.transform_one(row)
+        if self._roots is None:
+            return self.model.predict_proba(x.reshape(1, -1))[0]
+
+        nodes = self._roots
+        for _ in range(self._max_depth):
+            values = x[self._feature[nodes]]
+            go_left = np.where(np.isnan(values), self._missing_left[nodes], values <= self._threshold[nodes])
+            nodes = np.where(go_left, self._left[nodes], self._right[nodes])
+        return self._leaf_proba[nodes].mean(axis=0)
+
+
+def compile_pipeline(pipeline):
+    """Compile a fitted pipeline into a FastPredictor.
+
+    Args:
+        pipeline (Pipeline): Fitted sklearn/imblearn pipeline, e.g. ``pipeline_rf_rus``
+
+    Returns:
+        FastPredictor: Single-row scorer matching ``pipeline.predict_proba``
+    """
+    return FastPredictor(pipeline)
+
+
+def latency_benchmark(pipeline, X, n_rows=500, warmup=20):
+    """Time single-row scoring through the pipeline and through the fast path.
+
+    Args:
+        pipeline (Pipeline): Fitted pipeline
+        X (DataFrame): Feature rows to score one at a time (e.g. X_test)
+        n_rows (int): Number of rows to time
+        warmup (int): Untimed calls before measuring
+
+    Returns:
+        DataFrame: p50/p99/mean latency in milliseconds per path, plus the largest
+            absolute probability difference between the two paths
+    """
+    predictor = compile_pipeline(pipeline)
+    X = X.iloc[:n_rows]
+    records = X.to_dict('records')
+
+    for i in range(min(warmup, len(records))):
+        predictor.predict_proba_one(records[i])
+        pipeline.predict_proba(X.iloc[[i]])
+
+    timings = {'pipeline.predict_proba': [], 'FastPredictor.predict_proba_one': []}
+    max_abs_diff = 0.0
+    for i, record in enumerate(records):
+        start = time.perf_counter()
+        expected = pipeline.predict_proba(X.iloc[[i]])[0]
+        timings['pipeline.predict_proba'].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        result = predictor.predict_proba_one(record)
+        timings['FastPredictor.predict_proba_one'].append(time.perf_counter() - start)
+
+        max_abs_diff = max(max_abs_diff, float(np.abs(expected - result).max()))
+
+    rows = []
+    for path, values in timings.items():
+        values_ms = np.array(values) * 1000
+        rows.append({'path': path,
+                     'p50_ms': np.percentile(values_ms, 50),
+                     'p99_ms': np.percentile(values_ms, 99),
+                     'mean_ms': values_ms.mean(),
+                     'max_abs_diff': max_abs_diff})
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    # Usage: python fast_predict.py pipeline_rf_rus_model.pkl X_test.csv [n_rows]
+    pipeline_rf_rus = joblib.load(sys.argv[1])
+    X_test = pd.read_csv(sys.argv[2])
+    n_rows = int(sys.argv[3]) if len(sys.argv) > 3 else 500
+    print(latency_benchmark(pipeline_rf_rus, X_test, n_rows=n_rows).to_string(index=False))
@@ -0,0 +1,145 @@
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Added to the FlightAware records by ``add_inbound_features`` (delays and times in seconds, as in the FlightAware data)
+INBOUND_FEATURES = ['inbound_arrival_delay',  # Arrival delay of the aircraft's previous leg
+                    'scheduled_turnaround',  # Scheduled ground time between the previous leg and this one
+                    'turnaround_slack',  # Ground time left once the previous leg's arrival delay is absorbed
+                    'inbound_chain_max_arrival_delay',  # Largest arrival delay of the previous `legs` legs
+                    'rotation_leg']  # 1 for the first flight of the aircraft's rotation, 2 for the next...
+
+# Longest ground time that still links two legs into one rotation (overnight stops start a new one)
+MAX_GROUND_TIME = '12h'
+
+# Schedules are rounded to the minute: an inbound leg may be scheduled to land this late after the departure
+LINK_TOLERANCE_SECONDS = 60
+
+
+def _seconds(times):
+    # Seconds since the epoch of UTC times, NaN where missing
+    elapsed = pd.to_datetime(times, utc=True) - pd.Timestamp(0, tz='UTC')
+    return (elapsed / pd.Timedelta('1s')).to_numpy(dtype=np.float64)
+
+
+def resolve_inbound(flights_df, max_ground_time=MAX_GROUND_TIME):
+    """Row position of every flight's inbound leg, from a hash index of 'fa_flight_id'.
+
+    The inbound ids are looked up in one vectorized pass (pd.Index.get_indexer). A link is only
+    kept when the inbound leg departs before the flight and is scheduled to land before its
+    departure (within LINK_TOLERANCE_SECONDS) and at most max_ground_time before it, so the
+    links never form cycles and overlapping legs are not chained.
+
+    Args:
+        flights_df (DataFrame): FlightAware records with 'fa_flight_id', 'inbound_fa_flight_id',
+            'scheduled_out' and 'scheduled_in'
+        max_ground_time (str): Longest scheduled ground time of a link
+
+    Returns:
+        array: Position of the inbound leg in flights_df, -1 when there is none
+    """
+    return _link(flights_df, _seconds(flights_df['scheduled_out']), _seconds(flights_df['scheduled_in']),
+                 max_ground_time)
+
+
+def _link(flights_df, scheduled_out, scheduled_in, max_ground_time):
+    ids = flights_df['fa_flight_id']
+    # The last record of a flight id wins (FlightAware repeats flights across queries)
+    unique = (~ids.duplicated(keep='last') & ids.notna()).to_numpy()
+    found = pd.Index(ids[unique]).get_indexer(flights_df['inbound_fa_flight_id'])
+    inbound = np.where(found >= 0, np.flatnonzero(unique)[found], -1)
+
+    linked = inbound >= 0
+    previous = inbound[linked]
+    ground_time = scheduled_out[linked] - scheduled_in[previous]
+    linked[linked] = ((scheduled_out[previous] < scheduled_out[linked])
+                      & (ground_time >= -LINK_TOLERANCE_SECONDS)
+                      & (ground_time <= pd.Timedelta(max_ground_time).total_seconds()))
+    return np.where(linked, inbound, -1)
+
+
+def rotation_depth(inbound):
+    """Number of legs flown before each flight in its rotation, by pointer jumping.
+
+    Every pass adds the depth of a row's current ancestor and jumps to that ancestor's ancestor,
+    so a rotation of k legs is resolved in about log2(k) vectorized passes.
+
+    Args:
+        inbound (array): Output of ``resolve_inbound``
+
+    Returns:
+        array: 0 for the first leg of a rotation, 1 for the second...
+    """
+    ancestor = np.asarray(inbound, dtype=np.int64).copy()
+    depth = (ancestor >= 0).astype(np.int64)
+    jumping = np.flatnonzero(ancestor >= 0)
+    while len(jumping):
+        above = ancestor[jumping]
+        depth[jumping] += depth[above]
+        ancestor[jumping] = ancestor[above]
+        jumping = jumping[ancestor[jumping] >= 0]
+    return depth
+
+
+def inbound_features(flights_df, legs=3, max_ground_time=MAX_GROUND_TIME):
+    """Delay propagation features of every flight from its inbound legs (see INBOUND_FEATURES).
+
+    Linear in the number of flights: one hash join resolves the inbound legs, the previous
+    `legs` legs are gathered with one array lookup each and the rotation depth takes a
+    logarithmic number of passes. For live use, the inbound arrival delay is the estimated one
+    until the leg has landed.
+
+    Args:
+        flights_df (DataFrame): Raw FlightAware records (before ``preprocessing.prepare_flights``,
+            so the inbound leg is found even when it is filtered out)
+        legs (int): Previous legs covered by 'inbound_chain_max_arrival_delay'
+        max_ground_time (str): See ``resolve_inbound``
+
+    Returns:
+        DataFrame: INBOUND_FEATURES, aligned with flights_df (NaN when there is no inbound leg)
+    """
+    # The schedule is parsed once for the links and the turnarounds
+    scheduled_out = _seconds(flights_df['scheduled_out'])
+    scheduled_in = _seconds(flights_df['scheduled_in'])
+    inbound = _link(flights_df, scheduled_out, scheduled_in, max_ground_time)
+    linked = inbound >= 0
+    arrival_delay = flights_df['arrival_delay'].to_numpy(dtype=np.float64)
+
+    def previous(values):
+        return np.where(linked, values[inbound], np.nan)
+
+    inbound_arrival_delay = previous(arrival_delay)
+    scheduled_turnaround = scheduled_out - previous(scheduled_in)
+
+    # Walk `legs` legs back along the rotation
+    chain_max = np.full(len(flights_df), np.nan)
+    leg = inbound
+    for _ in range(legs):
+        found = leg >= 0
+        chain_max = np.fmax(chain_max, np.where(found, arrival_delay[leg], np.nan))
+        leg = np.where(found, inbound[leg], -1)
+
+    return pd.DataFrame({'inbound_arrival_delay': inbound_arrival_delay,
+                         'scheduled_turnaround': scheduled_turnaround,
+                         'turnaround_slack': scheduled_turnaround - inbound_arrival_delay,
+                         'inbound_chain_max_arrival_delay': chain_max,
+                         'rotation_leg': rotation_depth(inbound) + 1},
+                        index=flights_df.index)
+
+
+def add_inbound_features(flights_df, legs=3, max_ground_time=MAX_GROUND_TIME):
+    """FlightAware records with their inbound leg features (see ``inbound_features``)."""
+    return flights_df.join(inbound_features(flights_df, legs, max_ground_time))
+
+
+if __name__ == '__main__':
+    # Usage: python flight_chains.py flightaware_data.csv
+    flights_df = pd.read_csv(sys.argv[1], low_memory=False)
+    start = time.perf_counter()
+    features = inbound_features(flights_df)
+    print(f"{len(flights_df)} flights chained in {time.perf_counter() - start:.2f} s, "
+          f"{features['inbound_arrival_delay'].notna().mean():.1%} with an inbound leg, "
+          f"longest rotation {features['rotation_leg'].max()} legs")
+    print(features.describe().round(0).to_string())
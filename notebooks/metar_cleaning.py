@@ -2,7 +2,123 @@ import pandas as pd
 import ast
 from tqdm import tqdm
 
-def metar_cleaning(metar_data_df):
+from step_profiler import StepProfiler, NO_PROFILER
+
+# Mapping conditions to categories (including multi-category mappings)
+condition_categories = {
+    'blowing snow': ['Blowing Snow', 'Low Drifting Snow'],
+    'blowing dust': ['Blowing Wide Dust', 'Sand', 'Wide Dust'],
+    'light rain': ['Drizzle', 'Drizzle Rain', 'Light Drizzle', 'Light Drizzle Rain', 'Rain Drizzle', 'Light Rain',
+                'Light Rain Drizzle', 'Light Showers', 'Light Showers Rain'],
+    'heavy rain': ['Heavy Rain', 'Heavy Showers Rain', 'Showers Rain'],
+    'fog': ['Fog', 'Patchy Fog', 'Shallow Fog'],
+    'light fog': ['Mist', 'Partial Fog'],
+    'light hail': ['Light Ice Pellets', 'Light Showers Small Hail'],
+    'hail': ['Showers Small Hail', 'Heavy Thunderstorm Rain Hail', 'Heavy Thunderstorm Hail Rain'],
+    'light snow': ['Light Snow', 'Light Drizzle Snow', 'Light Drizzle Snow Grains',
+                'Light Snow Grains', 'Light Snow Grains Drizzle', 'Light Showers Snow'],
+    'heavy snow': ['Heavy Snow', 'Showers Snow'],
+    'rain': ['Rain', 'Thunderstorm Rain', 'Light Ice Pellets Rain'],
+    'snow': ['Snow', 'Snow Rain'],
+    'thunderstorm': ['Thunderstorm', 'Heavy Thunderstorm Rain', 'Heavy Thunderstorm Rain Hail',
+                    'Heavy Thunderstorm Hail Rain', 'Thunderstorm Vicinity Showers', 'Vicinity Thunderstorm',
+                    'Light Thunderstorm Rain'],
+    'vicinity showers': ['Vicinity Showers'],
+    'vicinity fog': ['Vicinity Fog'],
+    'funnel cloud': ['Funnel Cloud'],
+    'haze': ['Haze'],
+    'smoke': ['Smoke'],
+    'freezing': ['Freezing Fog', 'Freezing Drizzle', 'Light Freezing Drizzle','Light Freezing Drizzle Snow']
+}
+
+# Reverse the mapping to simplify lookup
+condition_to_category = {}
+for category, conditions in condition_categories.items():
+    for condition in conditions:
+        if condition not in condition_to_category:
+            condition_to_category[condition] = []
+        condition_to_category[condition].append(category)
+
+
+
+# Function to parse and map weather codes to categories
+def map_conditions_to_categories(wx_codes):
+    try:
+        # Parse the string into a Python list (decoded reports already hold a list)
+        parsed = wx_codes if isinstance(wx_codes, list) else ast.literal_eval(wx_codes)
+        # Extract and map to categories
+        categories = set()
+        for item in parsed:
+            if isinstance(item, dict) and 'value' in item:
+                condition = item['value']
+                if condition in condition_to_category:
+                    categories.update(condition_to_category[condition])
+        return list(categories)
+    except (ValueError, SyntaxError):
+        return []
+
+
+def normalize_altimeter(value):
+    # Treat values < 60 as inches of mercury (e.g., 30 for 30.00 inHg)
+    if 0 <= value < 100:
+        return value * 33.8639  # Convert inHg to hPa
+    elif value >= 900:
+        return value  # Already in hPa
+    else:
+        return None  # Invalid value
+
+
+def normalize_visibility(value):
+    if value > 10:  # Assume values greater than 10 are in meters
+        return value  # Keep as meters
+    else:  # Assume values <= 10 are in statute miles
+        return value * 1609.34  # Convert miles to meters
+
+
+# Define mappings for numerical encoding
+altitude_category_mapping = {'low': 1, 'medium': 2, 'high': 3, 'vertical': 4, 'unknown': 0}
+cloud_type_mapping = {'CLR': 1, 'FEW': 2, 'SCT': 3, 'BKN': 4, 'OVC': 5, 'unknown': 0}
+
+
+# Function to parse and categorize clouds with numerical encoding
+def parse_and_categorize_clouds_numeric(clouds):
+    if not isinstance(clouds, list):
+        return {}
+
+    # Parse each cloud layer
+    parsed = {}
+    for i, cloud in enumerate(clouds):
+        layer = f"clouds_layer_{i + 1}"  # Positional layer (layer_1, layer_2, ...)
+        # 'altitude' in the AVWX REST data, 'base' in reports decoded with the avwx library
+        altitude = cloud.get('altitude', cloud.get('base'))
+        if altitude is not None:
+            if altitude <= 65:
+                altitude_category = 'low'
+            elif altitude <= 200:
+                altitude_category = 'medium'
+            elif altitude > 200:
+                altitude_category = 'high'
+            else:
+                altitude_category = 'unknown'
+        else:
+            altitude_category = 'unknown'
+
+        # Check for vertical clouds
+        if cloud.get('modifier') in ['CB', 'TCU']:
+            altitude_category = 'vertical'
+
+        # Encode using numerical mapping
+        parsed[f"{layer}_type"] = cloud_type_mapping.get(cloud.get('type', 'unknown'), 0)
+        parsed[f"{layer}_altitude_category"] = altitude_category_mapping.get(altitude_category, 0)
+
+    return parsed
+
+
+# Define severity mapping for flight rules
+flight_rules_mapping = {'VFR': 1, 'MVFR': 2, 'IFR': 3, 'LIFR': 4}
+
+
+def metar_cleaning(metar_data_df, profile=None):
     """Cleans the METAR data DataFrame by performing the following steps:
     1. Drop duplicates and reset index
     2. Replace empty lists in 'wind_variable_direction' with 0, otherwise 1
@@ -35,6 +151,8 @@ def metar_cleaning(metar_data_df):
 
     Args:
         metar_data_df (DataFrame): DataFrame containing METAR data
+        profile (str): Optional path of a JSON report with the time, peak memory, shape and copied
+            data of every step (see step_profiler.StepProfiler)
 
     Returns:
         DataFrame: Cleaned METAR data DataFrame
@@ -43,68 +161,36 @@ def metar_cleaning(metar_data_df):
     # Display progress bar
     tqdm.pandas(desc="Cleaning METAR data...")
 
+    # Opt-in step profiling (no-op by default); the memory sampler stops even if a step raises
+    profiler = StepProfiler('metar_cleaning') if profile else NO_PROFILER
+    with profiler:
+        metar_data_df = _cleaning_steps(metar_data_df, profiler)
+
+    print('Cleaning completed')
+
+    if profile:
+        profiler.write(profile)
+
+    return metar_data_df
+
+
+def _cleaning_steps(metar_data_df, profiler):
+    # The steps of metar_cleaning, each closed with a profiler mark
+    profiler.start(metar_data_df)
+
     # Drop duplicates and reset index
     metar_data_df.drop_duplicates(inplace=True)
     metar_data_df.reset_index(inplace=True,drop=True)
     if 'Unnamed: 0' in metar_data_df.columns:
         metar_data_df.drop(columns='Unnamed: 0',inplace=True)
+    profiler.mark('drop_duplicates', metar_data_df)
 
     # Replace empty lists in wind_variable_direction with 0, otherwise 1
     metar_data_df['wind_variable_change'] = metar_data_df['wind_variable_direction'].progress_apply(lambda x: 0 if len(x) == 2 else 1)
     metar_data_df.drop(columns='wind_variable_direction', inplace=True)
+    profiler.mark('wind_variable_change', metar_data_df)
 
-    # One-hot encode wx_codes
-    # Mapping conditions to categories (including multi-category mappings)
-    condition_categories = {
-        'blowing snow': ['Blowing Snow', 'Low Drifting Snow'],
-        'blowing dust': ['Blowing Wide Dust', 'Sand', 'Wide Dust'],
-        'light rain': ['Drizzle', 'Drizzle Rain', 'Light Drizzle', 'Light Drizzle Rain', 'Rain Drizzle', 'Light Rain',
-                    'Light Rain Drizzle', 'Light Showers', 'Light Showers Rain'],
-        'heavy rain': ['Heavy Rain', 'Heavy Showers Rain', 'Showers Rain'],
-        'fog': ['Fog', 'Patchy Fog', 'Shallow Fog'],
-        'light fog': ['Mist', 'Partial Fog'],
-        'light hail': ['Light Ice Pellets', 'Light Showers Small Hail'],
-        'hail': ['Showers Small Hail', 'Heavy Thunderstorm Rain Hail', 'Heavy Thunderstorm Hail Rain'],
-        'light snow': ['Light Snow', 'Light Drizzle Snow', 'Light Drizzle Snow Grains',
-                    'Light Snow Grains', 'Light Snow Grains Drizzle', 'Light Showers Snow'],
-        'heavy snow': ['Heavy Snow', 'Showers Snow'],
-        'rain': ['Rain', 'Thunderstorm Rain', 'Light Ice Pellets Rain'],
-        'snow': ['Snow', 'Snow Rain'],
-        'thunderstorm': ['Thunderstorm', 'Heavy Thunderstorm Rain', 'Heavy Thunderstorm Rain Hail',
-                        'Heavy Thunderstorm Hail Rain', 'Thunderstorm Vicinity Showers', 'Vicinity Thunderstorm',
-                        'Light Thunderstorm Rain'],
-        'vicinity showers': ['Vicinity Showers'],
-        'vicinity fog': ['Vicinity Fog'],
-        'funnel cloud': ['Funnel Cloud'],
-        'haze': ['Haze'],
-        'smoke': ['Smoke'],
-        'freezing': ['Freezing Fog', 'Freezing Drizzle', 'Light Freezing Drizzle','Light Freezing Drizzle Snow']
-    }
-
-    # Reverse the mapping to simplify lookup
-    condition_to_category = {}
-    for category, conditions in condition_categories.items():
-        for condition in conditions:
-            if condition not in condition_to_category:
-                condition_to_category[condition] = []
-            condition_to_category[condition].append(category)
-
-    # Function to parse and map weather codes to categories
-    def map_conditions_to_categories(wx_codes):
-        try:
-            # Parse the string into a Python list
-            parsed = ast.literal_eval(wx_codes)
-            # Extract and map to categories
-            categories = set()
-            for item in parsed:
-                if isinstance(item, dict) and 'value' in item:
-                    condition = item['value']
-                    if condition in condition_to_category:
-                        categories.update(condition_to_category[condition])
-            return list(categories)
-        except (ValueError, SyntaxError):
-            return []
-        
+    # One-hot encode wx_codes (see condition_categories)
     # Apply parsing and mapping to the 'wx_codes' column
     metar_data_df['categories'] = metar_data_df['wx_codes'].progress_apply(map_conditions_to_categories)
 
@@ -125,6 +211,7 @@ def metar_cleaning(metar_data_df):
 
     # Drop the original 'wx_codes' column
     metar_data_df.drop(columns=['wx_codes','categories'], inplace=True)
+    profiler.mark('wx_codes_one_hot', metar_data_df)
 
     # One-hot encoding pressure_tendency
     tendency_dummies = pd.get_dummies(
@@ -147,29 +234,25 @@ def metar_cleaning(metar_data_df):
 
     # Drop the original column
     metar_data_df.drop(columns=['remarks_info.pressure_tendency.tendency'], inplace=True)
+    profiler.mark('pressure_tendency_one_hot', metar_data_df)
 
     metar_data_df.dropna(axis=1,how='all', inplace=True)
 
     metar_data_df.columns = metar_data_df.columns.str.replace('.value', '', regex=False)
+    profiler.mark('drop_empty_columns', metar_data_df)
 
     # Remove rows where 'temperature' is greater than 80
     metar_data_df = metar_data_df[metar_data_df['temperature'] <= 80]  
-
-    def normalize_altimeter(value):
-        # Treat values < 60 as inches of mercury (e.g., 30 for 30.00 inHg)
-        if 0 <= value < 100:
-            return value * 33.8639  # Convert inHg to hPa
-        elif value >= 900:
-            return value  # Already in hPa
-        else:
-            return None  # Invalid value
+    profiler.mark('filter_temperature', metar_data_df)
 
     # Apply normalization
     metar_data_df['altimeter_hpa'] = metar_data_df['altimeter'].progress_apply(normalize_altimeter)
     metar_data_df.drop(columns=['altimeter'], inplace=True)
+    profiler.mark('altimeter_hpa', metar_data_df)
 
     # Sanitized is a reduced version of raw, so drop it.
     metar_data_df.drop(columns=['sanitized'], inplace=True)
+    profiler.mark('drop_sanitized', metar_data_df)
 
     # Re-ordering columns
 
@@ -191,25 +274,23 @@ def metar_cleaning(metar_data_df):
 
     # Reorder the DataFrame
     metar_data_df = metar_data_df[reordered_columns]
-
-    def normalize_visibility(value):
-        if value > 10:  # Assume values greater than 10 are in meters
-            return value  # Keep as meters
-        else:  # Assume values <= 10 are in statute miles
-            return value * 1609.34  # Convert miles to meters
+    profiler.mark('reorder_columns', metar_data_df)
 
     # Apply normalization to the visibility column
     metar_data_df['visibility_meters'] = metar_data_df['visibility'].progress_apply(normalize_visibility).clip(lower=50, upper=9999)
 
     metar_data_df.drop(columns=['visibility'], inplace=True)  # Drop the original column
+    profiler.mark('visibility_meters', metar_data_df)
 
     metar_data_df.drop(columns=['wind_direction', 'remarks', 'remarks_info.codes'], inplace=True)
+    profiler.mark('drop_wind_direction_remarks', metar_data_df)
 
     # Replace missing values in the 'wind_gust' column with 0
     metar_data_df['wind_gust'] = metar_data_df['wind_gust'].fillna(0)
 
     # Replace missing values in the 'wind_speed' column with 0
     metar_data_df['wind_speed'] = metar_data_df['wind_speed'].fillna(0)
+    profiler.mark('fill_wind', metar_data_df)
 
     # Group by 'station' and fill missing values with the mean for each station
     metar_data_df['remarks_info.sea_level_pressure'] = metar_data_df.groupby('station')[
@@ -219,10 +300,7 @@ def metar_cleaning(metar_data_df):
     metar_data_df['remarks_info.sea_level_pressure'] = metar_data_df['remarks_info.sea_level_pressure'].fillna(
         metar_data_df['remarks_info.sea_level_pressure'].median()
     )
-
-    # Define mappings for numerical encoding
-    altitude_category_mapping = {'low': 1, 'medium': 2, 'high': 3, 'vertical': 4, 'unknown': 0}
-    cloud_type_mapping = {'CLR': 1, 'FEW': 2, 'SCT': 3, 'BKN': 4, 'OVC': 5, 'unknown': 0}
+    profiler.mark('impute_sea_level_pressure', metar_data_df)
 
     # # Replace missing values in the 'clouds' column with an empty list
     # metar_data_df['clouds'] = metar_data_df['clouds'].apply(lambda x: [] if pd.isna(x) else x)
@@ -232,38 +310,7 @@ def metar_cleaning(metar_data_df):
         return ast.literal_eval(value)  # Safely parse the string into a Python list
     
     metar_data_df['clouds'] = metar_data_df['clouds'].progress_apply(parse_clouds_column)
-
-    # Function to parse and categorize clouds with numerical encoding
-    def parse_and_categorize_clouds_numeric(clouds):
-        if not isinstance(clouds, list):
-            return {}
-
-        # Parse each cloud layer
-        parsed = {}
-        for i, cloud in enumerate(clouds):
-            layer = f"clouds_layer_{i + 1}"  # Positional layer (layer_1, layer_2, ...)
-            altitude = cloud.get('altitude', None)
-            if altitude is not None:
-                if altitude <= 65:
-                    altitude_category = 'low'
-                elif altitude <= 200:
-                    altitude_category = 'medium'
-                elif altitude > 200:
-                    altitude_category = 'high'
-                else:
-                    altitude_category = 'unknown'
-            else:
-                altitude_category = 'unknown'
-
-            # Check for vertical clouds
-            if cloud.get('modifier') in ['CB', 'TCU']:
-                altitude_category = 'vertical'
-
-            # Encode using numerical mapping
-            parsed[f"{layer}_type"] = cloud_type_mapping.get(cloud.get('type', 'unknown'), 0)
-            parsed[f"{layer}_altitude_category"] = altitude_category_mapping.get(altitude_category, 0)
-
-        return parsed
+    profiler.mark('parse_clouds', metar_data_df)
 
     # Apply parsing to the 'clouds' column
     parsed_clouds = metar_data_df['clouds'].progress_apply(parse_and_categorize_clouds_numeric)
@@ -280,18 +327,19 @@ def metar_cleaning(metar_data_df):
 
     # Remove Clouds column
     metar_data_df.drop(columns=['clouds'], inplace=True)
+    profiler.mark('clouds_numeric', metar_data_df)
 
     # Drop rows where 'temperature' is NaN
     metar_data_df = metar_data_df.dropna(subset=['temperature'])
-
-    # Define severity mapping for flight rules
-    flight_rules_mapping = {'VFR': 1, 'MVFR': 2, 'IFR': 3, 'LIFR': 4}
+    profiler.mark('drop_missing_temperature', metar_data_df)
 
     # Apply the mapping to the 'flight_rules' column
     metar_data_df['flight_rules'] = metar_data_df['flight_rules'].map(flight_rules_mapping)
+    profiler.mark('flight_rules', metar_data_df)
 
     # Remove columns that start with remarks_info.precip
     metar_data_df = metar_data_df.loc[:, ~metar_data_df.columns.str.startswith('remarks_info.precip')]
+    profiler.mark('drop_precip_columns', metar_data_df)
 
     # Remove unnecessary columns
     metar_data_df = metar_data_df.drop(columns=[
@@ -309,6 +357,7 @@ def metar_cleaning(metar_data_df):
         'visibility.denominator', # Already have visibility column
         'other' # Mixed information about clouds, weather, etc. We already have enough information about them.
     ])
+    profiler.mark('drop_unused_columns', metar_data_df)
 
     # Step 1: Create a visibility map based on layer_1_type and layer_1_altitude_category
     def build_visibility_map(df):
@@ -342,6 +391,7 @@ def metar_cleaning(metar_data_df):
     metar_data_df['visibility_meters'] = metar_data_df.progress_apply(
         lambda row: impute_visibility(row, visibility_map), axis=1
     )
+    profiler.mark('impute_visibility_by_clouds', metar_data_df)
 
     # Step 1: Create a visibility map based on flight_rules
     def build_flight_rules_visibility_map(df):
@@ -370,6 +420,7 @@ def metar_cleaning(metar_data_df):
     metar_data_df['visibility_meters'] = metar_data_df.progress_apply(
         lambda row: impute_visibility_with_flight_rules(row, flight_rules_map), axis=1
     )
+    profiler.mark('impute_visibility_by_flight_rules', metar_data_df)
 
     # One last reset index
     metar_data_df.reset_index(inplace=True, drop=True)
@@ -378,7 +429,105 @@ def metar_cleaning(metar_data_df):
     subset=["time.dt", "density_altitude", "pressure_altitude", "altimeter_hpa"],
     inplace=True
     )
+    profiler.mark('reset_index_dropna', metar_data_df)
 
-    print('Cleaning completed')
+    return metar_data_df
+
+def _lookup(record, path):
+    # Dotted path into a nested report, or key of a flattened row (pd.json_normalize / METAR CSV)
+    if path in record:
+        return record[path]
+    head, _, rest = path.partition('.')
+    value = record.get(head)
+    if not rest:
+        return value
+    return _lookup(value, rest) if isinstance(value, dict) else None
+
+
+def _number(record, name):
+    # Most report fields are {'repr', 'value', ...} groups, None when the group is missing
+    value = _lookup(record, f'{name}.value')
+    if value is None:
+        value = _lookup(record, name)
+    return float('nan') if value is None or isinstance(value, dict) else float(value)
 
-    return metar_data_df
\ No newline at end of file
+
+def _listing(value):
+    # Lists are stored as strings in the METAR CSV export
+    if isinstance(value, str):
+        return ast.literal_eval(value)
+    return value if isinstance(value, list) else []
+
+
+def clean_metar_record(record, suffix=''):
+    """Clean a single decoded METAR with the same rules as ``metar_cleaning``.
+
+    Dataset-level imputations (sea level pressure by station, visibility by cloud layer and by
+    flight rules) need the whole table and are skipped, so those values may stay NaN.
+
+    Args:
+        record (dict): One decoded report, as returned by the AVWX REST API or
+            ``dataclasses.asdict(avwx.Metar(...).data)``
+        suffix (str): Appended to every column name, e.g. '_departure' for the model input
+
+    Returns:
+        dict: Cleaned columns ('wind_variable_change', 'wx_code_*', 'pressure_tendency_*',
+            'temperature', 'altimeter_hpa', 'visibility_meters', 'clouds_layer_*', 'flight_rules', ...)
+
+    Raises:
+        ValueError: If metar_cleaning would drop the report (temperature missing or above 80,
+            or missing altimeter, pressure altitude or density altitude)
+    """
+    cleaned = {}
+
+    # Variable wind direction present or not
+    cleaned['wind_variable_change'] = 0 if len(_listing(_lookup(record, 'wind_variable_direction'))) == 0 else 1
+
+    # One-hot weather categories
+    categories = map_conditions_to_categories(_listing(_lookup(record, 'wx_codes')))
+    for category in condition_categories:
+        cleaned[f"wx_code_{category.replace(' ', '_')}"] = int(category in categories)
+
+    # One-hot pressure tendency, named like the get_dummies columns
+    tendency = _lookup(record, 'remarks_info.pressure_tendency.tendency')
+    if isinstance(tendency, str):
+        cleaned[f"pressure_tendency_{tendency}".replace(' ', '_').replace(',', '').lower()] = 1
+
+    for column in ['temperature', 'dewpoint', 'relative_humidity', 'pressure_altitude', 'density_altitude']:
+        cleaned[column] = _number(record, column)
+    if not cleaned['temperature'] <= 80:
+        raise ValueError(f"Temperature {cleaned['temperature']} is missing or out of range")
+
+    # Missing wind means calm
+    for column in ['wind_speed', 'wind_gust']:
+        value = _number(record, column)
+        cleaned[column] = 0.0 if pd.isna(value) else value
+
+    altimeter_hpa = normalize_altimeter(_number(record, 'altimeter'))
+    cleaned['altimeter_hpa'] = float('nan') if altimeter_hpa is None else altimeter_hpa
+    visibility_meters = normalize_visibility(_number(record, 'visibility'))
+    cleaned['visibility_meters'] = visibility_meters if pd.isna(visibility_meters) else min(max(visibility_meters, 50), 9999)
+    cleaned['remarks_info.sea_level_pressure'] = _number(record, 'remarks_info.sea_level_pressure')
+
+    # Cloud layers, 0 for layers that are not reported
+    clouds = parse_and_categorize_clouds_numeric(_listing(_lookup(record, 'clouds')))
+    for layer in range(1, max(6, len(clouds) // 2) + 1):
+        for field in ['type', 'altitude_category']:
+            cleaned[f'clouds_layer_{layer}_{field}'] = clouds.get(f'clouds_layer_{layer}_{field}', 0)
+
+    cleaned['flight_rules'] = flight_rules_mapping.get(_lookup(record, 'flight_rules'), float('nan'))
+
+    missing = [c for c in ['density_altitude', 'pressure_altitude', 'altimeter_hpa'] if pd.isna(cleaned[c])]
+    if missing:
+        raise ValueError(f"Missing {', '.join(missing)}")
+
+    return {f'{column}{suffix}': value for column, value in cleaned.items()}
+
+
+if __name__ == '__main__':
+    # Usage: python metar_cleaning.py metar_data.csv [metar_cleaning_profile.json]
+    import sys
+    report_path = sys.argv[2] if len(sys.argv) > 2 else 'metar_cleaning_profile.json'
+    metar_cleaned = metar_cleaning(pd.read_csv(sys.argv[1]), profile=report_path)
+    steps = pd.DataFrame(pd.read_json(report_path, typ='series')['steps'])
+    print(steps.sort_values('seconds', ascending=False).round(3).to_string(index=False))
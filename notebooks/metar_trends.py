@@ -0,0 +1,213 @@
+import sys
+import time
+import collections
+
+import numpy as np
+import pandas as pd
+from pandas.api.indexers import BaseIndexer
+
+# Cleaned METAR columns whose recent trend is computed per station; the cloud category is turned
+# into an ordered ceiling category first (see CEILING_ORDER)
+TREND_COLUMNS = ['visibility_meters', 'ceiling_category', 'wind_gust', 'altimeter_hpa']
+
+TREND_WINDOWS = ['1h', '3h', '6h']
+
+# Change since the oldest report of the window, lowest and highest value in the window
+TREND_STATS = ['delta', 'min', 'max']
+
+# Reports drift by a few minutes around the hour: the report "one hour ago" must still be in the 1h window
+WINDOW_SLACK = pd.Timedelta('10min')
+
+# clouds_layer_1_altitude_category (1 low, 2 medium, 3 high, 4 vertical visibility, 0 none or unknown)
+# as a ceiling that increases with the cloud base, like the visibility
+CEILING_ORDER = {4: 0, 1: 1, 2: 2, 3: 3, 0: 4}
+
+# Seconds per station on the combined (station, time) axis: longer than any METAR history
+STATION_SPAN = 10**10
+
+
+def trend_feature_columns(side=None):
+    """Names of the trend columns, e.g. 'visibility_meters_delta_3h' (with '_<side>' once merged to flights)."""
+    suffix = f'_{side}' if side else ''
+    return [f'{column}_{stat}_{window}{suffix}'
+            for window in TREND_WINDOWS for column in TREND_COLUMNS for stat in TREND_STATS]
+
+
+def _window_seconds(window):
+    return int((pd.Timedelta(window) + WINDOW_SLACK).total_seconds())
+
+
+def _seconds(times):
+    # Seconds since the epoch of UTC times (tz-aware or naive UTC)
+    elapsed = pd.to_datetime(pd.Series(times), utc=True) - pd.Timestamp(0, tz='UTC')
+    return (elapsed // pd.Timedelta('1s')).to_numpy(dtype=np.int64)
+
+
+def trend_inputs(metar_cleaned):
+    """TREND_COLUMNS of the cleaned METARs as a float array (one row per report)."""
+    inputs = metar_cleaned.reindex(columns=['visibility_meters', 'clouds_layer_1_altitude_category', 'wind_gust',
+                                            'altimeter_hpa'])
+    inputs['clouds_layer_1_altitude_category'] = inputs['clouds_layer_1_altitude_category'].map(CEILING_ORDER)
+    return inputs.to_numpy(dtype=np.float64)
+
+
+class _WindowIndexer(BaseIndexer):
+    # Precomputed [start, end) row bounds of every window
+    def get_window_bounds(self, num_values=0, min_periods=None, center=None, closed=None, step=None):
+        return self.start, self.end
+
+
+def rolling_trends(metar_cleaned):
+    """Rolling 1h/3h/6h change, minimum and maximum per station of every TREND_COLUMNS column.
+
+    The window of a report holds the reports of its station from (window + WINDOW_SLACK) before
+    it up to itself. Reports are sorted once by (station, time) and every window's first row is
+    found with one np.searchsorted on a combined station/time axis, so all stations and windows
+    are computed in a few vectorized passes (no per-station loop). Missing values are ignored
+    by the minimum and maximum; the change is NaN when the report or the oldest one is missing.
+
+    Args:
+        metar_cleaned (DataFrame): Output of ``metar_cleaning`` ('station', 'time.dt' and the
+            weather columns)
+
+    Returns:
+        DataFrame: trend_feature_columns(), aligned with metar_cleaned (same index and row order)
+    """
+    codes = pd.factorize(metar_cleaned['station'])[0].astype(np.int64)
+    seconds = _seconds(metar_cleaned['time.dt'])
+    order = np.lexsort((seconds, codes))
+    axis = codes[order] * STATION_SPAN + seconds[order]
+    values = trend_inputs(metar_cleaned)[order]
+    sorted_values = pd.DataFrame(values)
+    end = np.arange(1, len(order) + 1, dtype=np.int64)
+
+    features = []
+    for window in TREND_WINDOWS:
+        start = np.searchsorted(axis, axis - _window_seconds(window), side='left').astype(np.int64)
+        rolling = sorted_values.rolling(_WindowIndexer(start=start, end=end), min_periods=1)
+        stats = {'delta': values - values[start], 'min': rolling.min().to_numpy(), 'max': rolling.max().to_numpy()}
+        features.append(np.stack([stats[stat] for stat in TREND_STATS], axis=2).reshape(len(order), -1))
+
+    trends = np.empty((len(order), len(TREND_COLUMNS) * len(TREND_STATS) * len(TREND_WINDOWS)))
+    trends[order] = np.hstack(features)
+    return pd.DataFrame(trends, index=metar_cleaned.index, columns=trend_feature_columns())
+
+
+def add_trend_features(metar_cleaned):
+    """Cleaned METARs with their rolling trend columns (see ``rolling_trends``)."""
+    return metar_cleaned.join(rolling_trends(metar_cleaned))
+
+
+class StationTrends:
+    """Incremental trend state of one station, for reports arriving in time order.
+
+    Each window keeps the reports it still holds plus, per column, monotonic queues of its
+    minimum and maximum candidates; every report is pushed and popped at most once, so an
+    update costs O(1) amortized and the state never grows past the reports of the longest window.
+    """
+
+    def __init__(self):
+        self.last_time = None
+        self._windows = []
+        for window in TREND_WINDOWS:
+            self._windows.append({'seconds': _window_seconds(window),
+                                  'reports': collections.deque(),
+                                  'min': [collections.deque() for _ in TREND_COLUMNS],
+                                  'max': [collections.deque() for _ in TREND_COLUMNS]})
+
+    def update(self, seconds, values):
+        """Add a report and return its trend values, in trend_feature_columns() order.
+
+        Args:
+            seconds (int): Report time, in seconds since the epoch (UTC)
+            values (array): TREND_COLUMNS values of the report
+
+        Raises:
+            ValueError: If the report is older than the previous one
+        """
+        if self.last_time is not None and seconds < self.last_time:
+            raise ValueError('Reports must be added in time order')
+        self.last_time = seconds
+
+        features = []
+        for window in self._windows:
+            oldest_kept = seconds - window['seconds']
+            reports = window['reports']
+            reports.append((seconds, values))
+            while reports[0][0] < oldest_kept:
+                reports.popleft()
+            oldest = reports[0][1]
+
+            for column, value in enumerate(values):
+                low, high = window['min'][column], window['max'][column]
+                if not np.isnan(value):
+                    while low and low[-1][1] >= value:
+                        low.pop()
+                    low.append((seconds, value))
+                    while high and high[-1][1] <= value:
+                        high.pop()
+                    high.append((seconds, value))
+                while low and low[0][0] < oldest_kept:
+                    low.popleft()
+                while high and high[0][0] < oldest_kept:
+                    high.popleft()
+                stats = {'delta': value - oldest[column],
+                         'min': low[0][1] if low else np.nan,
+                         'max': high[0][1] if high else np.nan}
+                features.extend(stats[stat] for stat in TREND_STATS)
+
+        # Same column order as rolling_trends: window, then column, then statistic
+        return features
+
+
+class TrendTracker:
+    """Streaming trend features of every station, updated one cleaned METAR at a time.
+
+    Example:
+        tracker = TrendTracker.from_history(metar_cleaned)
+        features = tracker.update(clean_metar_record(record) | {'station': 'LSZH', 'time.dt': now})
+    """
+
+    def __init__(self):
+        self.stations = {}
+
+    @classmethod
+    def from_history(cls, metar_cleaned):
+        """Tracker warmed up with the last reports (the longest window) of every station."""
+        tracker = cls()
+        seconds = _seconds(metar_cleaned['time.dt'])
+        recent = metar_cleaned.assign(_seconds=seconds)
+        latest = recent.groupby('station')['_seconds'].transform('max')
+        recent = recent[recent['_seconds'] >= latest - max(_window_seconds(w) for w in TREND_WINDOWS)]
+        recent = recent.sort_values(['station', '_seconds'], kind='stable')
+        for station, report_seconds, values in zip(recent['station'], recent['_seconds'], trend_inputs(recent)):
+            tracker.stations.setdefault(station, StationTrends()).update(int(report_seconds), values)
+        return tracker
+
+    def update(self, report, suffix=''):
+        """Add one cleaned report and return its trend features.
+
+        Args:
+            report (dict): 'station', 'time.dt' and the cleaned weather columns, e.g.
+                ``clean_metar_record`` output plus the station and time
+            suffix (str): Appended to every feature name, e.g. '_departure' for the model input
+
+        Returns:
+            dict: trend_feature_columns() -> value
+        """
+        values = trend_inputs(pd.DataFrame([report]))[0]
+        seconds = int(_seconds([report['time.dt']])[0])
+        state = self.stations.setdefault(report['station'], StationTrends())
+        return {f'{name}{suffix}': value for name, value in zip(trend_feature_columns(), state.update(seconds, values))}
+
+
+if __name__ == '__main__':
+    # Usage: python metar_trends.py metar_data.csv metar_trends.csv
+    from metar_cleaning import metar_cleaning
+
+    metar_cleaned = metar_cleaning(pd.read_csv(sys.argv[1]))
+    start = time.perf_counter()
+    trends = rolling_trends(metar_cleaned)
+    print(f"{len(trends)} reports of {metar_cleaned['station'].nunique()} stations in "
+          f"{time.perf_counter() - start:.2f} s")
+    metar_cleaned[['station', 'time.dt']].join(trends).to_csv(sys.argv[2], index=False)
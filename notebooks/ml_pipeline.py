@@ -0,0 +1,217 @@
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.impute import SimpleImputer, KNNImputer
+from sklearn.preprocessing import OneHotEncoder, PowerTransformer, RobustScaler
+
+from imblearn.pipeline import Pipeline as ImbPipeline
+from imblearn.under_sampling import RandomUnderSampler
+
+# Feature selection and model definition from FIN_7_Machine_Learning_Training.ipynb,
+# kept here so scripts can rebuild the same pipeline without running the notebook.
+
+TARGET = 'departure_delay_binary_FA'
+
+drop_features = ['arrival_delay_binary_FA', # drop arrival-related features
+                 'flight_rules_arrival', # drop arrival-related features
+                 'visibility_meters_arrival', # drop arrival-related features
+                 'clouds_layer_1_type_arrival', # drop arrival-related features
+                 'clouds_layer_1_altitude_category_arrival', # drop arrival-related features
+                 'clouds_layer_2_type_arrival', # drop arrival-related features
+                 'clouds_layer_2_altitude_category_arrival', # drop arrival-related features
+                 'clouds_layer_3_type_arrival', # drop arrival-related features
+                 'clouds_layer_3_altitude_category_arrival', # drop arrival-related features
+                 'clouds_layer_4_type_arrival', # drop arrival-related features
+                 'clouds_layer_4_altitude_category_arrival', # drop arrival-related features
+                 'clouds_layer_5_type_arrival', # drop arrival-related features
+                 'clouds_layer_5_altitude_category_arrival', # drop arrival-related features
+                 'clouds_layer_6_type_arrival', # drop arrival-related features
+                 'clouds_layer_6_altitude_category_arrival', # drop arrival-related features
+                 'destination_region', # drop arrival-related features
+                 'destination.code_icao', # drop arrival-related features
+                 'relative_humidity_arrival', # drop arrival-related features
+                 'dewpoint_arrival', # drop arrival-related features
+                 'temperature_arrival', # drop arrival-related features
+                 'wind_speed_arrival', # drop arrival-related features
+                 'altimeter_hpa_arrival', # drop arrival-related features
+                 'pressure_altitude_arrival', # drop arrival-related features
+                 'density_altitude_arrival', # drop arrival-related features
+                 'wind_gust_arrival', # drop arrival-related features
+                 'remarks_info.sea_level_pressure_arrival', # drop arrival-related features
+                 'wind_variable_change_arrival', # drop arrival-related features
+                 'wx_code_blowing_dust_arrival', # drop arrival-related features
+                 'wx_code_blowing_snow_arrival', # drop arrival-related features
+                 'wx_code_fog_arrival', # drop arrival-related features
+                 'wx_code_funnel_cloud_arrival', # drop arrival-related features
+                 'wx_code_hail_arrival', # drop arrival-related features
+                 'wx_code_haze_arrival', # drop arrival-related features
+                 'wx_code_heavy_rain_arrival', # drop arrival-related features
+                 'wx_code_heavy_snow_arrival', # drop arrival-related features
+                 'wx_code_light_fog_arrival', # drop arrival-related features
+                 'wx_code_light_hail_arrival', # drop arrival-related features
+                 'wx_code_light_rain_arrival', # drop arrival-related features
+                 'wx_code_light_snow_arrival', # drop arrival-related features
+                 'wx_code_rain_arrival', # drop arrival-related features
+                 'wx_code_smoke_arrival', # drop arrival-related features
+                 'wx_code_snow_arrival', # drop arrival-related features
+                 'wx_code_thunderstorm_arrival', # drop arrival-related features
+                 'wx_code_vicinity_fog_arrival', # drop arrival-related features
+                 'wx_code_vicinity_showers_arrival', # drop arrival-related features
+                 'destination_sub_region', # drop arrival-related features
+                 'METAR_departure', # drop the unprocessed departure METAR
+                 'density_altitude_departure', # covered by 'pressure_altitude_departure'
+                 'visibility_meters_departure', # covered by 'flight_rules_departure'
+                 'origin_region', # covered by 'origin_sub_region'
+                 'wx_code_blowing_dust_departure', # covered by 'wx_sum_departure'
+                 'wx_code_blowing_snow_departure', # covered by 'wx_sum_departure'
+                 'wx_code_fog_departure', # covered by 'wx_sum_departure'
+                 'wx_code_funnel_cloud_departure', # covered by 'wx_sum_departure'
+                 'wx_code_hail_departure', # covered by 'wx_sum_departure'
+                 'wx_code_haze_departure', # covered by 'wx_sum_departure'
+                 'wx_code_heavy_rain_departure', # covered by 'wx_sum_departure'
+                 'wx_code_heavy_snow_departure', # covered by 'wx_sum_departure'
+                 'wx_code_light_fog_departure', # covered by 'wx_sum_departure'
+                 'wx_code_light_hail_departure', # covered by 'wx_sum_departure'
+                 'wx_code_light_rain_departure', # covered by 'wx_sum_departure'
+                 'wx_code_light_snow_departure', # covered by 'wx_sum_departure'
+                 'wx_code_rain_departure', # covered by 'wx_sum_departure'
+                 'wx_code_smoke_departure', # covered by 'wx_sum_departure'
+                 'wx_code_snow_departure', # covered by 'wx_sum_departure'
+                 'wx_code_thunderstorm_departure', # covered by 'wx_sum_departure'
+                 'wx_code_vicinity_fog_departure', # covered by 'wx_sum_departure'
+                 'wx_code_vicinity_showers_departure', # covered by 'wx_sum_departure'
+                 'wx_binary_departure', # covered by 'wx_sum_departure'
+                 'flight_rules_departure', # covered by 'LIFR_binary_departure'
+                 'flight_type', # covered by 'filed_ete'
+                 'manufacturer', # didn't lead to better model performance
+                 'clouds_layer_2_type_departure', # didn't lead to better model performance
+                 'clouds_layer_2_altitude_category_departure', # didn't lead to better model performance
+                 'clouds_layer_3_type_departure', # didn't lead to better model performance
+                 'clouds_layer_3_altitude_category_departure', # didn't lead to better model performance
+                 'clouds_layer_4_type_departure', # didn't lead to better model performance
+                 'clouds_layer_4_altitude_category_departure', # didn't lead to better model performance
+                 'clouds_layer_5_type_departure', # didn't lead to better model performance
+                 'clouds_layer_5_altitude_category_departure', # didn't lead to better model performance
+                 'clouds_layer_6_type_departure', # didn't lead to better model performance
+                 'clouds_layer_6_altitude_category_departure', # didn't lead to better model performance
+                 'remarks_info.sea_level_pressure_departure', # didn't lead to better model performance
+                 'departure_year', # only orders the flights in time (time_cv.period_index)
+                 ]
+
+categorical_features = ['operator_icao',
+                        'route_code',
+                        'aircraft_type',
+                        'origin.code_icao',
+                        'departure_time_of_day',
+                        'departure_month',
+                        'departure_weekday',
+                        'week_no',
+                        'origin_sub_region',
+                        'clouds_layer_1_type_departure',
+                        'clouds_layer_1_altitude_category_departure',
+                        ]
+
+numeric_features = ['filed_ete',
+                    'relative_humidity_departure',
+                    'dewpoint_departure',
+                    'temperature_departure',
+                    'pressure_altitude_departure',
+                    'wind_speed_departure',
+                    'wind_gust_departure',
+                    'altimeter_hpa_departure']
+
+passthrough_features = ['wind_variable_change_departure',
+                        'pressure_tendency_decreasing_or_steady_then_increasing_departure',
+                        'pressure_tendency_decreasing_steadily_or_unsteadily_departure',
+                        'pressure_tendency_decreasing_then_increasing_departure',
+                        'pressure_tendency_decreasing_then_steady_departure',
+                        'pressure_tendency_increasing_steadily_or_unsteadily_departure',
+                        'pressure_tendency_increasing_then_decreasing_departure',
+                        'pressure_tendency_increasing_then_steady_departure',
+                        'pressure_tendency_steady_departure',
+                        'pressure_tendency_steady_or_increasing_then_decreasing_departure',
+                        'wx_sum_departure',
+                        'LIFR_binary_departure']
+
+# Best hyperparameters for the Random Forest model
+best_params = {
+    'bootstrap': True,  # Use bootstrap sampling (random sampling with replacement)
+    'max_features': 'log2',  # Limit the number of features to log2(n_features) for each split
+    'n_estimators': 65  # Number of trees in the forest
+}
+
+
+def select_model_features(df):
+    """Drop the target, arrival-side columns and de-selected features from a FIN_6 output frame.
+
+    Args:
+        df (DataFrame): Pre-processed flight + METAR data
+
+    Returns:
+        DataFrame: Feature matrix X in the layout expected by ``build_pipeline_rf_rus``
+    """
+    return df.drop(columns=[TARGET] + drop_features, errors='ignore')
+
+
+def build_preprocessor(categorical=categorical_features, numeric=numeric_features, imputed=()):
+    """ColumnTransformer used by ``pipeline_rf_rus`` (other columns are passed through).
+
+    ``imputed`` columns are often missing by design (the inbound leg features of the first flight
+    of a rotation, trends without an earlier report in their window): they are median imputed,
+    with a missing flag per column, but not power transformed.
+    """
+    # Define a pipeline for preprocessing categorical features
+    categorical_transformer = Pipeline(steps=[
+        # Impute missing categorical values with 'Not Available'
+        ("cat_imputer", SimpleImputer(strategy='constant',
+                                      fill_value='Not Available').set_output(transform="pandas")),
+
+        # Apply One-Hot Encoding to categorical variables (ignores unknown categories)
+        ("onehot", OneHotEncoder(sparse_output=False,
+                                 handle_unknown="ignore").set_output(transform="pandas"))
+    ])
+
+    # Define a pipeline for preprocessing numerical features
+    numeric_transformer = Pipeline(steps=[
+        # Use KNN imputation to fill missing values based on nearest neighbors
+        ("knn_imputer", KNNImputer(n_neighbors=5).set_output(transform="pandas")),
+
+        # Apply a power transformation to correct skewed data distributions (Yeo-Johnson method)
+        ('power_transform', PowerTransformer(method='yeo-johnson')),
+
+        # Use Robust Scaler to scale features, handling outliers by using the median and interquartile range
+        ('robust_scaler', RobustScaler())
+    ])
+
+    transformers = [
+        ("num", numeric_transformer, list(numeric)),
+        ("cat", categorical_transformer, list(categorical))
+    ]
+    if len(imputed):
+        # Median imputation plus a missing flag per column (e.g. "no inbound leg"), so no NaN reaches the forest
+        transformers.append(("imp", SimpleImputer(strategy='median', add_indicator=True,
+                                                  keep_empty_features=True), list(imputed)))
+
+    return ColumnTransformer(transformers=transformers,
+    remainder='passthrough'
+    ).set_output(transform="pandas")
+
+
+def build_pipeline_rf_rus(categorical=categorical_features, numeric=numeric_features, imputed=(), **model_params):
+    """Unfitted pre-processing + random under-sampling + random forest pipeline from FIN_7.
+
+    Args:
+        categorical (list): Categorical feature columns (one-hot encoded)
+        numeric (list): Numeric feature columns (KNN imputed, power transformed, robust scaled)
+        imputed (list): Optional feature columns that are median imputed with missing flags
+        **model_params: Overrides for the RandomForestClassifier parameters
+
+    Returns:
+        Pipeline: imblearn pipeline with steps 'pre_process', 'rus' and 'model'
+    """
+    rf = RandomForestClassifier(random_state=42)
+    return ImbPipeline(steps=[
+        ("pre_process", build_preprocessor(categorical, numeric, imputed)),
+        ("rus", RandomUnderSampler(random_state=42)),
+        ("model", rf.set_params(**{**best_params, **model_params}))
+    ])
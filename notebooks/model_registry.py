@@ -0,0 +1,231 @@
+import os
+import re
+import time
+import argparse
+import threading
+import collections
+
+import numpy as np
+import pandas as pd
+import joblib
+
+# Model scopes, most specific first: a flight is scored by the model of its route if there is
+# one, else by the model of its origin sub-region, else by the global model
+SCOPES = ['route_code', 'origin_sub_region', 'global']
+
+# Key of the single global model
+GLOBAL_KEY = 'all'
+
+# Artifacts are stored as <root>/<scope>/<key>/v<version>.pkl
+_VERSION_FILE = re.compile(r'^v(\d+)\.pkl$')
+
+
+class ModelRegistry:
+    """Versioned pipelines per scope (route, origin sub-region, global), loaded on demand.
+
+    The registry only indexes the artifact files when it is created; a model is loaded with
+    joblib the first time a flight needs it and then kept in an LRU of at most max_models
+    models (and max_bytes of artifact size, if given), so any number of scoped models can be
+    deployed side by side.
+
+    Args:
+        root (str): Artifact directory
+        max_models (int): Models kept in memory
+        max_bytes (int): Largest total artifact size kept in memory (None for no limit)
+    """
+
+    def __init__(self, root, max_models=8, max_bytes=None):
+        self.root = root
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self.versions = {}
+        for scope in SCOPES:
+            scope_dir = os.path.join(root, scope)
+            for key in sorted(os.listdir(scope_dir)) if os.path.isdir(scope_dir) else []:
+                files = os.listdir(os.path.join(scope_dir, key))
+                found = [int(m.group(1)) for m in map(_VERSION_FILE.match, files) if m]
+                if found:
+                    self.versions[(scope, key)] = sorted(found)
+        self._resident = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+        self.load_seconds = []
+
+    def path(self, scope, key, version):
+        return os.path.join(self.root, scope, key, f'v{version}.pkl')
+
+    def register(self, pipeline, scope='global', key=GLOBAL_KEY):
+        """Save a fitted pipeline as the next version of a scope key.
+
+        Returns:
+            int: The new version
+
+        Raises:
+            ValueError: If the scope is unknown or the key cannot be a directory name
+        """
+        if scope not in SCOPES:
+            raise ValueError(f"Unknown scope {scope}, expected one of {SCOPES}")
+        if not key or os.sep in key or key.startswith('.'):
+            raise ValueError(f"Invalid {scope} key {key!r}")
+        version = self.versions.get((scope, key), [0])[-1] + 1
+        path = self.path(scope, key, version)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written under a temporary name so a reader never loads half a file
+        joblib.dump(pipeline, path + '.tmp')
+        os.replace(path + '.tmp', path)
+        self.versions.setdefault((scope, key), []).append(version)
+        return version
+
+    def get(self, scope, key, version=None):
+        """Fitted pipeline of a scope key (latest version by default), loaded if not resident.
+
+        Raises:
+            KeyError: If no such model is registered
+        """
+        versions = self.versions.get((scope, key))
+        if not versions or (version is not None and version not in versions):
+            raise KeyError(f"No model registered for {scope}={key}" + (f" version {version}" if version else ''))
+        entry = (scope, key, version or versions[-1])
+
+        with self._lock:
+            if entry in self._resident:
+                self.hits += 1
+                self._resident.move_to_end(entry)
+                return self._resident[entry][0]
+            self.misses += 1
+            path = self.path(*entry)
+            start = time.perf_counter()
+            pipeline = joblib.load(path)
+            self.load_seconds.append(time.perf_counter() - start)
+            self._resident[entry] = (pipeline, os.path.getsize(path))
+            # Least recently used models go first; the model just loaded always stays
+            while len(self._resident) > 1 and (len(self._resident) > self.max_models or (
+                    self.max_bytes is not None and self.resident_bytes() > self.max_bytes)):
+                self._resident.popitem(last=False)
+                self.evictions += 1
+            return pipeline
+
+    def resident_bytes(self):
+        return sum(size for _, size in self._resident.values())
+
+    def resolve(self, df):
+        """Most specific registered model of every flight.
+
+        Args:
+            df (DataFrame): Flights with the model features ('route_code' and 'origin_sub_region')
+
+        Returns:
+            tuple: (array of scopes, array of keys), None where no model covers the flight
+        """
+        scopes = np.full(len(df), None, dtype=object)
+        keys = np.full(len(df), None, dtype=object)
+        if ('global', GLOBAL_KEY) in self.versions:
+            scopes[:], keys[:] = 'global', GLOBAL_KEY
+        # From the least to the most specific scope, so the most specific model wins
+        for scope in reversed(SCOPES[:-1]):
+            registered = [key for s, key in self.versions if s == scope]
+            if scope not in df.columns or not registered:
+                continue
+            values = df[scope].to_numpy(dtype=object)
+            covered = pd.Index(registered).get_indexer(values) >= 0
+            scopes[covered], keys[covered] = scope, values[covered]
+        return scopes, keys
+
+    def predict_proba(self, df):
+        """Probability of a delay of every flight, each scored by its most specific model.
+
+        Flights are grouped by model and every group is scored with one predict_proba call.
+
+        Args:
+            df (DataFrame): Model features (see ``ml_pipeline.select_model_features``)
+
+        Returns:
+            DataFrame: 'predicted_prob_class_1' and 'model' ('<scope>=<key>'), aligned with df
+
+        Raises:
+            KeyError: If some flights are not covered by any model (register a global one)
+        """
+        scopes, keys = self.resolve(df)
+        if pd.isna(keys).any():
+            raise KeyError(f"{pd.isna(keys).sum()} flights are not covered by any model")
+        models = pd.Series(scopes + '=' + keys, index=df.index)
+        probability = np.empty(len(df))
+        for model, rows in models.groupby(models.to_numpy(), sort=False).indices.items():
+            scope, key = model.split('=', 1)
+            pipeline = self.get(scope, key)
+            X = df.iloc[rows]
+            X = X[list(pipeline.feature_names_in_)] if hasattr(pipeline, 'feature_names_in_') else X
+            probability[rows] = pipeline.predict_proba(X)[:, list(pipeline.classes_).index(1)]
+        return pd.DataFrame({'predicted_prob_class_1': probability, 'model': models})
+
+    def stats(self):
+        """Cache and load statistics."""
+        requests = self.hits + self.misses
+        return {'registered': len(self.versions),
+                'resident': len(self._resident),
+                'resident_mb': round(self.resident_bytes() / 2**20, 1),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / requests, 3) if requests else None,
+                'evictions': self.evictions,
+                'loads': len(self.load_seconds),
+                'load_seconds_total': round(sum(self.load_seconds), 3),
+                'load_seconds_mean': round(float(np.mean(self.load_seconds)), 3) if self.load_seconds else None}
+
+
+def train_scoped(registry, df, scope='origin_sub_region', min_flights=5000, **model_params):
+    """Fit and register a model per value of a scope with enough flights, plus a global model.
+
+    Args:
+        registry (ModelRegistry): Where the models are registered
+        df (DataFrame): Pre-processed flights (FIN_6 output)
+        scope (str): 'route_code' or 'origin_sub_region'
+        min_flights (int): Fewest flights of a scoped model (the others fall back to the global one)
+        **model_params: Overrides for the RandomForestClassifier parameters
+
+    Returns:
+        dict: (scope, key) -> registered version
+    """
+    from ml_pipeline import TARGET, build_pipeline_rf_rus, select_model_features
+
+    X, y = select_model_features(df), df[TARGET]
+    registered = {('global', GLOBAL_KEY): registry.register(build_pipeline_rf_rus(**model_params).fit(X, y))}
+    counts = df[scope].value_counts()
+    for key in counts.index[counts >= min_flights]:
+        rows = (df[scope] == key).to_numpy()
+        if y[rows].nunique() < 2:
+            continue
+        pipeline = build_pipeline_rf_rus(**model_params).fit(X[rows], y[rows])
+        registered[(scope, key)] = registry.register(pipeline, scope, key)
+    return registered
+
+
+if __name__ == '__main__':
+    # Usage: python model_registry.py models/ train df_preprocessed.csv --scope origin_sub_region --min-flights 5000
+    #        python model_registry.py models/ score df_preprocessed.csv --max-models 4
+    parser = argparse.ArgumentParser(description='Train, register and serve models per route or region.')
+    parser.add_argument('root', help='artifact directory')
+    parser.add_argument('command', choices=['train', 'score'])
+    parser.add_argument('data', help='pre-processed flights (FIN_6 output)')
+    parser.add_argument('--scope', default='origin_sub_region', choices=SCOPES[:-1])
+    parser.add_argument('--min-flights', type=int, default=5000)
+    parser.add_argument('--max-models', type=int, default=8)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.data, low_memory=False)
+    registry = ModelRegistry(args.root, max_models=args.max_models)
+    if args.command == 'train':
+        for (scope, key), version in train_scoped(registry, df, args.scope, args.min_flights).items():
+            print(f"{scope}={key}: version {version}")
+    else:
+        from ml_pipeline import TARGET, select_model_features
+
+        start = time.perf_counter()
+        scored = registry.predict_proba(select_model_features(df))
+        print(f"{len(df)} flights scored by {scored['model'].nunique()} models in {time.perf_counter() - start:.1f} s")
+        if TARGET in df.columns:
+            from sklearn.metrics import roc_auc_score
+            print(scored.assign(y=df[TARGET]).groupby('model').apply(
+                lambda g: pd.Series({'flights': len(g), 'roc_auc': roc_auc_score(g['y'], g['predicted_prob_class_1'])
+                                     if g['y'].nunique() > 1 else np.nan})).round(3).to_string())
+        print(registry.stats())
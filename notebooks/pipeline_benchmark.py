@@ -0,0 +1,152 @@
+import os
+import sys
+import time
+import argparse
+import warnings
+import numpy as np
+import pandas as pd
+
+from synthetic_data import synthetic_dataset
+from metar_cleaning import metar_cleaning
+from preprocessing import merge_metar_to_flights, prepare_flights, preprocess_for_ml
+from time_cv import period_index
+from step_profiler import PeakRss
+import ml_pipeline
+
+# The dashboard helpers live next to the Streamlit app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'streamlit'))
+from streamlit_depdelay_graph import departure_delay_prog_for_route_group
+from streamlit_stats_graphs import streamlit_prediction_stats
+
+STAGES = ['generate', 'metar_cleaning', 'preprocessing', 'train', 'predict', 'dashboard']
+
+
+def dashboard_frames(flights_df, df_test, y_test, proba, threshold=0.5):
+    """Inputs of the dashboard pages, built as in FIN_9 from raw flights and test predictions.
+
+    Args:
+        flights_df (DataFrame): Raw FlightAware records
+        df_test (DataFrame): Pre-processed test rows (needs 'route_code')
+        y_test (array): True labels of the test rows
+        proba (array): Predicted probability of delay for the test rows
+        threshold (float): Threshold of the static TP/FP/TN/FN columns
+
+    Returns:
+        tuple: (df_names_routes, df_ml_results)
+    """
+    df_raw = flights_df.dropna(subset=['scheduled_out', 'ident_icao', 'registration', 'aircraft_type']).copy()
+    df_raw['departure_delay_binary'] = np.where(df_raw['departure_delay'] >= 15*60, 'delayed', 'on_time')
+    df_raw['ICAO_route'] = df_raw['origin.code_icao'] + '-' + df_raw['destination.code_icao']
+    df_raw['scheduled_out'] = pd.to_datetime(df_raw['scheduled_out'], utc=True).dt.tz_localize(None)
+    df_raw['year_week'] = df_raw['scheduled_out'].dt.to_period('W').dt.to_timestamp()
+    df_raw['origin_region'] = prepare_flights(flights_df)['origin_region'].reindex(df_raw.index)
+    df_raw['origin_airport_name'] = df_raw['origin.name']
+    df_raw['origin_airport_location'] = df_raw['origin.code_iata']
+
+    y_test = np.asarray(y_test).astype(int)
+    predicted = (np.asarray(proba) >= threshold).astype(int)
+    df_ml_results = pd.DataFrame({'route_code': df_test['route_code'].to_numpy(),
+                                  'true_label': y_test,
+                                  'predicted_label': predicted,
+                                  'predicted_prob_class_1': proba,
+                                  'TP': (y_test == 1) & (predicted == 1),
+                                  'FP': (y_test == 0) & (predicted == 1),
+                                  'TN': (y_test == 0) & (predicted == 0),
+                                  'FN': (y_test == 1) & (predicted == 0)})
+    return df_raw, df_ml_results
+
+
+def run_benchmark(scale, stages=STAGES, max_train_rows=None, seed=42):
+    """Time every pipeline stage on a synthetic dataset of the given scale.
+
+    Args:
+        scale (float): Multiple of the project's 220k-flight dataset
+        stages (list): Stages to time; the others still run (untimed) when a later stage needs them
+        max_train_rows (int): Optional cap on the training rows (KNNImputer scales quadratically)
+        seed (int): Random seed of the synthetic data
+
+    Returns:
+        DataFrame: One row per stage with rows processed, seconds, rows/second, the peak RSS
+            during the stage and its increase over the RSS at the start of the stage
+    """
+    results = []
+
+    def timed(stage, n_rows, func, *args, **kwargs):
+        # Current RSS sampled during the stage (ru_maxrss would be the peak of every earlier stage too)
+        with PeakRss() as rss:
+            start = time.perf_counter()
+            output = func(*args, **kwargs)
+            seconds = time.perf_counter() - start
+        if stage in stages:
+            results.append({'scale': scale, 'stage': stage,
+                            'step': getattr(func, '__name__', stage), 'rows': n_rows, 'seconds': seconds,
+                            'rows_per_second': n_rows / seconds if seconds > 0 else np.nan,
+                            'peak_rss_mb': rss.peak / 2**20,
+                            'peak_rss_delta_mb': (rss.peak - rss.start) / 2**20})
+        return output
+
+    last = max(STAGES.index(stage) for stage in stages)
+
+    metar_data_df, flights_df = timed('generate', int(220_000 * scale), synthetic_dataset, scale=scale, seed=seed)
+    if last < STAGES.index('metar_cleaning'):
+        return pd.DataFrame(results)
+
+    metar_cleaned = timed('metar_cleaning', len(metar_data_df), metar_cleaning, metar_data_df)
+    if last < STAGES.index('preprocessing'):
+        return pd.DataFrame(results)
+
+    def preprocess():
+        return preprocess_for_ml(merge_metar_to_flights(prepare_flights(flights_df), metar_cleaned))
+
+    df = timed('preprocessing', len(flights_df), preprocess)
+    if last < STAGES.index('train'):
+        return pd.DataFrame(results)
+
+    # Last 20% of the weeks are held out, as a time-ordered test split (year and ISO week, see period_index)
+    period = period_index(df)
+    cutoff = np.quantile(period, 0.8)
+    train_rows = np.flatnonzero(period <= cutoff)
+    test_rows = np.flatnonzero(period > cutoff)
+    if max_train_rows is not None and len(train_rows) > max_train_rows:
+        train_rows = np.random.default_rng(seed).choice(train_rows, max_train_rows, replace=False)
+
+    X = ml_pipeline.select_model_features(df.drop(columns='scheduled_out', errors='ignore'))
+    y = df[ml_pipeline.TARGET].to_numpy()
+    X_train, y_train = X.iloc[train_rows], y[train_rows]
+    X_test, y_test = X.iloc[test_rows], y[test_rows]
+
+    pipeline = timed('train', len(X_train), ml_pipeline.build_pipeline_rf_rus().fit, X_train, y_train)
+    if last < STAGES.index('predict'):
+        return pd.DataFrame(results)
+
+    proba = timed('predict', len(X_test), pipeline.predict_proba, X_test)[:, 1]
+    if last < STAGES.index('dashboard'):
+        return pd.DataFrame(results)
+
+    # Dashboard callbacks for the busiest airport and route, as when a user clicks the map
+    df_names_routes, df_ml_results = dashboard_frames(flights_df, df.iloc[test_rows], y_test, proba)
+    airport = df_names_routes['origin.code_icao'].value_counts().index[0]
+    route = df_ml_results['route_code'].value_counts().index[0]
+    timed('dashboard', len(df_names_routes), departure_delay_prog_for_route_group, df_names_routes, airport)
+    timed('dashboard', len(df_ml_results), streamlit_prediction_stats, df_ml_results, route, 0.5)
+
+    return pd.DataFrame(results)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time the FFL pipeline on synthetic data at several scales.')
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 10, 100],
+                        help='multiples of the 220k-flight project dataset')
+    parser.add_argument('--stages', nargs='+', default=STAGES, choices=STAGES)
+    parser.add_argument('--max-train-rows', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='pipeline_benchmark.csv')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    report = []
+    for scale in args.scales:
+        report.append(run_benchmark(scale, stages=args.stages, max_train_rows=args.max_train_rows, seed=args.seed))
+        print(report[-1].to_string(index=False))
+    pd.concat(report, ignore_index=True).to_csv(args.output, index=False)
+    print(f"Saved to {args.output}")
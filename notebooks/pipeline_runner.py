@@ -0,0 +1,462 @@
+import os
+import sys
+import ast
+import json
+import time
+import shutil
+import hashlib
+import inspect
+import argparse
+import textwrap
+import importlib
+import importlib.util
+import warnings
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+import pandas as pd
+import joblib
+
+# FIN_5 to FIN_9 as a DAG of cached stages. Each stage's output is stored under
+# <cache>/<stage>/<key>/, where the key is the sha256 of the stage code, its parameters and the
+# content digests of its inputs; a stage whose key is already in the cache is skipped, and a
+# stage that reruns but produces the same output leaves everything downstream cached.
+
+DEFAULT_CACHE_DIR = '.pipeline_cache'
+
+# Modules under this directory (the notebooks and the dashboard helpers) are part of the code digests
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Files written by --output-dir, per stage output (the names read by the notebooks and the dashboard)
+EXPORTS = {
+    'train': 'pipeline_rf_rus_model.pkl',
+    'shap_aggregates': 'shap_aggregates.joblib',
+    'dashboard': {'depdelays_per_airport': 'streamlit_map_1_depdelays_per_airport.csv',
+                  'names_routes': 'streamlit_map_1_names_routes.csv',
+                  'ml_results': 'streamlit_map_2_ml_results.csv',
+                  'route_cities': 'streamlit_map_2_route_cities.csv'},
+}
+
+
+# ---------- Stage functions (run in worker processes) ----------
+
+def clean_metars(metar_raw):
+    from metar_cleaning import metar_cleaning
+    return metar_cleaning(metar_raw)
+
+
+def prepare_flight_records(flights_raw, inbound=False):
+    from preprocessing import prepare_flights
+    if not inbound:
+        return prepare_flights(flights_raw)
+
+    # Delay propagation from the aircraft's previous legs, chained on the raw records so filtered legs still count
+    from flight_chains import add_inbound_features
+    return prepare_flights(add_inbound_features(flights_raw))
+
+
+def preprocess(flights_prepared, metar_cleaned, tolerance='3h', trends=False):
+    from preprocessing import merge_metar_to_flights, preprocess_for_ml
+    if not trends:
+        return preprocess_for_ml(merge_metar_to_flights(flights_prepared, metar_cleaned, tolerance=tolerance))
+
+    # Rolling weather trends of the departure station (the arrival side is not a model input). The train
+    # stage median imputes them rather than power transforming them (it overflows on the mostly-zero deltas)
+    from metar_trends import add_trend_features, trend_feature_columns
+    merged = merge_metar_to_flights(flights_prepared, add_trend_features(metar_cleaned), tolerance=tolerance)
+    return preprocess_for_ml(merged.drop(columns=trend_feature_columns('arrival')))
+
+
+def split(df_preprocessed, test_size=0.2, random_state=42):
+    # Stratified random split of FIN_7 (the index of df_preprocessed is the flight key downstream)
+    from sklearn.model_selection import train_test_split
+    from ml_pipeline import TARGET, select_model_features
+
+    X = select_model_features(df_preprocessed.drop(columns='scheduled_out', errors='ignore'))
+    y = df_preprocessed[TARGET]
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=random_state,
+                                                        stratify=y)
+    return {'X_train': X_train, 'X_test': X_test, 'y_train': y_train, 'y_test': y_test}
+
+
+def train(split, **model_params):
+    from ml_pipeline import build_pipeline_rf_rus
+    from flight_chains import INBOUND_FEATURES
+    from metar_trends import trend_feature_columns
+
+    # Missing by design (first leg of a rotation, no earlier report in a trend window): median imputed
+    # with a missing flag
+    optional = INBOUND_FEATURES + trend_feature_columns('departure')
+    imputed = [c for c in optional if c in split['X_train'].columns]
+    return build_pipeline_rf_rus(imputed=imputed, **model_params).fit(split['X_train'], split['y_train'])
+
+
+def predict(train, split):
+    # Probability of a delay for every test flight
+    proba = train.predict_proba(split['X_test'])[:, list(train.classes_).index(1)]
+    return pd.Series(proba, index=split['X_test'].index, name='predicted_prob_class_1')
+
+
+def shap_values(train, split, path, background_size=100, n_jobs=None):
+    from shap_cache import build_shap_store
+    build_shap_store(train, split['X_test'], path, X_background=split['X_train'],
+                     background_size=background_size, n_jobs=n_jobs)
+
+
+def shap_aggregates(shap_values, df_preprocessed):
+    from shap_cache import ShapStore
+    from shap_aggregates import ShapAggregates, raw_feature_names
+
+    store = ShapStore(shap_values)
+    aggregates = ShapAggregates(list(dict.fromkeys(raw_feature_names(store.feature_names))))
+    aggregates.update(store, df_preprocessed)
+    return aggregates
+
+
+def dashboard(flights_raw, df_preprocessed, split, predict, threshold=0.5):
+    """FIN_9 dashboard datasets (see streamlit/streamlit_data_loader.DATASETS)."""
+    import avwx
+    from pipeline_benchmark import dashboard_frames
+
+    df_test = df_preprocessed.loc[split['X_test'].index]
+    df_names_routes, df_ml_results = dashboard_frames(flights_raw, df_test, split['y_test'], predict.to_numpy(),
+                                                      threshold)
+    df_ml_results['origin.code_icao'] = df_test['origin.code_icao'].to_numpy()
+    df_ml_results['METAR_departure_ref'] = df_test['METAR_departure'].to_numpy()
+    df_ml_results['ML_index'] = np.arange(len(df_ml_results))
+
+    # Airport coordinates and cities from the offline avwx station database
+    def station(icao):
+        try:
+            return avwx.Station.from_icao(icao)
+        except avwx.exceptions.BadStation:
+            return None
+    stations = {icao: station(icao) for icao in pd.unique(df_names_routes[['origin.code_icao', 'destination.code_icao']]
+                                                          .to_numpy().ravel())}
+
+    airports = df_names_routes.groupby('origin.code_icao').agg(
+        delayed_count=('departure_delay_binary', lambda x: (x == 'delayed').sum()),
+        num_flights=('departure_delay_binary', 'size')).reset_index()
+    airports['origin_airport_lat'] = airports['origin.code_icao'].map(lambda c: getattr(stations[c], 'latitude', np.nan))
+    airports['origin_airport_lon'] = airports['origin.code_icao'].map(lambda c: getattr(stations[c], 'longitude', np.nan))
+    airports['delay_percentage'] = airports['delayed_count'] / airports['num_flights'] * 100
+
+    routes = df_names_routes.drop_duplicates('ICAO_route')
+    city = lambda icao: getattr(stations[icao], 'city', None) or icao
+    route_cities = pd.DataFrame({'route_code': routes['ICAO_route'].to_numpy(),
+                                 'origin': routes['origin.code_icao'].map(city).to_numpy(),
+                                 'destination': routes['destination.code_icao'].map(city).to_numpy(),
+                                 'origin.icao_code': routes['origin.code_icao'].to_numpy()})
+    route_cities.insert(3, 'route_cities', route_cities['origin'] + ' - ' + route_cities['destination'])
+
+    return {'depdelays_per_airport': airports, 'names_routes': df_names_routes,
+            'ml_results': df_ml_results, 'route_cities': route_cities}
+
+
+def _imported_modules(source):
+    # Absolute imports anywhere in the code, including the ones inside functions
+    for node in ast.walk(ast.parse(textwrap.dedent(source))):
+        if isinstance(node, ast.Import):
+            yield from (alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            yield node.module
+
+
+def project_imports(source, found=None):
+    """Project modules imported by some code, directly or through other project modules.
+
+    Args:
+        source (str): Python source code
+        found (dict): Modules already collected (filled in place)
+
+    Returns:
+        dict: Module name -> source file, for the modules under PROJECT_DIR
+    """
+    found = {} if found is None else found
+    for name in _imported_modules(source):
+        if name in found:
+            continue
+        try:
+            spec = importlib.util.find_spec(name)
+        except (ImportError, ValueError):
+            continue
+        origin = getattr(spec, 'origin', None)
+        if not origin or not os.path.isfile(origin) or not os.path.abspath(origin).startswith(PROJECT_DIR + os.sep):
+            continue
+        found[name] = origin
+        with open(origin, encoding='utf-8') as f:
+            project_imports(f.read(), found)
+    return found
+
+
+class Stage:
+    """One step of the DAG.
+
+    Args:
+        name (str): Stage name, also the name its output is passed to downstream stages under
+        func (callable): Called with the loaded inputs (in order) and the parameters as keywords
+        inputs (list): Source names (raw CSV files) or upstream stage names
+        params (dict): Default parameters (part of the cache key)
+        modules (list): Modules whose source code is part of the cache key, together with every
+            project module they or func import (see ``project_imports``)
+        writes_files (bool): func writes a directory (given as ``path``) instead of returning an object
+    """
+
+    def __init__(self, name, func, inputs, params=None, modules=(), writes_files=False):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.params = dict(params or {})
+        self.modules = list(modules)
+        self.writes_files = writes_files
+
+    def code_digest(self):
+        source = inspect.getsource(self.func)
+        digest = hashlib.sha256(source.encode())
+        files = {module: importlib.import_module(module).__file__ for module in self.modules}
+        project_imports(source, files)
+        for module in self.modules:
+            with open(files[module], encoding='utf-8') as f:
+                project_imports(f.read(), files)
+        for module in sorted(files):
+            digest.update(module.encode())
+            with open(files[module], 'rb') as f:
+                digest.update(f.read())
+        return digest.hexdigest()
+
+
+# Raw inputs: the AVWX METAR export of FIN_4 and the FlightAware records of FIN_3
+SOURCES = ['metar_raw', 'flights_raw']
+
+STAGES = {stage.name: stage for stage in [
+    Stage('metar_cleaned', clean_metars, ['metar_raw'], modules=['metar_cleaning']),
+    Stage('flights_prepared', prepare_flight_records, ['flights_raw'], {'inbound': False},
+          modules=['preprocessing', 'flight_chains']),
+    Stage('df_preprocessed', preprocess, ['flights_prepared', 'metar_cleaned'], {'tolerance': '3h', 'trends': False},
+          modules=['preprocessing', 'metar_trends']),
+    Stage('split', split, ['df_preprocessed'], {'test_size': 0.2, 'random_state': 42}, modules=['ml_pipeline']),
+    Stage('train', train, ['split'], modules=['ml_pipeline', 'flight_chains', 'metar_trends']),
+    Stage('predict', predict, ['train', 'split']),
+    Stage('shap_values', shap_values, ['train', 'split'], {'background_size': 100},
+          modules=['shap_cache'], writes_files=True),
+    Stage('shap_aggregates', shap_aggregates, ['shap_values', 'df_preprocessed'],
+          modules=['shap_aggregates', 'shap_cache']),
+    Stage('dashboard', dashboard, ['flights_raw', 'df_preprocessed', 'split', 'predict'], {'threshold': 0.5},
+          modules=['pipeline_benchmark', 'preprocessing']),
+]}
+
+
+# ---------- Cache ----------
+
+def file_digest(path, chunk_size=1 << 20):
+    """sha256 of a file, or of every file of a directory (names and contents, in sorted order)."""
+    digest = hashlib.sha256()
+    paths = [path] if os.path.isfile(path) else sorted(
+        os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+    for file_path in paths:
+        digest.update(os.path.relpath(file_path, path).encode())
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stage_key(stage, params, input_digests):
+    description = {'stage': stage.name, 'code': stage.code_digest(), 'params': params,
+                   'inputs': {name: input_digests[name] for name in stage.inputs}}
+    return hashlib.sha256(json.dumps(description, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _entry_dir(cache_dir, stage_name, key):
+    return os.path.join(cache_dir, stage_name, key[:16])
+
+
+def _output_path(entry_dir):
+    return os.path.join(entry_dir, 'output')
+
+
+def _read_manifest(entry_dir):
+    try:
+        with open(os.path.join(entry_dir, 'manifest.json')) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def load_output(entry_dir):
+    """Output of a cached stage (the directory path for stages that write files)."""
+    manifest = _read_manifest(entry_dir)
+    return _output_path(entry_dir) if manifest['writes_files'] else joblib.load(_output_path(entry_dir))
+
+
+def _execute(stage_name, params, inputs, entry_dir):
+    """Worker: load the inputs, run one stage and store its output atomically in entry_dir."""
+    warnings.filterwarnings('ignore')
+    stage = STAGES[stage_name]
+    start = time.perf_counter()
+    args = [pd.read_csv(location, low_memory=False) if kind == 'source' else load_output(location)
+            for kind, location in inputs]
+
+    tmp_dir = f'{entry_dir}.tmp{os.getpid()}'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    if stage.writes_files:
+        stage.func(*args, path=_output_path(tmp_dir), **params)
+    else:
+        joblib.dump(stage.func(*args, **params), _output_path(tmp_dir))
+
+    manifest = {'stage': stage_name, 'params': params, 'writes_files': stage.writes_files,
+                'digest': file_digest(_output_path(tmp_dir)), 'seconds': time.perf_counter() - start,
+                'created': time.time()}
+    with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, default=str)
+    shutil.rmtree(entry_dir, ignore_errors=True)
+    os.replace(tmp_dir, entry_dir)
+    return manifest
+
+
+def _required(targets):
+    # Targets and everything upstream of them, in definition order (STAGES is topologically sorted)
+    required = set()
+    todo = list(targets)
+    while todo:
+        name = todo.pop()
+        if name in STAGES and name not in required:
+            required.add(name)
+            todo.extend(STAGES[name].inputs)
+    return [name for name in STAGES if name in required]
+
+
+def run_pipeline(sources, cache_dir=DEFAULT_CACHE_DIR, targets=None, params=None, force=(), jobs=None, log=print):
+    """Run the stages needed for targets, skipping those whose cache key is unchanged.
+
+    Stages whose inputs are ready run in parallel in a process pool (METAR cleaning and flight
+    preparation first, then SHAP and the dashboard datasets once the model is trained).
+
+    Args:
+        sources (dict): Path of the raw CSV of every name in SOURCES
+        cache_dir (str): Cache directory
+        targets (list): Stages to bring up to date (default: all)
+        params (dict): stage -> parameter overrides
+        force (iterable): Stages to rerun even if cached
+        jobs (int): Worker processes (default: os.cpu_count())
+        log (callable): Progress messages
+
+    Returns:
+        DataFrame: 'stage', 'status' ('cached' or 'ran'), 'seconds', 'key' and 'entry' (cache directory)
+    """
+    missing = [name for name in SOURCES if name not in sources]
+    if missing:
+        raise ValueError(f"Missing source files: {', '.join(missing)}")
+    unknown = set(targets or []) | set(params or {}) | set(force)
+    unknown -= set(STAGES)
+    if unknown:
+        raise ValueError(f"Unknown stages: {', '.join(sorted(unknown))}")
+
+    digests = {name: file_digest(path) for name, path in sources.items()}
+    entries = {}
+    pending = _required(targets or list(STAGES))
+    rows = []
+    with ProcessPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+        running = {}
+        while pending or running:
+            for name in [n for n in pending if all(i in digests for i in STAGES[n].inputs)]:
+                pending.remove(name)
+                stage = STAGES[name]
+                stage_params = dict(stage.params, **(params or {}).get(name, {}))
+                key = stage_key(stage, stage_params, digests)
+                entry_dir = _entry_dir(cache_dir, name, key)
+                manifest = _read_manifest(entry_dir)
+                if manifest is not None and name not in force:
+                    digests[name], entries[name] = manifest['digest'], entry_dir
+                    rows.append({'stage': name, 'status': 'cached', 'seconds': 0.0, 'key': key[:16], 'entry': entry_dir})
+                    log(f"{name}: cached")
+                    continue
+                inputs = [('source', sources[i]) if i in sources else ('stage', entries[i]) for i in stage.inputs]
+                log(f"{name}: running")
+                running[pool.submit(_execute, name, stage_params, inputs, entry_dir)] = (name, key, entry_dir)
+
+            if not running:
+                # Cached stages may have made others ready
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, key, entry_dir = running.pop(future)
+                manifest = future.result()
+                digests[name], entries[name] = manifest['digest'], entry_dir
+                rows.append({'stage': name, 'status': 'ran', 'seconds': manifest['seconds'], 'key': key[:16],
+                             'entry': entry_dir})
+                log(f"{name}: done in {manifest['seconds']:.1f} s")
+    return pd.DataFrame(rows)
+
+
+def export_outputs(report, output_dir):
+    """Copy the model, SHAP aggregates and dashboard datasets of a run to output_dir (see EXPORTS)."""
+    os.makedirs(output_dir, exist_ok=True)
+    entries = dict(zip(report['stage'], report['entry']))
+    written = []
+    for name, file_names in EXPORTS.items():
+        if name not in entries:
+            continue
+        if isinstance(file_names, dict):
+            tables = load_output(entries[name])
+            for table, file_name in file_names.items():
+                # The dashboard loaders read the columns only, the row index is not written
+                tables[table].to_csv(os.path.join(output_dir, file_name), index=False)
+                written.append(file_name)
+        else:
+            shutil.copyfile(_output_path(entries[name]), os.path.join(output_dir, file_names))
+            written.append(file_names)
+    return written
+
+
+def _parse_params(assignments):
+    # ['train.n_estimators=200', 'split.test_size=0.25'] -> {'train': {'n_estimators': 200}, ...}
+    params = {}
+    for assignment in assignments:
+        name, _, value = assignment.partition('=')
+        stage, _, param = name.partition('.')
+        try:
+            value = json.loads(value)
+        except ValueError:
+            pass
+        params.setdefault(stage, {})[param] = value
+    return params
+
+
+if __name__ == '__main__':
+    # Usage: python pipeline_runner.py --metars metar_data.csv --flights flightaware_data.csv --output-dir ../streamlit/streamlit_data
+    #        python pipeline_runner.py --synthetic 0.02 --param train.n_estimators=50
+    #        python pipeline_runner.py --synthetic 0.02 --param df_preprocessed.trends=true --param flights_prepared.inbound=true
+    parser = argparse.ArgumentParser(description='Run FIN_5 to FIN_9 as a cached DAG of stages.')
+    parser.add_argument('--metars', help='AVWX METAR export (FIN_4)')
+    parser.add_argument('--flights', help='FlightAware flight records (FIN_3)')
+    parser.add_argument('--synthetic', type=float, default=None,
+                        help='use synthetic_data at this multiple of the 220k-flight dataset instead')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--targets', nargs='+', default=None, choices=list(STAGES))
+    parser.add_argument('--param', action='append', default=[], help='stage.name=value (JSON value)')
+    parser.add_argument('--force', nargs='+', default=[], choices=list(STAGES))
+    parser.add_argument('--jobs', type=int, default=None)
+    parser.add_argument('--output-dir', default=None, help='write the model and dashboard datasets here')
+    args = parser.parse_args()
+
+    if args.synthetic is not None:
+        from synthetic_data import synthetic_dataset
+        source_dir = os.path.join(args.cache_dir, 'sources')
+        os.makedirs(source_dir, exist_ok=True)
+        sources = {'metar_raw': os.path.join(source_dir, f'metars_{args.synthetic:g}.csv'),
+                   'flights_raw': os.path.join(source_dir, f'flights_{args.synthetic:g}.csv')}
+        if not all(os.path.exists(path) for path in sources.values()):
+            metar_data_df, flights_df = synthetic_dataset(scale=args.synthetic)
+            metar_data_df.to_csv(sources['metar_raw'], index=False)
+            flights_df.to_csv(sources['flights_raw'], index=False)
+    elif args.metars and args.flights:
+        sources = {'metar_raw': args.metars, 'flights_raw': args.flights}
+    else:
+        sys.exit("Give --metars and --flights, or --synthetic")
+
+    report = run_pipeline(sources, args.cache_dir, args.targets, _parse_params(args.param), args.force, args.jobs)
+    print(report.drop(columns='entry').round(1).to_string(index=False))
+    if args.output_dir:
+        print(f"Wrote {', '.join(export_outputs(report, args.output_dir))} to {args.output_dir}")
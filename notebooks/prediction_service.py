@@ -0,0 +1,380 @@
+import json
+import math
+import time
+import asyncio
+import argparse
+import collections
+import numpy as np
+import pandas as pd
+import joblib
+from sklearn.compose import ColumnTransformer
+from sklearn.preprocessing import OneHotEncoder
+
+from fast_predict import _steps_of
+
+# Largest request body accepted (about 20k flights)
+MAX_BODY_BYTES = 32 * 1024 * 1024
+
+# Recent requests kept for the latency percentiles of /metrics
+LATENCY_WINDOW = 10000
+
+# Upper bounds of the batch-size histogram buckets
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096]
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class BatchScorer:
+    """Scores flights of many concurrent requests together in micro-batches.
+
+    Requests are queued; a single worker takes everything waiting (up to ``max_batch_size`` flights,
+    waiting at most ``max_wait_ms`` for more to arrive; larger requests are queued in batch-sized chunks), scores it with one ``predict_proba`` call in a
+    thread and hands every request its own rows back. A pipeline call over a few hundred rows costs
+    little more than a single-row call (the pre-processing overhead is per call), so throughput grows
+    with the load.
+    """
+
+    def __init__(self, pipeline, max_batch_size=512, max_wait_ms=2.0):
+        steps = [step for _, step in pipeline.steps]
+        preprocessor = next((s for s in steps if isinstance(s, ColumnTransformer)), None)
+        if preprocessor is None:
+            raise ValueError("Pipeline has no ColumnTransformer pre-processing step")
+        self.pipeline = pipeline
+        self.feature_names_in_ = list(preprocessor.feature_names_in_)
+        self.delayed_column = list(steps[-1].classes_).index(1)
+
+        # Columns of the one-hot blocks stay as they are sent; every other column must be numeric
+        self.categorical = []
+        for name, transformer, columns in preprocessor.transformers_:
+            if transformer in ('drop', 'passthrough') or len(columns) == 0:
+                continue
+            if isinstance(_steps_of(transformer)[-1], OneHotEncoder):
+                self.categorical += [self.feature_names_in_[c] if isinstance(c, (int, np.integer)) else c
+                                     for c in columns]
+        self.numeric = [c for c in self.feature_names_in_ if c not in set(self.categorical)]
+        self._numeric = set(self.numeric)
+        self._categorical = set(self.categorical)
+
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.metrics = ServiceMetrics()
+        self._queue = None
+        self._worker = None
+        # Request taken off the queue that did not fit in the previous batch
+        self._carry = None
+
+    def validate(self, flights):
+        """Check the flights of a request before they are queued (plain Python, no DataFrame per request).
+
+        Missing features are imputed by the pipeline and unknown keys are ignored.
+
+        Raises:
+            ValueError: If a flight is not an object, has none of the features, a non-numeric or non-finite
+                value in a numeric feature or a value other than a string or number in a categorical one
+        """
+        features = set(self.feature_names_in_)
+        for i, flight in enumerate(flights):
+            if not isinstance(flight, dict):
+                raise ValueError(f"Flight {i} is not a JSON object of feature values")
+            if features.isdisjoint(flight):
+                raise ValueError(f"Flight {i} has none of the model features")
+            for column in self._numeric.intersection(flight):
+                value = flight[column]
+                if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+                    raise ValueError(f"Flight {i}: '{column}' must be a number, got {value!r}")
+                if value is not None and not math.isfinite(value):
+                    raise ValueError(f"Flight {i}: '{column}' must be finite, got {value!r}")
+            # Categories are strings or the integer codes of the training data (months, weeks, cloud types)
+            for column in self._categorical.intersection(flight):
+                value = flight[column]
+                if value is not None and (isinstance(value, bool) or not isinstance(value, (str, int, float))
+                                          or (isinstance(value, float) and not math.isfinite(value))):
+                    raise ValueError(f"Flight {i}: '{column}' must be a string or a number, got {value!r}")
+        return flights
+
+    def frame(self, flights):
+        """Feature DataFrame of validated flight dicts, in the pipeline's column order."""
+        X = pd.DataFrame.from_records(flights, columns=self.feature_names_in_)
+        X[self.numeric] = X[self.numeric].astype(np.float64)
+        # None is not a missing value for the categorical imputers, NaN is
+        X[self.categorical] = X[self.categorical].astype(object).where(X[self.categorical].notna(), np.nan)
+        return X
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+
+    async def predict(self, flights):
+        """Delay probabilities of validated flight dicts, scored in the next micro-batch(es).
+
+        A request of more than ``max_batch_size`` flights is split into chunks of that size.
+        """
+        loop = asyncio.get_running_loop()
+        futures = []
+        for start in range(0, len(flights), self.max_batch_size):
+            future = loop.create_future()
+            self._queue.put_nowait((flights[start:start + self.max_batch_size], future))
+            futures.append(future)
+        return np.concatenate(await asyncio.gather(*futures))
+
+    def _score(self, flights):
+        return self.pipeline.predict_proba(self.frame(flights))
+
+    async def _next_batch(self):
+        # Block for the first request, then take what arrives until the batch is full or the wait is over.
+        # A request that would overflow the batch is carried over to start the next one.
+        if self._carry is not None:
+            batch, self._carry = [self._carry], None
+        else:
+            batch = [await self._queue.get()]
+        size = len(batch[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch_size:
+            if self._queue.empty():
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    request = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                request = self._queue.get_nowait()
+            if size + len(request[0]) > self.max_batch_size:
+                self._carry = request
+                break
+            batch.append(request)
+            size += len(request[0])
+        return batch, size
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch, _ = await self._next_batch()
+            # Requests already given up on (client gone) are not scored
+            batch = [(flights, future) for flights, future in batch if not future.done()]
+            if not batch:
+                continue
+            flights = [flight for request, _ in batch for flight in request]
+            try:
+                proba = await loop.run_in_executor(None, self._score, flights)
+            except Exception as error:
+                if len(batch) == 1:
+                    if not batch[0][1].done():
+                        batch[0][1].set_exception(error)
+                    continue
+                # Something validate() let through: score the requests one by one so only the bad one fails
+                for rows, future in batch:
+                    try:
+                        proba = await loop.run_in_executor(None, self._score, rows)
+                    except Exception as error:
+                        if not future.done():
+                            future.set_exception(error)
+                        continue
+                    self.metrics.record_batch(len(rows))
+                    if not future.done():
+                        future.set_result(proba[:, self.delayed_column])
+                continue
+            self.metrics.record_batch(len(flights))
+
+            delayed = proba[:, self.delayed_column]
+            offset = 0
+            for rows, future in batch:
+                if not future.done():
+                    future.set_result(delayed[offset:offset + len(rows)])
+                offset += len(rows)
+
+
+def _reject_constant(name):
+    raise ValueError(f"{name} is not a valid JSON value")
+
+
+class ServiceMetrics:
+    """Request-latency and batch-size counters served by /metrics."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.requests = collections.Counter()
+        self.latencies_ms = collections.deque(maxlen=LATENCY_WINDOW)
+        self.predictions = 0
+        self.batches = 0
+        self.scored = 0
+        # Last bucket counts batches larger than every bound
+        self.batch_sizes = np.zeros(len(BATCH_SIZE_BUCKETS) + 1, dtype=np.int64)
+        self.largest_batch = 0
+
+    def record_request(self, status, latency_ms, n_predictions=0):
+        self.requests[status] += 1
+        self.latencies_ms.append(latency_ms)
+        self.predictions += n_predictions
+
+    def record_batch(self, size):
+        self.batches += 1
+        self.scored += size
+        self.largest_batch = max(self.largest_batch, size)
+        self.batch_sizes[np.searchsorted(BATCH_SIZE_BUCKETS, size)] += 1
+
+    def summary(self):
+        uptime = time.time() - self.started
+        latencies = np.array(self.latencies_ms)
+        labels = [f'<={bound}' for bound in BATCH_SIZE_BUCKETS] + [f'>{BATCH_SIZE_BUCKETS[-1]}']
+        return {
+            'uptime_s': round(uptime, 1),
+            'requests': {str(status): count for status, count in sorted(self.requests.items())},
+            'predictions': self.predictions,
+            'predictions_per_second': round(self.predictions / uptime, 1) if uptime else 0.0,
+            'latency_ms': {
+                'window': len(latencies),
+                'p50': round(float(np.percentile(latencies, 50)), 3) if len(latencies) else None,
+                'p95': round(float(np.percentile(latencies, 95)), 3) if len(latencies) else None,
+                'p99': round(float(np.percentile(latencies, 99)), 3) if len(latencies) else None,
+                'max': round(float(latencies.max()), 3) if len(latencies) else None,
+            },
+            'batches': self.batches,
+            'batch_size': {
+                'mean': round(self.scored / self.batches, 1) if self.batches else None,
+                'max': self.largest_batch,
+                # Flights per batch, counted in power-of-two buckets ('<=8' holds sizes 5 to 8)
+                'histogram': {label: int(count) for label, count in zip(labels, self.batch_sizes) if count},
+            },
+        }
+
+
+class PredictionService:
+    """Minimal HTTP/1.1 server (keep-alive, JSON only) in front of a BatchScorer.
+
+    Endpoints:
+        POST /predict: one flight ``{feature: value, ...}`` -> ``{"delay_probability": p}``, or a list of
+            flights (or ``{"flights": [...]}``) -> ``{"delay_probabilities": [p, ...]}``
+        GET /metrics: request latencies, throughput and batch sizes
+        GET /health: ``{"status": "ok", "features": [...]}``
+    """
+
+    def __init__(self, scorer):
+        self.scorer = scorer
+
+    async def _handle(self, method, path, body):
+        if path == '/predict':
+            if method != 'POST':
+                return 405, {'error': 'Use POST'}, 0
+            try:
+                # NaN and Infinity are not JSON (Python's json accepts them by default)
+                payload = json.loads(body, parse_constant=_reject_constant)
+            except ValueError:
+                return 400, {'error': 'The body is not valid JSON'}, 0
+            single = isinstance(payload, dict) and 'flights' not in payload
+            flights = [payload] if single else payload.get('flights') if isinstance(payload, dict) else payload
+            if not isinstance(flights, list) or not flights:
+                return 400, {'error': 'Send a flight object, or a non-empty list of them'}, 0
+            try:
+                self.scorer.validate(flights)
+            except ValueError as error:
+                return 400, {'error': str(error)}, 0
+            probabilities = (await self.scorer.predict(flights)).tolist()
+            if single:
+                return 200, {'delay_probability': probabilities[0]}, 1
+            return 200, {'delay_probabilities': probabilities}, len(probabilities)
+        if path == '/metrics':
+            return 200, self.scorer.metrics.summary(), 0
+        if path == '/health':
+            return 200, {'status': 'ok', 'features': self.scorer.feature_names_in_}, 0
+        return 404, {'error': f'Unknown path {path}'}, 0
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                start = time.perf_counter()
+                method, path, version = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                # The body cannot be skipped without a valid length, so these errors close the connection
+                length = headers.get('content-length', '0')
+                if not (length.isascii() and length.isdigit()):
+                    status, result, n_predictions = 400, {'error': 'Invalid Content-Length'}, 0
+                    keep_alive = False
+                elif int(length) > MAX_BODY_BYTES:
+                    status, result, n_predictions = 413, {'error': 'Request body too large'}, 0
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(int(length))
+                    try:
+                        status, result, n_predictions = await self._handle(method, path.split('?')[0], body)
+                    except Exception as error:
+                        status, result, n_predictions = 500, {'error': repr(error)}, 0
+                    keep_alive = (headers.get('connection', '').lower() != 'close'
+                                  and not version.strip().endswith('1.0'))
+
+                payload = json.dumps(result).encode()
+                writer.write((f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                              f"Content-Type: application/json\r\n"
+                              f"Content-Length: {len(payload)}\r\n"
+                              f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode() + payload)
+                await writer.drain()
+                if path.split('?')[0] != '/metrics':
+                    self.scorer.metrics.record_request(status, (time.perf_counter() - start) * 1000, n_predictions)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            # Client went away or sent something that is not HTTP
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8080):
+        self.scorer.start()
+        server = await asyncio.start_server(self.handle_connection, host, port, backlog=1024)
+        print(f"Serving {len(self.scorer.feature_names_in_)}-feature model on http://{host}:{port} "
+              f"(batches of up to {self.scorer.max_batch_size} flights, {self.scorer.max_wait * 1000:g} ms wait)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.scorer.stop()
+
+
+def load_service(model_path, max_batch_size=512, max_wait_ms=2.0):
+    """Load a saved pipeline once and wrap it in a PredictionService.
+
+    Args:
+        model_path (str): Pipeline saved with joblib, e.g. FIN_7's ``pipeline_rf_rus_model.pkl``
+        max_batch_size (int): Most flights scored in one ``predict_proba`` call
+        max_wait_ms (float): Longest a request waits for others to join its batch
+
+    Returns:
+        PredictionService: Call ``asyncio.run(service.serve(host, port))`` to start it
+    """
+    return PredictionService(BatchScorer(joblib.load(model_path), max_batch_size, max_wait_ms))
+
+
+if __name__ == '__main__':
+    # Usage: python prediction_service.py pipeline_rf_rus_model.pkl [--port 8080]
+    parser = argparse.ArgumentParser(description='Serve delay predictions of a trained pipeline over HTTP.')
+    parser.add_argument('model_path')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--max-batch-size', type=int, default=512)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    args = parser.parse_args()
+
+    service = load_service(args.model_path, args.max_batch_size, args.max_wait_ms)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,769 @@
+import numpy as np
+import pandas as pd
+
+# Flight pre-processing steps from FIN_6_Pre-Processing_for_ML.ipynb, plus the METAR merge that
+# attaches the cleaned reports (see metar_cleaning.py) to each departure and arrival.
+
+aircraft_manufacturer = {
+    'A319': 'Airbus',
+    'A320': 'Airbus',
+    'A20N': 'Airbus',
+    'B738': 'Boeing',
+    'B38M': 'Boeing',
+    'A321': 'Airbus',
+    'A21N': 'Airbus',
+    'BCS3': 'Airbus',
+    'E295': 'Embraer',
+    'A359': 'Airbus',
+    'B77W': 'Boeing',
+    'B772': 'Boeing',
+    'A332': 'Airbus',
+    'A333': 'Airbus',
+    'B788': 'Boeing',
+    'B752': 'Boeing',
+    'B763': 'Boeing',
+    'B753': 'Boeing',
+    'B39M': 'Boeing',
+    'A330': 'Airbus',
+    'B739': 'Boeing',
+    'B737': 'Boeing',
+    'B789': 'Boeing',
+    'B78X': 'Boeing',
+    'A35K': 'Airbus',
+    'BCS1': 'Airbus',
+    'E190': 'Embraer',
+    'AT72': 'ATR',
+    'A318': 'Airbus',
+    'B773': 'Boeing',
+    'E75L': 'Embraer',
+    'E170': 'Embraer',
+    '737': 'Boeing',
+    'A339': 'Airbus',
+    'CRJ9': 'Bombardier',
+    'A388': 'Airbus',
+    'B733': 'Boeing',
+    'B77L': 'Boeing',
+    'E290': 'Embraer',
+    'B744': 'Boeing',
+    'B764': 'Boeing',
+    '777': 'Boeing',
+    'B732': 'Boeing',
+    '3M3': 'McDonnell Douglas',
+    '787': 'Boeing',
+    'CRJX': 'Bombardier',
+    'B736': 'Boeing',
+    '73M': 'Boeing',
+    '32S': 'Airbus',
+    'B748': 'Boeing',
+    '31A': 'McDonnell Douglas',
+    'A337': 'Airbus',
+    'DH8D': 'De Havilland Canada',
+    'A20': 'Airbus',
+    'B712': 'Boeing',
+    'AJ27': 'Dassault',
+    'CRJ': 'Bombardier',
+    'B734': 'Boeing',
+    'ATR': 'ATR',
+    '35L': 'Airbus',
+    'E75S': 'Embraer',
+    'C206': 'Cessna',
+    '35H': 'Airbus',
+    'E195': 'Embraer',
+    'B735': 'Boeing',
+}
+
+regions = {
+    'LGA': 'North America',
+    'BNA': 'North America',
+    'CLT': 'North America',
+    'ORD': 'North America',
+    'CDG': 'Europe',
+    'NRT': 'Asia Pacific',
+    'YUL': 'North America',
+    'ICN': 'Asia Pacific',
+    'CPH': 'Europe',
+    'DXB': 'Middle East',
+    'LIS': 'Europe',
+    'TPE': 'Asia Pacific',
+    'BOG': 'South America',
+    'JFK': 'North America',
+    'JED': 'Middle East',
+    'MCO': 'North America',
+    'PHL': 'North America',
+    'SCL': 'South America',
+    'LIM': 'South America',
+    'KUL': 'Asia Pacific',
+    'SIN': 'Asia Pacific',
+    'CAI': 'Africa',
+    'HKG': 'Asia Pacific',
+    'OSL': 'Europe',
+    'ARN': 'Europe',
+    'YVR': 'North America',
+    'BER': 'Europe',
+    'GDL': 'North America',
+    'LAX': 'North America',
+    'CUN': 'North America',
+    'KEF': 'Europe',
+    'LHR': 'Europe',
+    'BKK': 'Asia Pacific',
+    'PMI': 'Europe',
+    'SJU': 'North America',
+    'GRU': 'South America',
+    'AMS': 'Europe',
+    'SFO': 'North America',
+    'ATL': 'North America',
+    'MIA': 'North America',
+    'DUB': 'Europe',
+    'FUK': 'Asia Pacific',
+    'MSY': 'North America',
+    'FCO': 'Europe',
+    'DEL': 'Asia Pacific',
+    'ADD': 'Africa',
+    'CGK': 'Asia Pacific',
+    'DFW': 'North America',
+    'RUN': 'Africa',
+    'ORY': 'Europe',
+    'CZM': 'North America',
+    'LIR': 'North America',
+    'PTY': 'North America',
+    'IST': 'Europe',
+    'BOH': 'Europe',
+    'HEL': 'Europe',
+    'DAL': 'North America',
+    'SAT': 'North America',
+    'TLV': 'Middle East',
+    'DMU': 'South America',
+    'BOM': 'Asia Pacific',
+    'CVT': 'Europe',
+    'MAD': 'Europe',
+    'MDW': 'North America',
+    'YQB': 'North America',
+    'BGO': 'Europe',
+    'LYS': 'Europe',
+    'ZAG': 'Europe',
+    'COS': 'North America',
+    'PIT': 'North America',
+    'YYZ': 'North America',
+    'FUE': 'Europe',
+    'HOU': 'North America',
+    'LUX': 'Europe',
+    'DTW': 'North America',
+    'HYC': 'North America',
+    'TFS': 'Europe',
+    'DUS': 'Europe',
+    'PEK': 'Asia Pacific',
+    'TYS': 'North America',
+    'BUR': 'North America',
+    'DEN': 'North America',
+    'SLC': 'North America',
+    'RNO': 'North America',
+    'OAK': 'North America',
+    'BWI': 'North America',
+    'TPA': 'North America',
+    'LAS': 'North America',
+    'RSW': 'North America',
+    'PBI': 'North America',
+    'STL': 'North America',
+    'RTM': 'Europe',
+    'RDU': 'North America',
+    'BBP': 'North America',
+    'CVG': 'North America',
+    'MED': 'Middle East',
+    'HAM': 'Europe',
+    'LPA': 'Europe',
+    'FRA': 'Europe',
+    'FLL': 'North America',
+    'BOD': 'Europe',
+    'AUS': 'North America',
+    'MKE': 'North America',
+    'DOH': 'Middle East',
+    'DMK': 'Asia Pacific',
+    'ZRH': 'Europe',
+    'SMF': 'North America',
+    'SNA': 'North America',
+    'BHD': 'Europe',
+    'MSP': 'North America',
+    'FAI': 'North America',
+    'TUN': 'Africa',
+    'STT': 'North America',
+    'HRG': 'Africa',
+    'LGW': 'Europe',
+    'RHO': 'Europe',
+    'IXJ': 'Asia Pacific',
+    'MDZ': 'South America',
+    'OLB': 'Europe',
+    'KGS': 'Europe',
+    'ANF': 'South America',
+    'SAN': 'North America',
+    'DSM': 'North America',
+    'IAH': 'North America',
+    'SEA': 'North America',
+    'MTJ': 'North America',
+    'ACY': 'North America',
+    'BZE': 'North America',
+    'HPN': 'North America',
+    'LEJ': 'Europe',
+    'EWR': 'North America',
+    'DWC': 'Middle East',
+    'SRQ': 'North America',
+    'CMH': 'North America',
+    'LEY': 'Europe',
+    'GUA': 'Central America',
+    'SHJ': 'Middle East',
+    'IND': 'North America',
+    'ALG': 'Africa',
+    'AEP': 'South America',
+    'BGR': 'North America',
+    'ABQ': 'North America',
+    'AUH': 'Middle East',
+    'NGO': 'Asia Pacific',
+    'OXF': 'Europe',
+    'ASW': 'Africa',
+    'ONT': 'North America',
+    'YYT': 'North America',
+    'NAS': 'North America',
+    'SYD': 'Australia',
+    'HMO': 'North America',
+    'SCE': 'North America',
+    'NUM': 'South America',
+    'GYE': 'South America',
+    'EZE': 'South America',
+    'SWF': 'North America',
+    'BTH': 'Asia Pacific',
+    'KIX': 'Asia Pacific',
+    'GNV': 'North America',
+    'BWN': 'Asia Pacific',
+    'BQN': 'North America',
+    'GRR': 'North America',
+    'KRK': 'Europe',
+    'HNL': 'North America',
+    'PHX': 'North America',
+    'DPS': 'Asia Pacific',
+    'KHH': 'Asia Pacific',
+    'TAS': 'Asia Pacific',
+    'MUC': 'Europe',
+    'MCI': 'North America',
+    'PVR': 'North America',
+    'MNL': 'Asia Pacific',
+    'MAN': 'Europe',
+    'XRY': 'Europe',
+    'COR': 'South America',
+    'BLB': 'Europe',
+    'HBE': 'Africa',
+    'SUF': 'Europe',
+    'AMD': 'Asia Pacific',
+    'CFU': 'Europe',
+    'INT': 'North America',
+    'PDX': 'North America',
+    'MRU': 'Africa',
+    'DZA': 'Europe',
+    'MLE': 'Asia Pacific',
+    'VLC': 'Europe',
+    'GOT': 'Europe',
+    'NKM': 'Asia Pacific',
+    'TLL': 'Europe',
+    'HRL': 'North America',
+    'SAP': 'North America',
+    'CLE': 'North America',
+    'PWM': 'North America',
+    'OKC': 'North America',
+    'AGP': 'Europe',
+    'KAO': 'Asia Pacific',
+    'BQH': 'Europe',
+    'QSC': 'Europe',
+    'RAK': 'Africa',
+    'BLL': 'Europe',
+    'AMA': 'North America',
+    'GOI': 'Asia Pacific',
+    'BHM': 'North America',
+    'BAH': 'Middle East',
+    'CMN': 'Africa',
+    'TNG': 'Africa',
+    'FLR': 'Europe',
+    'VGO': 'Europe',
+    'STR': 'Europe',
+    'VAA': 'Asia Pacific',
+    'ESH': 'Europe',
+    'DIL': 'Asia Pacific',
+    'HER': 'Europe',
+    'VNO': 'Europe',
+    'SDQ': 'Caribbean',
+    'VIE': 'Europe',
+    'AAL': 'Europe',
+    'RUH': 'Middle East',
+    'SSH': 'Africa',
+    'TNR': 'Africa',
+    'BOS': 'North America',
+    'GAU': 'Asia Pacific',
+    'BRC': 'South America',
+    'RVN': 'Asia Pacific',
+    'DCA': 'North America',
+    'ORF': 'North America',
+    'ROC': 'North America',
+    'OUL': 'Europe',
+    'XNA': 'North America',
+    'NOU': 'Oceania',
+    'LDY': 'North America',
+    'BHX': 'Europe',
+    'JAX': 'North America',
+    'PUS': 'Asia Pacific',
+    'ORK': 'Europe',
+    'ELP': 'North America',
+    'OMA': 'North America',
+    'TUS': 'North America',
+    'MLU': 'North America',
+    'CGN': 'Europe',
+    'LXR': 'Africa',
+    'MXL': 'North America',
+    'SNN': 'Europe'
+}
+
+sub_regions = {
+    'LGA': 'North America - East Coast',
+    'BNA': 'North America - East Coast',
+    'CLT': 'North America - East Coast',
+    'ORD': 'North America - East Coast',
+    'CDG': 'Europe - Continental Europe',
+    'NRT': 'Asia Pacific',
+    'YUL': 'North America - East Coast',
+    'ICN': 'Asia Pacific',
+    'CPH': 'Europe - Skandinavia',
+    'DXB': 'Middle East',
+    'LIS': 'Europe - Continental Europe',
+    'TPE': 'Asia Pacific',
+    'BOG': 'South America',
+    'JFK': 'North America - East Coast',
+    'JED': 'Middle East',
+    'MCO': 'North America - East Coast',
+    'PHL': 'North America - East Coast',
+    'SCL': 'South America',
+    'LIM': 'South America',
+    'KUL': 'Asia Pacific',
+    'SIN': 'Asia Pacific',
+    'CAI': 'Africa',
+    'HKG': 'Asia Pacific',
+    'OSL': 'Europe - Skandinavia',
+    'ARN': 'Europe - Skandinavia',
+    'YVR': 'North America - West Coast',
+    'BER': 'Europe - Continental Europe',
+    'GDL': 'North America - West Coast',
+    'LAX': 'North America - West Coast',
+    'CUN': 'North America - West Coast',
+    'KEF': 'Europe - Skandinavia',
+    'LHR': 'Europe - Continental Europe',
+    'BKK': 'Asia Pacific',
+    'PMI': 'Europe - Continental Europe',
+    'SJU': 'North America - East Coast',
+    'GRU': 'South America',
+    'AMS': 'Europe - Continental Europe',
+    'SFO': 'North America - West Coast',
+    'ATL': 'North America - East Coast',
+    'MIA': 'North America - East Coast',
+    'DUB': 'Europe - Continental Europe',
+    'FUK': 'Asia Pacific',
+    'MSY': 'North America - East Coast',
+    'FCO': 'Europe - Continental Europe',
+    'DEL': 'Asia Pacific',
+    'ADD': 'Africa',
+    'CGK': 'Asia Pacific',
+    'DFW': 'North America - West Coast',
+    'RUN': 'Africa',
+    'ORY': 'Europe - Continental Europe',
+    'CZM': 'North America - West Coast',
+    'LIR': 'North America - West Coast',
+    'PTY': 'North America - West Coast',
+    'IST': 'Europe - Continental Europe',
+    'BOH': 'Europe - Continental Europe',
+    'HEL': 'Europe - Skandinavia',
+    'DAL': 'North America - East Coast',
+    'SAT': 'North America - West Coast',
+    'TLV': 'Middle East',
+    'DMU': 'South America',
+    'BOM': 'Asia Pacific',
+    'CVT': 'Europe - Continental Europe',
+    'MAD': 'Europe - Continental Europe',
+    'MDW': 'North America - East Coast',
+    'YQB': 'North America - East Coast',
+    'BGO': 'Europe - Skandinavia',
+    'LYS': 'Europe - Continental Europe',
+    'ZAG': 'Europe - Continental Europe',
+    'COS': 'North America - West Coast',
+    'PIT': 'North America - East Coast',
+    'YYZ': 'North America - East Coast',
+    'FUE': 'Europe - Continental Europe',
+    'HOU': 'North America - West Coast',
+    'LUX': 'Europe - Continental Europe',
+    'DTW': 'North America - East Coast',
+    'HYC': 'North America - East Coast',
+    'TFS': 'Europe - Continental Europe',
+    'DUS': 'Europe - Continental Europe',
+    'PEK': 'Asia Pacific',
+    'TYS': 'North America - East Coast',
+    'BUR': 'North America - West Coast',
+    'DEN': 'North America - West Coast',
+    'SLC': 'North America - West Coast',
+    'RNO': 'North America - West Coast',
+    'OAK': 'North America - West Coast',
+    'BWI': 'North America - East Coast',
+    'TPA': 'North America - East Coast',
+    'LAS': 'North America - West Coast',
+    'RSW': 'North America - East Coast',
+    'PBI': 'North America - East Coast',
+    'STL': 'North America - West Coast',
+    'RTM': 'Europe - Continental Europe',
+    'RDU': 'North America - East Coast',
+    'BBP': 'North America - East Coast',
+    'CVG': 'North America - East Coast',
+    'MED': 'Middle East',
+    'HAM': 'Europe - Skandinavia',
+    'LPA': 'Europe - Continental Europe',
+    'FRA': 'Europe - Continental Europe',
+    'FLL': 'North America - East Coast',
+    'BOD': 'Europe - Continental Europe',
+    'AUS': 'North America - West Coast',
+    'MKE': 'North America - East Coast',
+    'DOH': 'Middle East',
+    'DMK': 'Asia Pacific',
+    'ZRH': 'Europe - Continental Europe',
+    'SMF': 'North America - West Coast',
+    'SNA': 'North America - West Coast',
+    'BHD': 'Europe - Continental Europe',
+    'MSP': 'North America - East Coast',
+    'FAI': 'North America - West Coast',
+    'TUN': 'Africa',
+    'STT': 'North America - East Coast',
+    'HRG': 'Africa',
+    'LGW': 'Europe - Continental Europe',
+    'RHO': 'Europe - Continental Europe',
+    'IXJ': 'Asia Pacific',
+    'MDZ': 'South America',
+    'OLB': 'Europe - Continental Europe',
+    'KGS': 'Europe - Continental Europe',
+    'ANF': 'South America',
+    'SAN': 'North America - West Coast',
+    'DSM': 'North America - East Coast',
+    'IAH': 'North America - East Coast',
+    'SEA': 'North America - West Coast',
+    'MTJ': 'North America - West Coast',
+    'ACY': 'North America - East Coast',
+    'BZE': 'North America - East Coast',
+    'HPN': 'North America - East Coast',
+    'LEJ': 'Europe - Continental Europe',
+    'EWR': 'North America - East Coast',
+    'DWC': 'Middle East',
+    'SRQ': 'North America - East Coast',
+    'CMH': 'North America - East Coast',
+    'LEY': 'Europe - Continental Europe',
+    'GUA': 'Central America',
+    'SHJ': 'Middle East',
+    'IND': 'North America - East Coast',
+    'ALG': 'Africa',
+    'AEP': 'South America',
+    'BGR': 'North America - East Coast',
+    'ABQ': 'North America - East Coast',
+    'AUH': 'Middle East',
+    'NGO': 'Asia Pacific',
+    'OXF': 'Europe - Continental Europe',
+    'ASW': 'Africa',
+    'ONT': 'North America - West Coast',
+    'YYT': 'North America - East Coast',
+    'NAS': 'North America - East Coast',
+    'SYD': 'Australia',
+    'HMO': 'North America - West Coast',
+    'SCE': 'North America - East Coast',
+    'NUM': 'South America',
+    'GYE': 'South America',
+    'EZE': 'South America',
+    'SWF': 'North America - East Coast',
+    'BTH': 'Asia Pacific',
+    'KIX': 'Asia Pacific',
+    'GNV': 'North America - East Coast',
+    'BWN': 'Asia Pacific',
+    'BQN': 'North America - East Coast',
+    'GRR': 'North America - East Coast',
+    'KRK': 'Europe - Continental Europe',
+    'HNL': 'North America - West Coast',
+    'PHX': 'North America - West Coast',
+    'DPS': 'Asia Pacific',
+    'KHH': 'Asia Pacific',
+    'TAS': 'Asia Pacific',
+    'MUC': 'Europe - Continental Europe',
+    'MCI': 'North America - East Coast',
+    'PVR': 'North America - West Coast',
+    'MNL': 'Asia Pacific',
+    'MAN': 'Europe - Continental Europe',
+    'XRY': 'Europe - Continental Europe',
+    'COR': 'South America',
+    'BLB': 'Europe - Continental Europe',
+    'HBE': 'Africa',
+    'SUF': 'Europe - Continental Europe',
+    'AMD': 'Asia Pacific',
+    'CFU': 'Europe - Continental Europe',
+    'INT': 'North America - East Coast',
+    'PDX': 'North America - West Coast',
+    'MRU': 'Africa',
+    'DZA': 'Europe - Continental Europe',
+    'MLE': 'Asia Pacific',
+    'VLC': 'Europe - Continental Europe',
+    'GOT': 'Europe - Skandinavia',
+    'NKM': 'Asia Pacific',
+    'TLL': 'Europe - Skandinavia',
+    'HRL': 'North America - East Coast',
+    'SAP': 'North America - East Coast',
+    'CLE': 'North America - East Coast',
+    'PWM': 'North America - East Coast',
+    'OKC': 'North America - East Coast',
+    'AGP': 'Europe - Continental Europe',
+    'KAO': 'Asia Pacific',
+    'BQH': 'Europe - Continental Europe',
+    'QSC': 'Europe - Continental Europe',
+    'RAK': 'Africa',
+    'BLL': 'Europe - Continental Europe',
+    'AMA': 'North America - East Coast',
+    'GOI': 'Asia Pacific',
+    'BHM': 'North America - East Coast',
+    'BAH': 'Middle East',
+    'CMN': 'Africa',
+    'TNG': 'Africa',
+    'FLR': 'Europe - Continental Europe',
+    'VGO': 'Europe - Continental Europe',
+    'STR': 'Europe - Continental Europe',
+    'VAA': 'Asia Pacific',
+    'ESH': 'Europe - Continental Europe',
+    'DIL': 'Asia Pacific',
+    'HER': 'Europe - Continental Europe',
+    'VNO': 'Europe - Continental Europe',
+    'SDQ': 'Caribbean',
+    'VIE': 'Europe - Continental Europe',
+    'AAL': 'Europe - Skandinavia',
+    'RUH': 'Middle East',
+    'SSH': 'Africa',
+    'TNR': 'Africa',
+    'BOS': 'North America - East Coast',
+    'GAU': 'Asia Pacific',
+    'BRC': 'South America',
+    'RVN': 'Asia Pacific',
+    'DCA': 'North America - East Coast',
+    'ORF': 'North America - East Coast',
+    'ROC': 'North America - East Coast',
+    'OUL': 'Europe - Skandinavia',
+    'XNA': 'North America - East Coast',
+    'NOU': 'Oceania',
+    'LDY': 'North America - East Coast',
+    'BHX': 'Europe - Continental Europe',
+    'JAX': 'North America - East Coast',
+    'PUS': 'Asia Pacific',
+    'ORK': 'Europe - Continental Europe',
+    'ELP': 'North America - East Coast',
+    'OMA': 'North America - East Coast',
+    'TUS': 'North America - East Coast',
+    'MLU': 'North America - East Coast',
+    'CGN': 'Europe - Continental Europe',
+    'LXR': 'Africa',
+    'MXL': 'North America - East Coast',
+    'SNN': 'Europe - Continental Europe'
+}
+
+# FlightAware columns which are not used after pre-processing
+unused_columns = ['Unnamed: 0.1', # Generic index from previous operations
+                  'Unnamed: 0', # Generic index from previous operations
+                  'station_arrival', # METAR matching field, no longer useful
+                  'station_departure', # METAR matching field, no longer useful
+                  'METAR_departure_time_delta', # METAR matching field, no longer useful
+                  'time.dt_departure', # METAR matching field, no longer useful
+                  'METAR_arrival', # METAR matching field, no longer useful
+                  'METAR_arrival_time_delta', # METAR matching field, no longer useful
+                  'time.dt_arrival', # METAR matching field, no longer useful
+                  'ident', # The route itself will serve as an identifier
+                  'ident_icao', # The route itself will serve as an identifier
+                  'ident_iata', # The route itself will serve as an identifier
+                  'actual_runway_off', # Aleatory field, useless for our case
+                  'actual_runway_on', # Aleatory field, useless for our case
+                  'fa_flight_id', # FlightAware identifier, not useful
+                  'operator', # Generic identifier, we are keeping the ICAO identifier as it is unique
+                  'operator_iata', # ICAO identifier is more useful
+                  'flight_number', # Flight number is not useful for our case
+                  'registration', # Registration is not useful for our case
+                  'atc_ident', # ATC identifier is not useful for our case
+                  'inbound_fa_flight_id', # Would be useful for a more complex analysis accounting for link to previous flight delay, but not for our case
+                  'codeshares', # Codeshares are not useful for our case
+                  'codeshares_iata', # Codeshares are not useful for our case
+                  'blocked', # We have already filtered out blocked flights
+                  'position_only', # We have already filtered out position only flights
+                  'foresight_predictions_available', # Not useful for our case
+                  'progress_percent', # Not useful for our case
+                  'status', # Not useful for our case
+                  'route_distance', # Filed_ete accomplishes the same purpose
+                  'filed_altitude', # Too many missing values, otherwise an interesting feature
+                  'filed_airspeed', # Too many junk values with no consistent imputation interpretation
+                  'route', # Too many missing values, otherwise an interesting feature
+                  'baggage_claim', # Not useful for our case
+                  'seats_cabin_business', # Too many missing values and not useful for our case
+                  'seats_cabin_coach', # Too many missing values and not useful for our case
+                  'seats_cabin_first', # Too many missing values and not useful for our case
+                  'gate_origin', # Aleatory, not useful for our case
+                  'gate_destination', # Aleatory, not useful for our case
+                  'terminal_origin', # Aleatory, not useful for our case
+                  'terminal_destination', # Aleatory, not useful for our case
+                  'type', # Our data was filtered for passenger flights at the query level
+                  'origin.code', # We are keeping the ICAO identifier as it is unique
+                  'origin.code_iata', # ICAO identifier is more useful
+                  'origin.code_lid', # ICAO identifier is more useful
+                  'origin.timezone', # Not useful for our case
+                  'origin.name', # Not useful for our case
+                  'origin.city', # Not useful for our case
+                  'origin.airport_info_url', # Not useful for our case
+                  'destination.code', # We are keeping the ICAO identifier as it is unique
+                  'destination.code_iata', # ICAO identifier is more useful
+                  'destination.code_lid', # ICAO identifier is more useful
+                  'destination.timezone', # Not useful for our case
+                  'destination.name', # Not useful for our case
+                  'destination.city', # Not useful for our case
+                  'destination.airport_info_url', # Not useful for our case
+                  'destination' # We are keeping the ICAO identifier as it is unique
+                  ]
+
+# Columns used to compute the delay binaries, dropped afterwards to avoid target leakage
+delay_calculation_columns = ['departure_delay',
+                             'arrival_delay',
+                             'diverted',
+                             'cancelled',
+                             'scheduled_out',
+                             'estimated_out',
+                             'actual_out',
+                             'scheduled_off',
+                             'estimated_off',
+                             'actual_off',
+                             'scheduled_on',
+                             'estimated_on',
+                             'actual_on',
+                             'scheduled_in',
+                             'estimated_in',
+                             'actual_in']
+
+
+def prepare_flights(df):
+    """Flight-only FIN_6 steps: filtering, derived flight/time/region features and delay binaries.
+
+    The raw schedule columns are kept so the METAR reports can be merged afterwards.
+
+    Args:
+        df (DataFrame): FlightAware flight records
+
+    Returns:
+        DataFrame: Filtered flights with the FIN_6 derived columns
+    """
+    df = df.reset_index(drop=True)
+
+    # Drop blocked flights (no data) and position-only flights (reduced data)
+    df = df[(df['blocked'] == False) & (df['position_only'] == False)]
+
+    # Drop rows with missing identifiers, 'filed_ete', 'aircraft_type' or 'scheduled_out'
+    df = df.dropna(subset=['ident_icao', 'operator_icao', 'origin.code_icao', 'destination.code_icao',
+                           'filed_ete', 'aircraft_type', 'scheduled_out'])
+
+    df = df.assign(flight_type=np.where(df['filed_ete'] <= 3*60*60, 'Short-haul', 'Long-haul'),
+                   manufacturer=df['aircraft_type'].map(aircraft_manufacturer))
+
+    # Time of day, year, month, weekday and ISO week of the scheduled departure (the year orders the
+    # flights in time once the raw schedule columns are dropped)
+    scheduled_out = pd.to_datetime(df['scheduled_out'])
+    hour = scheduled_out.dt.hour
+    df = df.assign(scheduled_out=scheduled_out,
+                   departure_time_of_day=np.select([(hour >= 5) & (hour < 12),
+                                                    (hour >= 12) & (hour < 17),
+                                                    (hour >= 17) & (hour < 21)],
+                                                   ['morning', 'afternoon', 'evening'], default='night'),
+                   departure_year=scheduled_out.dt.year,
+                   departure_month=scheduled_out.dt.month,
+                   departure_weekday=scheduled_out.dt.strftime('%A'),
+                   week_no=scheduled_out.dt.isocalendar().week)
+
+    df = df.assign(origin_region=df['origin.code_iata'].map(regions),
+                   destination_region=df['destination.code_iata'].map(regions),
+                   origin_sub_region=df['origin.code_iata'].map(sub_regions),
+                   destination_sub_region=df['destination.code_iata'].map(sub_regions),
+                   route_code=df['origin.code_icao'] + '-' + df['destination.code_icao'])
+
+    # A delay is defined as 15m, times are in seconds
+    df = df.assign(departure_delay_binary_FA=np.where(df['departure_delay'] > 60*15, 1, 0),
+                   arrival_delay_binary_FA=np.where(df['arrival_delay'] > 60*15, 1, 0))
+
+    return df
+
+
+def merge_metar_to_flights(flights, metar_cleaned, tolerance='3h', drop_unmatched=True):
+    """Attach the latest cleaned METAR at or before the scheduled departure and arrival times.
+
+    Each METAR column gets a '_departure' / '_arrival' suffix; 'raw' becomes 'METAR_departure' /
+    'METAR_arrival' and the age of the report is stored in 'METAR_<side>_time_delta'.
+
+    Args:
+        flights (DataFrame): Output of ``prepare_flights``
+        metar_cleaned (DataFrame): Output of ``metar_cleaning``
+        tolerance (str): Oldest report age that is still matched
+        drop_unmatched (bool): Drop flights without a departure METAR (the model needs one)
+
+    Returns:
+        DataFrame: Flights with departure and arrival weather columns
+    """
+    metar = metar_cleaned.copy()
+    metar['time.dt'] = pd.to_datetime(metar['time.dt'], utc=True).dt.tz_localize(None)
+    metar = metar.sort_values('time.dt')
+
+    flights = flights.copy()
+    flights['_row'] = np.arange(len(flights))
+
+    for side, station_column, time_column in [('departure', 'origin.code_icao', 'scheduled_out'),
+                                              ('arrival', 'destination.code_icao', 'scheduled_on')]:
+        flight_times = pd.to_datetime(flights[time_column], utc=True).dt.tz_localize(None)
+        keys = pd.DataFrame({'_row': flights['_row'].to_numpy(),
+                             '_time': flight_times.to_numpy(),
+                             'station': flights[station_column].to_numpy()})
+        keys = keys.dropna(subset=['_time']).sort_values('_time')
+
+        side_metar = metar.assign(_metar_time=metar['time.dt'])
+        matched = pd.merge_asof(keys, side_metar, left_on='_time', right_on='time.dt', by='station',
+                                direction='backward', tolerance=pd.Timedelta(tolerance))
+        matched[f'METAR_{side}_time_delta'] = matched['_time'] - matched['_metar_time']
+        matched = matched.drop(columns=['_time', '_metar_time'])
+
+        renamed = {'raw': f'METAR_{side}'}
+        renamed.update({c: f'{c}_{side}' for c in matched.columns
+                        if c not in ('_row', 'raw', f'METAR_{side}_time_delta')})
+        matched = matched.rename(columns=renamed)
+        flights = flights.merge(matched, on='_row', how='left')
+
+    if drop_unmatched:
+        flights = flights.dropna(subset=['METAR_departure']).reset_index(drop=True)
+    return flights.drop(columns='_row')
+
+
+def add_weather_features(df):
+    """Weather summary features from the merged departure METAR columns."""
+    # Any / number of the wx_code one-hot columns of the departure METAR
+    wx_departure_columns = [col for col in df.columns if col.startswith('wx_code') and col.endswith('departure')]
+    wx_departure = df[wx_departure_columns]
+
+    return df.assign(wx_binary_departure=wx_departure.any(axis=1).astype(int),
+                     wx_sum_departure=wx_departure.sum(axis=1),
+                     # flight_rules 4 is LIFR
+                     LIFR_binary_departure=np.where(df['flight_rules_departure'] == 4, 1, 0),
+                     low_cloud_ceiling_departure=np.where(
+                         df['clouds_layer_1_altitude_category_departure'].isin([4, 5]), 1, 0))
+
+
+def preprocess_for_ml(df):
+    """FIN_6 pre-processing of merged flight + METAR data into the training table.
+
+    Args:
+        df (DataFrame): Flights merged with departure/arrival METARs, either raw FlightAware
+            records or the output of ``merge_metar_to_flights``
+
+    Returns:
+        DataFrame: Pre-processed table (FIN_6's 'df_preprocessed.csv')
+    """
+    if 'departure_delay_binary_FA' not in df.columns:
+        df = prepare_flights(df)
+    df = add_weather_features(df)
+    return df.drop(columns=delay_calculation_columns + unused_columns, errors='ignore')
@@ -0,0 +1,168 @@
+import sys
+import numpy as np
+import pandas as pd
+import joblib
+
+from ml_pipeline import categorical_features
+from shap_cache import ShapStore
+
+# Dimensions the attributions are aggregated over (columns of the pre-processed FIN_6 table)
+DIMENSIONS = ['route_code', 'origin.code_icao', 'departure_month', 'weather_regime']
+
+# Inverse of the flight_rules mapping in metar_cleaning
+flight_rules_labels = {1: 'VFR', 2: 'MVFR', 3: 'IFR', 4: 'LIFR'}
+
+
+def weather_regime(df):
+    """Departure weather regime: flight rules, plus '+ wx' when weather phenomena were reported.
+
+    Args:
+        df (DataFrame): Pre-processed flight data with 'flight_rules_departure' and 'wx_sum_departure'
+
+    Returns:
+        Series: e.g. 'VFR', 'IFR + wx'
+    """
+    regime = df['flight_rules_departure'].map(flight_rules_labels).fillna('unknown')
+    return regime.where(df['wx_sum_departure'].fillna(0) == 0, regime + ' + wx')
+
+
+def raw_feature_names(encoded_names, categorical=categorical_features):
+    """Map the pre-processed column names back to the model input features.
+
+    One-hot columns ('cat__aircraft_type_A320') belong to their categorical feature; summing
+    their SHAP values gives the contribution of the original feature.
+    """
+    # Longest names first, so 'origin_sub_region' is not mistaken for a shorter prefix
+    categorical = sorted(categorical, key=len, reverse=True)
+    names = []
+    for name in encoded_names:
+        transformer, _, feature = name.partition('__')
+        if transformer == 'cat':
+            feature = next((c for c in categorical if feature.startswith(c + '_')), feature)
+        names.append(feature)
+    return names
+
+
+class ShapAggregates:
+    """Mean |SHAP| per model input feature for every route, origin airport, month and weather regime.
+
+    Only sums and counts are kept, so new flights can be folded in without touching the per-flight
+    values again. The table is indexed by (dimension, key) and saved with joblib, together with the
+    model hash of the SHAP store it was built from.
+    """
+
+    def __init__(self, feature_names, abs_sums=None, counts=None, flights=None, model_hash=None):
+        self.feature_names = list(feature_names)
+        self.model_hash = model_hash
+        index = pd.MultiIndex.from_tuples([], names=['dimension', 'key'])
+        self.abs_sums = abs_sums if abs_sums is not None else pd.DataFrame(columns=self.feature_names, index=index, dtype=np.float64)
+        self.counts = counts if counts is not None else pd.Series(index=index, dtype=np.int64, name='count')
+        self.flights = flights if flights is not None else pd.Index([])
+
+    def update(self, shap_store, df, dimensions=DIMENSIONS):
+        """Fold the flights of the store that were not aggregated yet into the table.
+
+        If the store was built for another model than the aggregated flights, the table is
+        started over from the store.
+
+        Args:
+            shap_store (ShapStore): Per-flight SHAP values
+            df (DataFrame): Pre-processed flight data with the same index as the store
+            dimensions (list): Grouping columns ('weather_regime' is derived if missing)
+
+        Returns:
+            int: Number of flights added
+        """
+        if self.model_hash != shap_store.model_hash:
+            self.__init__(dict.fromkeys(raw_feature_names(shap_store.feature_names)),
+                          model_hash=shap_store.model_hash)
+
+        new_flights = shap_store.index[~shap_store.index.isin(self.flights) & shap_store.index.isin(df.index)]
+        if len(new_flights) == 0:
+            return 0
+
+        # Per-flight |SHAP| of each model input feature (one-hot columns summed back first)
+        encoded = shap_store.values_for(new_flights)
+        values = encoded.T.groupby(raw_feature_names(encoded.columns), sort=False).sum().T
+        abs_values = values.abs().reindex(columns=self.feature_names, fill_value=0.0)
+
+        flights = df.loc[new_flights]
+        if 'weather_regime' in dimensions and 'weather_regime' not in flights.columns:
+            flights = flights.assign(weather_regime=weather_regime(flights))
+
+        sums, counts = [self.abs_sums], [self.counts]
+        for dimension in dimensions:
+            keys = flights[dimension].astype(str).to_numpy()
+            grouped = abs_values.groupby(keys)
+            group_sums = grouped.sum()
+            group_sums.index = pd.MultiIndex.from_product([[dimension], group_sums.index], names=['dimension', 'key'])
+            group_counts = grouped.size()
+            group_counts.index = group_sums.index
+            sums.append(group_sums)
+            counts.append(group_counts)
+
+        self.abs_sums = pd.concat(sums).groupby(level=['dimension', 'key']).sum()
+        self.counts = pd.concat(counts).groupby(level=['dimension', 'key']).sum().rename('count')
+        self.flights = self.flights.append(new_flights)
+        return len(new_flights)
+
+    def mean_abs_shap(self, dimension=None):
+        """Table of mean |SHAP| per feature, optionally for one dimension only."""
+        table = self.abs_sums.div(self.counts, axis=0)
+        table.insert(0, 'count', self.counts)
+        return table if dimension is None else table.loc[dimension]
+
+    def importance(self, dimension, key, top=None):
+        """Features ranked by mean |SHAP| for one route / airport / month / weather regime.
+
+        Args:
+            dimension (str): One of DIMENSIONS
+            key: Value of the dimension, e.g. 'TJSJ-KMCO' or 'LIFR + wx'
+            top (int): Only return the top features
+
+        Returns:
+            Series: Mean |SHAP| per model input feature, largest first
+        """
+        position = (dimension, str(key))
+        importance = (self.abs_sums.loc[position] / self.counts.loc[position]).sort_values(ascending=False)
+        return importance if top is None else importance.iloc[:top]
+
+    def save(self, path):
+        joblib.dump({'feature_names': self.feature_names, 'abs_sums': self.abs_sums,
+                     'counts': self.counts, 'flights': self.flights, 'model_hash': self.model_hash}, path)
+
+    @classmethod
+    def load(cls, path):
+        return cls(**joblib.load(path))
+
+
+def update_aggregates(path, shap_store, df, dimensions=DIMENSIONS):
+    """Load the aggregates at path (or start new ones), fold in new flights and save.
+
+    Aggregates of another model than the store's are replaced.
+
+    Args:
+        path (str): Aggregates file (joblib)
+        shap_store (ShapStore): Per-flight SHAP values (see shap_cache.build_shap_store)
+        df (DataFrame): Pre-processed flight data with the same index as the store
+        dimensions (list): Grouping columns
+
+    Returns:
+        ShapAggregates: The updated aggregates
+    """
+    try:
+        aggregates = ShapAggregates.load(path)
+    except FileNotFoundError:
+        feature_names = list(dict.fromkeys(raw_feature_names(shap_store.feature_names)))
+        aggregates = ShapAggregates(feature_names, model_hash=shap_store.model_hash)
+    if aggregates.update(shap_store, df, dimensions) > 0:
+        aggregates.save(path)
+    return aggregates
+
+
+if __name__ == '__main__':
+    # Usage: python shap_aggregates.py shap_store/ df_preprocessed.csv shap_aggregates.joblib
+    shap_store = ShapStore(sys.argv[1])
+    df_preprocessed = pd.read_csv(sys.argv[2], index_col=0)
+    aggregates = update_aggregates(sys.argv[3], shap_store, df_preprocessed)
+    print(aggregates.mean_abs_shap('weather_regime').round(4).to_string())
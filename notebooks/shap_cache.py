@@ -0,0 +1,241 @@
+import os
+import sys
+import json
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import joblib
+import shap
+
+# Explainer built once per worker process (see _init_explainer)
+_WORKER = {}
+
+
+def _init_explainer(model, background):
+    # With a background set SHAP values are interventional; without one, tree path dependent
+    if background is None:
+        _WORKER['explainer'] = shap.TreeExplainer(model)
+    else:
+        _WORKER['explainer'] = shap.TreeExplainer(model, data=background, feature_perturbation='interventional')
+
+
+def _explain_chunk(chunk):
+    """Worker: SHAP values of the delayed class (class 1) for one chunk of encoded rows."""
+    values = _WORKER['explainer'].shap_values(chunk, check_additivity=False)
+    values = np.asarray(values)
+    # Older shap returns one array per class, newer one (rows, features, classes) array
+    if values.ndim == 3:
+        values = values[1] if values.shape[0] == 2 and values.shape[1] == len(chunk) else values[:, :, 1]
+    return values.astype(np.float32)
+
+
+def _expected_value(model, background):
+    explainer = shap.TreeExplainer(model) if background is None else \
+        shap.TreeExplainer(model, data=background, feature_perturbation='interventional')
+    return float(np.atleast_1d(explainer.expected_value)[-1])
+
+
+def pipeline_hash(pipeline):
+    """Fingerprint of a fitted pipeline (pre-processing, sampler and forest), stable across loads.
+
+    The node arrays of the fitted trees contain padding bytes that differ from one unpickling to
+    the next, so the trees are hashed field by field instead of as raw memory.
+    """
+    model = pipeline.named_steps['model']
+    trees = []
+    for estimator in model.estimators_:
+        state = estimator.tree_.__getstate__()
+        nodes = state['nodes']
+        trees.append(({k: v for k, v in vars(estimator).items() if k != 'tree_'},
+                      [nodes[field] for field in nodes.dtype.names], state['values']))
+    steps = [(name, step) for name, step in pipeline.steps if name != 'model']
+    model_state = {k: v for k, v in vars(model).items() if k != 'estimators_'}
+    return joblib.hash((steps, model_state, trees))
+
+
+def encode_features(pipeline, X):
+    """Apply the fitted pre-processing of the pipeline, i.e. the exact matrix the forest sees.
+
+    Args:
+        pipeline (Pipeline): Fitted ``pipeline_rf_rus``
+        X (DataFrame): Raw feature rows
+
+    Returns:
+        tuple: (float32 encoded matrix, list of encoded feature names)
+    """
+    pre_process = pipeline.named_steps['pre_process']
+    encoded = pre_process.transform(X)
+    return np.asarray(encoded, dtype=np.float32), list(pre_process.get_feature_names_out())
+
+
+class ShapStore:
+    """Per-flight SHAP values on disk, looked up by flight index without loading the whole file.
+
+    A store is a directory with 'values.npy' (float32, one row per flight, memory-mapped on
+    read), 'index.npy' (the flight index of each row) and 'meta.json' (feature names, expected
+    value and the fingerprint of the pipeline the values belong to).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.feature_names = self.meta['feature_names']
+        self.expected_value = self.meta['expected_value']
+        self.model_hash = self.meta['model_hash']
+        self.values = np.load(os.path.join(path, 'values.npy'), mmap_mode='r')
+        self.index = pd.Index(np.load(os.path.join(path, 'index.npy'), allow_pickle=True))
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, flight_index):
+        return flight_index in self.index
+
+    def values_for(self, flight_indices):
+        """SHAP values of several flights.
+
+        Args:
+            flight_indices (list): Flight indices (as in the X the store was built from)
+
+        Returns:
+            DataFrame: One row per flight, one column per encoded feature
+        """
+        positions = self.index.get_indexer(flight_indices)
+        if (positions < 0).any():
+            missing = np.asarray(flight_indices)[positions < 0]
+            raise KeyError(f"No SHAP values stored for flight(s) {list(missing[:5])}")
+        return pd.DataFrame(np.asarray(self.values[positions]), index=flight_indices, columns=self.feature_names)
+
+    def explain(self, flight_index, top=None):
+        """Contributions of each feature to one prediction, largest absolute effect first.
+
+        Args:
+            flight_index: Flight index
+            top (int): Only return the top features
+
+        Returns:
+            Series: SHAP value per encoded feature (they add up to the prediction minus expected_value)
+        """
+        contributions = self.values_for([flight_index]).iloc[0]
+        contributions = contributions.reindex(contributions.abs().sort_values(ascending=False).index)
+        return contributions if top is None else contributions.iloc[:top]
+
+
+def _write_store(path, values, index, meta, background=None):
+    # Written into a temporary directory that then replaces the store, so a reader never mixes
+    # the files of two versions (as pipeline_runner does for its cache entries)
+    path = os.path.abspath(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_dir = f'{path}.tmp{os.getpid()}'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, 'values.npy'), values)
+    np.save(os.path.join(tmp_dir, 'index.npy'), np.asarray(index, dtype=object))
+    if background is not None:
+        np.save(os.path.join(tmp_dir, 'background.npy'), background)
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+    # A directory cannot replace a non-empty one: the old store is moved aside first
+    old_dir = f'{path}.old{os.getpid()}'
+    if os.path.exists(path):
+        shutil.rmtree(old_dir, ignore_errors=True)
+        os.replace(path, old_dir)
+    os.replace(tmp_dir, path)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def build_shap_store(pipeline, X, path, X_background=None, background_size=100, chunk_size=1000,
+                     n_jobs=None, random_state=42):
+    """Compute (or complete) the per-flight SHAP store of a fitted pipeline.
+
+    Flights already in the store for the same pipeline are not recomputed, so the job can be
+    re-run as new predictions come in. A store is only completed with its own background set, so
+    all its values are of one kind (interventional or path-dependent). The remaining rows are explained with tree SHAP in
+    chunks across a process pool, each worker building its explainer once.
+
+    Args:
+        pipeline (Pipeline): Fitted ``pipeline_rf_rus``
+        X (DataFrame): Raw feature rows to explain; its index is the flight key of the store
+        path (str): Store directory
+        X_background (DataFrame): Rows to sample the background set from (e.g. X_train);
+            defaults to X
+        background_size (int): Background rows; None uses path-dependent tree SHAP (no background)
+        chunk_size (int): Rows per worker task
+        n_jobs (int): Worker processes (defaults to os.cpu_count())
+        random_state (int): Seed of the background sample
+
+    Returns:
+        ShapStore: The up-to-date store
+
+    Raises:
+        ValueError: If the store was built with another background_size
+    """
+    model = pipeline.named_steps['model']
+    # The pre-processing steps change the encoded rows too, so the whole pipeline is hashed
+    model_hash = pipeline_hash(pipeline)
+
+    store = None
+    if os.path.exists(os.path.join(path, 'meta.json')):
+        store = ShapStore(path)
+        if store.model_hash != model_hash:
+            # Values of another model are useless, start over
+            store = None
+        elif store.meta['background_size'] is not None and not os.path.exists(os.path.join(path, 'background.npy')):
+            # Background set of the stored values is lost, they cannot be completed consistently
+            store = None
+
+    if not X.index.is_unique:
+        raise ValueError("X index must be unique, it is used as the flight key of the store")
+    todo = X if store is None else X[~X.index.isin(store.index)]
+    if store is not None and len(todo) == 0:
+        return store
+    if store is not None and store.meta['background_size'] != background_size:
+        raise ValueError(f"SHAP store at {path} was built with background_size="
+                         f"{store.meta['background_size']}, not {background_size}; "
+                         "delete it to rebuild with the new background")
+
+    # Background sample in the encoded space
+    background = None
+    if background_size is not None:
+        if store is not None:
+            background = np.load(os.path.join(path, 'background.npy'))
+        else:
+            source = X if X_background is None else X_background
+            sample = source.sample(n=min(background_size, len(source)), random_state=random_state)
+            background = encode_features(pipeline, sample)[0]
+
+    encoded, feature_names = encode_features(pipeline, todo)
+    chunks = [encoded[start:start + chunk_size] for start in range(0, len(encoded), chunk_size)]
+
+    with ProcessPoolExecutor(max_workers=n_jobs or os.cpu_count(),
+                             initializer=_init_explainer, initargs=(model, background)) as pool:
+        values = np.concatenate(list(pool.map(_explain_chunk, chunks)), axis=0)
+
+    if store is not None:
+        values = np.concatenate([np.asarray(store.values), values], axis=0)
+        index = np.concatenate([np.asarray(store.index, dtype=object), np.asarray(todo.index, dtype=object)])
+        meta = store.meta
+        del store
+    else:
+        index = np.asarray(todo.index, dtype=object)
+        meta = {'feature_names': feature_names,
+                'expected_value': _expected_value(model, background),
+                'model_hash': model_hash,
+                'background_size': background_size}
+
+    _write_store(path, values, index, meta, background)
+    return ShapStore(path)
+
+
+if __name__ == '__main__':
+    # Usage: python shap_cache.py pipeline_rf_rus_model.pkl X_test.csv shap_store/ [X_train.csv]
+    pipeline_rf_rus = joblib.load(sys.argv[1])
+    X_test = pd.read_csv(sys.argv[2], index_col=0)
+    X_train = pd.read_csv(sys.argv[4], index_col=0) if len(sys.argv) > 4 else None
+    shap_store = build_shap_store(pipeline_rf_rus, X_test, sys.argv[3], X_background=X_train)
+    print(f"{len(shap_store)} flights explained, {len(shap_store.feature_names)} features")
+    print(shap_store.explain(shap_store.index[0], top=10).to_string())
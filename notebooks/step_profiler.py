@@ -0,0 +1,208 @@
+import os
+import sys
+import json
+import time
+import threading
+
+import numpy as np
+
+# Interval of the resident memory sampler, in seconds
+SAMPLE_INTERVAL = 0.005
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def _rss_bytes():
+    # Current resident set size (Linux); the process peak on other Unix systems, 0 where neither is available
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        pass
+    try:
+        import resource  # Unix only
+    except ImportError:
+        return 0
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, in KiB on the other systems
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def _data_buffers(df):
+    """Memory buffers holding the data of a DataFrame, as {address: bytes}.
+
+    Views share their base buffer, so a buffer that was not there after the previous step is
+    data the step copied. This reads the frame's blocks (pandas internals), only when profiling;
+    if a pandas version does not expose them, every column of a new frame object counts as new
+    data (sized with memory_usage(deep=True)).
+    """
+    blocks = getattr(getattr(df, '_mgr', None), 'blocks', None)
+    if blocks is None:
+        return {(id(df), column): size for column, size in df.memory_usage(index=False, deep=True).items()}
+
+    buffers = {}
+    for block in blocks:
+        values = getattr(block.values, '_ndarray', block.values)
+        pa_array = getattr(values, '_pa_array', None)
+        if isinstance(values, np.ndarray):
+            while isinstance(values.base, np.ndarray):
+                values = values.base
+            buffers[values.__array_interface__['data'][0]] = values.nbytes
+        elif hasattr(pa_array, 'chunks'):
+            # Arrow-backed columns (e.g. the str dtype)
+            for chunk in pa_array.chunks:
+                for buffer in chunk.buffers():
+                    if buffer is not None:
+                        buffers[buffer.address] = buffer.size
+        else:
+            buffers[id(values)] = getattr(values, 'nbytes', 0)
+    return buffers
+
+
+class StepProfiler:
+    """Wall time, memory and frame copies of the steps of a DataFrame function.
+
+    The function calls ``mark(step, df)`` at the end of every step. Each step gets the time and
+    the peak resident memory (sampled in a background thread) since the previous mark, the
+    shape of the frame, whether it is a new DataFrame object and how much of its data is in
+    buffers the frame did not have before: new columns, or data the step copied (a row filter or
+    a pd.concat shows up as most of the frame).
+
+    Used as a context manager, the sampler thread is stopped when the block exits, also when a
+    step raises.
+
+    Example:
+        with StepProfiler('metar_cleaning') as profiler:
+            profiler.start(df)
+            ...
+            profiler.mark('drop_duplicates', df)
+        profiler.write('metar_cleaning_profile.json')
+
+    Args:
+        name (str): Name of the profiled function, stored in the report
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.steps = []
+        self._frame_id = None
+        self._buffers = {}
+        self._peak = 0
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        return False
+
+    def _sample(self):
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            self._peak = max(self._peak, _rss_bytes())
+
+    def stop(self):
+        """Stop the memory sampler and wait for its thread to end."""
+        self._stop.set()
+        if self._sampler.is_alive():
+            self._sampler.join()
+
+    def start(self, df):
+        """Record the input frame and start the clock."""
+        self.rows_in, self.columns_in = df.shape
+        self._frame_id = id(df)
+        self._buffers = _data_buffers(df)
+        self._rss = self._peak = self.rss_start = _rss_bytes()
+        self._sampler.start()
+        self.started = self._last = time.perf_counter()
+
+    def mark(self, step, df):
+        """Close a step: df is the frame the function holds once the step is done."""
+        now = time.perf_counter()
+        rss = _rss_bytes()
+        peak = max(self._peak, rss)
+        buffers = _data_buffers(df)
+        copied = sum(size for address, size in buffers.items() if address not in self._buffers)
+        self.steps.append({'step': step,
+                           'seconds': now - self._last,
+                           'peak_rss_mib': peak / 2**20,
+                           'peak_rss_delta_mib': (peak - self._rss) / 2**20,
+                           'rss_mib': rss / 2**20,
+                           'rows': df.shape[0],
+                           'columns': df.shape[1],
+                           'new_frame': id(df) != self._frame_id,
+                           'copied_mib': copied / 2**20})
+        self._frame_id, self._buffers = id(df), buffers
+        self._rss = self._peak = rss
+        # Profiling overhead is not charged to the next step
+        self._last = time.perf_counter()
+
+    def report(self):
+        """Machine-readable report: totals plus one record per step, in order."""
+        self.stop()
+        return {'function': self.name,
+                'rows_in': self.rows_in,
+                'columns_in': self.columns_in,
+                'seconds': sum(step['seconds'] for step in self.steps),
+                'wall_seconds': time.perf_counter() - self.started,
+                'rss_start_mib': self.rss_start / 2**20,
+                'peak_rss_delta_mib': max([step['peak_rss_mib'] for step in self.steps],
+                                          default=self.rss_start / 2**20) - self.rss_start / 2**20,
+                'copied_mib': sum(step['copied_mib'] for step in self.steps),
+                'steps': self.steps}
+
+    def write(self, path):
+        """Write the report as JSON and return it."""
+        report = self.report()
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        return report
+
+
+class PeakRss:
+    """Resident memory at the start of a block and its peak while the block runs.
+
+    The peak is the current RSS sampled in a background thread, so unlike ru_maxrss it is not
+    the peak of the whole process lifetime.
+
+    Example:
+        with PeakRss() as rss:
+            pipeline.fit(X, y)
+        print(rss.peak - rss.start)
+    """
+
+    def __enter__(self):
+        self.start = self.peak = _rss_bytes()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            self.peak = max(self.peak, _rss_bytes())
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._sampler.join()
+        self.peak = max(self.peak, _rss_bytes())
+        return False
+
+
+class _NoProfiler:
+    # Stands in for StepProfiler when profiling is off
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def start(self, df):
+        pass
+
+    def mark(self, step, df):
+        pass
+
+
+NO_PROFILER = _NoProfiler()
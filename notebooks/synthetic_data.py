@@ -0,0 +1,431 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Deterministic synthetic stand-ins for the AVWX METAR history and the FlightAware flight records,
+# used to profile the pipeline at production scale without the (paid) source data.
+
+# Size of the flight dataset used for the project, i.e. scale=1
+BASE_FLIGHTS = 220_000
+
+ROUTES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'example_data',
+                           'routes_by_region_2024_v3.csv')
+
+# ICAO codes of the airports in routes_by_region_2024_v3.csv
+iata_to_icao = {
+    'AEP': 'SABE', 'ALG': 'DAAG', 'AMS': 'EHAM', 'ARN': 'ESSA', 'ATL': 'KATL', 'BER': 'EDDB',
+    'BKK': 'VTBS', 'BOG': 'SKBO', 'BOM': 'VABB', 'CAI': 'HECA', 'CDG': 'LFPG', 'CGK': 'WIII',
+    'CPH': 'EKCH', 'CUN': 'MMUN', 'DEL': 'VIDP', 'DFW': 'KDFW', 'DOH': 'OTHH', 'DUB': 'EIDW',
+    'DXB': 'OMDB', 'FCO': 'LIRF', 'FRA': 'EDDF', 'FUK': 'RJFF', 'GDL': 'MMGL', 'GRU': 'SBGR',
+    'HEL': 'EFHK', 'HKG': 'VHHH', 'ICN': 'RKSI', 'IST': 'LTFM', 'JED': 'OEJN', 'JFK': 'KJFK',
+    'KEF': 'BIKF', 'KIX': 'RJBB', 'KUL': 'WMKK', 'LAX': 'KLAX', 'LGA': 'KLGA', 'LHR': 'EGLL',
+    'LIM': 'SPJC', 'LIS': 'LPPT', 'MAD': 'LEMD', 'MCO': 'KMCO', 'MED': 'OEMA', 'MIA': 'KMIA',
+    'MSY': 'KMSY', 'NRT': 'RJAA', 'ORD': 'KORD', 'ORY': 'LFPO', 'OSL': 'ENGM', 'PMI': 'LEPA',
+    'PTY': 'MPTO', 'RUN': 'FMEE', 'SCL': 'SCEL', 'SFO': 'KSFO', 'SIN': 'WSSS', 'SJU': 'TJSJ',
+    'TPE': 'RCTP', 'YUL': 'CYUL', 'YVR': 'CYVR', 'YYZ': 'CYYZ', 'ZRH': 'LSZH',
+}
+
+operators = ['AFR', 'DLH', 'SWR', 'BAW', 'EIN', 'KLM', 'DAL', 'AAL', 'UAL', 'JBU', 'UAE', 'SVA',
+             'MSR', 'QTR', 'CPA', 'EVA', 'KAL', 'JAL', 'ANA', 'SIA', 'MAS', 'THA', 'GIA', 'LAN',
+             'AVA', 'CMP', 'ACA', 'WJA', 'AMX', 'IBE', 'TAP', 'SAS', 'FIN', 'ICE', 'AIC', 'THY']
+
+# Aircraft rotations: a flight starts a new rotation (a new day of an aircraft) with this
+# probability, otherwise it is the next leg of the previous one after a scheduled turnaround
+ROTATION_BREAK_PROBABILITY = 0.3
+MAX_ROTATION_LEGS = 6
+TURNAROUND_MINUTES = (30, 180)
+# Shortest turnaround: an inbound arrival delay beyond the scheduled slack delays the next leg
+MIN_TURNAROUND_MINUTES = 30
+
+aircraft_types = ['A320', 'A321', 'A20N', 'A21N', 'B738', 'B38M', 'A319', 'E190', 'BCS3',
+                  'A333', 'A359', 'B77W', 'B789', 'B788', 'A388']
+
+# Templates for the stringified list columns of the AVWX export: (value, probability)
+wx_code_templates = [
+    ("[]", 0.80),
+    ("[{'repr': '-RA', 'value': 'Light Rain'}]", 0.06),
+    ("[{'repr': 'RA', 'value': 'Rain'}]", 0.025),
+    ("[{'repr': 'BR', 'value': 'Mist'}]", 0.04),
+    ("[{'repr': 'FG', 'value': 'Fog'}]", 0.01),
+    ("[{'repr': 'HZ', 'value': 'Haze'}]", 0.02),
+    ("[{'repr': '+SHRA', 'value': 'Heavy Showers Rain'}]", 0.008),
+    ("[{'repr': 'TSRA', 'value': 'Thunderstorm Rain'}]", 0.005),
+    ("[{'repr': '-SN', 'value': 'Light Snow'}]", 0.01),
+    ("[{'repr': 'VCSH', 'value': 'Vicinity Showers'}]", 0.012),
+    ("[{'repr': '-RA', 'value': 'Light Rain'}, {'repr': 'BR', 'value': 'Mist'}]", 0.01),
+]
+
+# (clouds value, lowest BKN/OVC ceiling in hundreds of feet or None, probability)
+cloud_templates = [
+    ("[]", None, 0.20),
+    ("[{'repr': 'FEW030', 'type': 'FEW', 'base': 30, 'altitude': 30, 'modifier': None}]", None, 0.20),
+    ("[{'repr': 'SCT045', 'type': 'SCT', 'base': 45, 'altitude': 45, 'modifier': None}]", None, 0.15),
+    ("[{'repr': 'BKN025', 'type': 'BKN', 'base': 25, 'altitude': 25, 'modifier': None}]", 25, 0.12),
+    ("[{'repr': 'OVC008', 'type': 'OVC', 'base': 8, 'altitude': 8, 'modifier': None}]", 8, 0.06),
+    ("[{'repr': 'OVC003', 'type': 'OVC', 'base': 3, 'altitude': 3, 'modifier': None}]", 3, 0.02),
+    ("[{'repr': 'FEW020', 'type': 'FEW', 'base': 20, 'altitude': 20, 'modifier': None}, "
+     "{'repr': 'BKN120', 'type': 'BKN', 'base': 120, 'altitude': 120, 'modifier': None}]", 120, 0.12),
+    ("[{'repr': 'SCT015', 'type': 'SCT', 'base': 15, 'altitude': 15, 'modifier': None}, "
+     "{'repr': 'BKN040', 'type': 'BKN', 'base': 40, 'altitude': 40, 'modifier': None}, "
+     "{'repr': 'OVC250', 'type': 'OVC', 'base': 250, 'altitude': 250, 'modifier': None}]", 40, 0.08),
+    ("[{'repr': 'FEW035CB', 'type': 'FEW', 'base': 35, 'altitude': 35, 'modifier': 'CB'}]", None, 0.03),
+    ("[{'repr': 'CLR', 'type': 'CLR', 'base': None, 'altitude': None, 'modifier': None}]", None, 0.02),
+]
+
+pressure_tendencies = ['increasing, then decreasing', 'increasing, then steady',
+                       'increasing steadily or unsteadily', 'decreasing or steady, then increasing',
+                       'steady', 'decreasing, then increasing', 'decreasing, then steady',
+                       'decreasing steadily or unsteadily', 'steady or increasing, then decreasing']
+
+
+def _pick(rng, templates, n):
+    """Draw n template indices according to the template probabilities."""
+    p = np.array([t[-1] for t in templates], dtype=float)
+    return rng.choice(len(templates), size=n, p=p / p.sum())
+
+
+def load_routes(path=ROUTES_PATH):
+    """Route catalogue (FIN_1 output) with ICAO codes added."""
+    routes = pd.read_csv(path, index_col=0)
+    routes['origin_icao'] = routes['Origin Airport Code'].map(iata_to_icao)
+    routes['destination_icao'] = routes['Destination Airport Code'].map(iata_to_icao)
+    return routes.dropna(subset=['origin_icao', 'destination_icao']).reset_index(drop=True)
+
+
+def synthetic_metars(n_records, stations, start='2022-01-01', end='2024-12-31', seed=42, anchors=None):
+    """Raw METAR records in the json-normalized AVWX history layout expected by ``metar_cleaning``.
+
+    Args:
+        n_records (int): Number of METAR reports (ignored when anchors are given)
+        stations (list): Station ICAO codes
+        start (str): First report date
+        end (str): Last report date
+        seed (int): Random seed (same seed, same data)
+        anchors (tuple): Optional (stations, times) arrays; one report is issued at each station
+            on the last :20/:50 slot before the time, like the per-flight METAR requests
+
+    Returns:
+        DataFrame: One row per report, list-valued fields stringified as in the saved CSVs
+    """
+    rng = np.random.default_rng(seed)
+
+    # Reports at :20 / :50 past the hour
+    if anchors is not None:
+        station = np.asarray(anchors[0])
+        n_records = len(station)
+        time_dt = (pd.DatetimeIndex(anchors[1]) - pd.Timedelta(minutes=20)).floor('30min') + pd.Timedelta(minutes=20)
+    else:
+        stations = np.asarray(sorted(stations))
+        station = stations[rng.integers(0, len(stations), n_records)]
+        start_ts, end_ts = pd.Timestamp(start), pd.Timestamp(end) + pd.Timedelta(days=1)
+        n_slots = int((end_ts - start_ts) / pd.Timedelta(minutes=30))
+        time_dt = start_ts + pd.to_timedelta(rng.integers(0, n_slots, n_records) * 30 + 20, unit='min')
+    order = np.lexsort((time_dt.to_numpy(), station))
+    station, time_dt = station[order], time_dt[order]
+
+    # Stations in the US and its territories report in statute miles / inHg with US remarks
+    us_station = np.char.startswith(station.astype(str), 'K') | np.char.startswith(station.astype(str), 'TJ')
+
+    month = time_dt.month.to_numpy()
+    winter = np.isin(month, [12, 1, 2])
+    temperature = np.round(rng.normal(np.where(winter, 3, 18), 7)).astype(float)
+    temperature[rng.random(n_records) < 0.001] = np.nan
+    temperature[rng.random(n_records) < 0.0005] = 99.0  # sensor junk, removed by cleaning
+    dewpoint = np.round(temperature - rng.gamma(2.0, 2.5, n_records))
+    relative_humidity = np.clip(np.exp(0.0625 * (dewpoint - temperature)), 0, 1)
+
+    wind_speed = np.round(rng.gamma(2.0, 4.0, n_records))
+    wind_gust = np.where(rng.random(n_records) < 0.08, wind_speed + rng.integers(8, 20, n_records), np.nan)
+    wind_direction = (rng.integers(0, 36, n_records) * 10).astype(float)
+    wind_variable = rng.random(n_records) < 0.05
+
+    wx = _pick(rng, wx_code_templates, n_records)
+    clouds = _pick(rng, cloud_templates, n_records)
+    ceiling = np.array([np.nan if t[1] is None else t[1] for t in cloud_templates])[clouds]
+
+    # Visibility in meters, lower with fog/mist; US stations report statute miles
+    visibility_m = np.where(np.isin(wx, [3, 4, 10]), rng.choice([300, 800, 1500, 3000], n_records), 9999)
+    visibility_m = np.where(rng.random(n_records) < 0.1, rng.choice([4000, 6000, 8000], n_records), visibility_m)
+    visibility_sm = np.select([visibility_m < 1000, visibility_m < 5000, visibility_m < 9999],
+                              [0.5, 3.0, 6.0], default=10.0)
+    visibility = np.where(us_station, visibility_sm, visibility_m).astype(float)
+    visibility[rng.random(n_records) < 0.01] = np.nan
+    fraction = us_station & (visibility == 0.5)
+
+    # Flight rules from visibility and ceiling
+    flight_rules = np.select([(visibility_m < 1600) | (ceiling < 5),
+                              (visibility_m < 5000) | (ceiling < 10),
+                              (visibility_m <= 8000) | (ceiling <= 30)],
+                             ['LIFR', 'IFR', 'MVFR'], default='VFR')
+
+    altimeter_hpa = np.round(rng.normal(1015, 8, n_records))
+    altimeter = np.where(us_station, np.round(altimeter_hpa / 33.8639, 2), altimeter_hpa)
+    elevation = rng.integers(0, 2000, n_records)
+    pressure_altitude = elevation + np.round((1013 - altimeter_hpa) * 27)
+    density_altitude = pressure_altitude + np.round(120 * (np.nan_to_num(temperature, nan=15) - 15))
+
+    # US remarks: sea level pressure, pressure tendency and decimal temperatures
+    us_remarks = us_station & (rng.random(n_records) < 0.9)
+    tendency = np.where(us_remarks & (rng.random(n_records) < 0.3),
+                        np.asarray(pressure_tendencies, dtype=object)[rng.integers(0, 9, n_records)], None)
+    six_hourly = us_remarks & np.isin(time_dt.hour.to_numpy(), [5, 11, 17, 23])
+
+    def remark_value(mask, values):
+        return np.where(mask, values, np.nan)
+
+    wind_repr = np.char.add(np.char.zfill(wind_direction.astype(int).astype(str), 3),
+                            np.char.zfill(wind_speed.astype(int).astype(str), 2))
+    raw = pd.Series(station).str.cat([
+        pd.Series(time_dt.strftime('%d%H%MZ')),
+        pd.Series(np.char.add(wind_repr, 'KT')),
+        pd.Series(np.where(us_station, np.char.add(np.nan_to_num(visibility_sm).astype(str), 'SM'),
+                           visibility_m.astype(int).astype(str))),
+        pd.Series(np.where(np.isnan(temperature), '//', np.nan_to_num(temperature).astype(int).astype(str)))
+        + '/' + pd.Series(np.nan_to_num(dewpoint).astype(int).astype(str)),
+        pd.Series(np.where(us_station, np.char.add('A', (altimeter * 100).astype(int).astype(str)),
+                           np.char.add('Q', altimeter.astype(int).astype(str)))),
+    ], sep=' ')
+
+    return pd.DataFrame({
+        'raw': raw,
+        'sanitized': raw,
+        'station': station,
+        'time.dt': time_dt.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'remarks': np.where(us_remarks, 'AO2', ''),
+        'flight_rules': flight_rules,
+        'wx_codes': np.asarray([t[0] for t in wx_code_templates], dtype=object)[wx],
+        'clouds': np.asarray([t[0] for t in cloud_templates], dtype=object)[clouds],
+        'other': '[]',
+        'runway_visibility': np.where(visibility_m < 1600, "[{'repr': 'R26/0600', 'runway': '26'}]", '[]'),
+        'wind_variable_direction': np.where(wind_variable, "[{'repr': '180', 'value': 180}, {'repr': '240', 'value': 240}]", '[]'),
+        'wind_direction.value': wind_direction,
+        'wind_speed.value': wind_speed,
+        'wind_gust.value': wind_gust,
+        'visibility.value': visibility,
+        'visibility.numerator': np.where(fraction, 1.0, np.nan),
+        'visibility.denominator': np.where(fraction, 2.0, np.nan),
+        'visibility.normalized': np.where(fraction, '1/2', None),
+        'temperature.value': temperature,
+        'dewpoint.value': dewpoint,
+        'altimeter.value': altimeter,
+        'relative_humidity': relative_humidity,
+        'density_altitude': density_altitude,
+        'pressure_altitude': pressure_altitude,
+        'remarks_info.codes': '[]',
+        'remarks_info.sea_level_pressure.value': remark_value(us_remarks, altimeter_hpa - 0.4),
+        'remarks_info.pressure_tendency.tendency': tendency,
+        'remarks_info.pressure_tendency.change': remark_value(tendency != None, rng.integers(0, 30, n_records) / 10),
+        'remarks_info.temperature_decimal.value': remark_value(us_remarks, temperature + 0.1),
+        'remarks_info.dewpoint_decimal.value': remark_value(us_remarks, dewpoint + 0.1),
+        'remarks_info.maximum_temperature_6.value': remark_value(six_hourly, temperature + 1),
+        'remarks_info.minimum_temperature_6.value': remark_value(six_hourly, temperature - 1),
+        'remarks_info.maximum_temperature_24.value': remark_value(six_hourly & (time_dt.hour.to_numpy() == 23), temperature + 4),
+        'remarks_info.minimum_temperature_24.value': remark_value(six_hourly & (time_dt.hour.to_numpy() == 23), temperature - 4),
+        'remarks_info.snow_depth.value': remark_value(us_remarks & winter & (rng.random(n_records) < 0.02), 2.0),
+        'remarks_info.precip_hourly.value': remark_value(us_remarks & (wx > 0), 0.01),
+    })
+
+
+def synthetic_flights(n_flights, routes=None, start='2022-01-01', end='2024-12-31', seed=42):
+    """FlightAware-like historical flight records over the route catalogue.
+
+    Flights are legs of aircraft rotations linked by 'inbound_fa_flight_id', with 30 min to 3 h
+    scheduled turnarounds; a late inbound leg delays the next one once the slack is used up.
+
+    Args:
+        n_flights (int): Number of flights
+        routes (DataFrame): Output of ``load_routes``; loaded from example_data when None
+        start (str): First scheduled departure date
+        end (str): Last scheduled departure date
+        seed (int): Random seed (same seed, same data)
+
+    Returns:
+        DataFrame: One row per flight with the FlightAware json-normalized columns
+    """
+    rng = np.random.default_rng(seed)
+    if routes is None:
+        routes = load_routes()
+    n_routes = len(routes)
+    route = rng.integers(0, n_routes, n_flights)
+
+    # Rotations of a few legs, each leg scheduled out a turnaround after the previous one is in;
+    # block time (out to in) is the route's flight time plus 15 min taxi-out and 10 min taxi-in
+    start_ts, end_ts = pd.Timestamp(start), pd.Timestamp(end) + pd.Timedelta(days=1)
+    n_slots = int((end_ts - start_ts) / pd.Timedelta(minutes=5))
+    route_ete = rng.integers(45, 14 * 60, n_routes) * 60
+    filed_ete = route_ete[route] + rng.integers(-10, 10, n_flights) * 60
+    new_rotation = rng.random(n_flights) < ROTATION_BREAK_PROBABILITY
+    new_rotation[0] = True
+    rotation = np.cumsum(new_rotation) - 1
+    new_rotation |= pd.Series(rotation).groupby(rotation).cumcount().to_numpy() % MAX_ROTATION_LEGS == 0
+    rotation = np.cumsum(new_rotation) - 1
+    rotation_start = rng.integers(0, n_slots, rotation[-1] + 1) * 300
+    turnaround = rng.integers(TURNAROUND_MINUTES[0] // 5, TURNAROUND_MINUTES[1] // 5 + 1, n_flights) * 300
+    turnaround[new_rotation] = 0
+    # Seconds from the rotation's first scheduled out to each leg's scheduled out
+    previous_block = np.concatenate([[0], filed_ete[:-1] + 25 * 60])
+    previous_block[new_rotation] = 0
+    offset = pd.Series(previous_block + turnaround).groupby(rotation).cumsum().to_numpy()
+    out_seconds = rotation_start[rotation] + offset
+
+    # Records in scheduled departure order
+    order = np.argsort(out_seconds, kind='stable')
+    route, filed_ete, rotation, turnaround = route[order], filed_ete[order], rotation[order], turnaround[order]
+    out_seconds = out_seconds[order]
+    route_row = routes.iloc[route]
+
+    # Each route is served by a few operators and aircraft types
+    route_operators = rng.choice(len(operators), size=(n_routes, 3))
+    route_aircraft = rng.choice(len(aircraft_types), size=(n_routes, 2))
+    operator = np.asarray(operators)[route_operators[route, rng.integers(0, 3, n_flights)]]
+    aircraft = np.asarray(aircraft_types, dtype=object)[route_aircraft[route, rng.integers(0, 2, n_flights)]]
+    aircraft[rng.random(n_flights) < 0.003] = None
+
+    # Scheduled times on 5-minute slots; block time depends on the route
+    scheduled_out = start_ts + pd.to_timedelta(out_seconds, unit='s')
+    scheduled_off = scheduled_out + pd.to_timedelta(15, unit='min')
+    scheduled_on = scheduled_off + pd.to_timedelta(filed_ete, unit='s')
+    scheduled_in = scheduled_on + pd.to_timedelta(10, unit='min')
+
+    # Delays: route/operator propensity, afternoon build-up and winter weather
+    route_propensity = rng.uniform(0.1, 0.45, n_routes)
+    p_delay = (route_propensity[route]
+               + 0.08 * (scheduled_out.hour.to_numpy() >= 15)
+               + 0.07 * np.isin(scheduled_out.month.to_numpy(), [12, 1, 2]))
+    delayed = rng.random(n_flights) < p_delay
+    departure_delay = np.where(delayed, rng.gamma(1.5, 1800, n_flights) + 900, rng.normal(-120, 300, n_flights))
+    departure_delay = np.round(departure_delay)
+    arrival_delay = np.round(departure_delay + rng.normal(0, 600, n_flights))
+
+    # The previous leg of each flight in its rotation (-1 for the first leg)
+    previous = pd.Series(np.arange(n_flights)).groupby(rotation).shift(1).fillna(-1).astype(int).to_numpy()
+    # Delay propagation: a late inbound aircraft eats the turnaround slack, then delays the departure.
+    # Legs are processed by their position in the rotation, so the inbound leg is always final.
+    leg = pd.Series(rotation).groupby(rotation).cumcount().to_numpy()
+    for position in range(1, leg.max() + 1):
+        legs = np.flatnonzero(leg == position)
+        inbound = previous[legs]
+        slack = turnaround[legs] - MIN_TURNAROUND_MINUTES * 60
+        knock_on = arrival_delay[inbound] - slack
+        later = knock_on > departure_delay[legs]
+        arrival_delay[legs[later]] += knock_on[later] - departure_delay[legs[later]]
+        departure_delay[legs[later]] = knock_on[later]
+
+    actual_out = scheduled_out + pd.to_timedelta(departure_delay, unit='s')
+    actual_in = scheduled_in + pd.to_timedelta(arrival_delay, unit='s')
+    cancelled = rng.random(n_flights) < 0.01
+
+    def iso(times, mask=None):
+        values = np.asarray(times.strftime('%Y-%m-%dT%H:%M:%SZ'), dtype=object)
+        if mask is not None:
+            values[mask] = None
+        return values
+
+    # FlightAware ids; a rotation is flown by one aircraft and each leg's inbound flight is the previous leg
+    fa_flight_id = np.char.add(np.char.add(operator, np.char.zfill(np.arange(n_flights).astype(str), 9)), '-fa')
+    # About eight rotations (days) per aircraft over the period
+    n_rotations = rotation.max() + 1
+    rotation_aircraft = rng.integers(0, max(1, n_rotations // 8), n_rotations)
+    registration = np.char.add('REG', np.char.zfill(rotation_aircraft[rotation].astype(str), 6))
+    inbound_fa_flight_id = np.where(previous >= 0, fa_flight_id[previous], None)
+
+    flight_number = rng.integers(1, 9999, n_flights).astype(str)
+    origin_iata = route_row['Origin Airport Code'].to_numpy()
+    destination_iata = route_row['Destination Airport Code'].to_numpy()
+
+    return pd.DataFrame({
+        'ident': np.char.add(operator, flight_number),
+        'ident_icao': np.char.add(operator, flight_number),
+        'ident_iata': np.char.add(np.char.ljust(operator, 3), flight_number),
+        'fa_flight_id': fa_flight_id,
+        'actual_runway_off': None,
+        'actual_runway_on': None,
+        'operator': operator,
+        'operator_icao': operator,
+        'operator_iata': np.char.ljust(operator, 2),
+        'flight_number': flight_number,
+        'registration': registration,
+        'atc_ident': None,
+        'inbound_fa_flight_id': inbound_fa_flight_id,
+        'codeshares': '[]',
+        'codeshares_iata': '[]',
+        'blocked': rng.random(n_flights) < 0.002,
+        'diverted': rng.random(n_flights) < 0.001,
+        'cancelled': cancelled,
+        'position_only': rng.random(n_flights) < 0.003,
+        'departure_delay': departure_delay,
+        'arrival_delay': arrival_delay,
+        'filed_ete': filed_ete.astype(float),
+        'foresight_predictions_available': False,
+        'scheduled_out': iso(scheduled_out),
+        'estimated_out': iso(actual_out),
+        'actual_out': iso(actual_out, cancelled),
+        'scheduled_off': iso(scheduled_off),
+        'estimated_off': iso(actual_out + pd.to_timedelta(15, unit='min')),
+        'actual_off': iso(actual_out + pd.to_timedelta(15, unit='min'), cancelled),
+        'scheduled_on': iso(scheduled_on),
+        'estimated_on': iso(actual_in - pd.to_timedelta(10, unit='min')),
+        'actual_on': iso(actual_in - pd.to_timedelta(10, unit='min'), cancelled),
+        'scheduled_in': iso(scheduled_in),
+        'estimated_in': iso(actual_in),
+        'actual_in': iso(actual_in, cancelled),
+        'progress_percent': np.where(cancelled, 0, 100),
+        'status': np.where(cancelled, 'Cancelled', 'Arrived / Gate Arrival'),
+        'aircraft_type': aircraft,
+        'route_distance': (filed_ete / 3600 * 450).astype(int),
+        'filed_airspeed': rng.integers(400, 500, n_flights),
+        'filed_altitude': np.where(rng.random(n_flights) < 0.5, rng.integers(280, 410, n_flights), 0),
+        'route': None,
+        'baggage_claim': None,
+        'seats_cabin_business': None,
+        'seats_cabin_coach': None,
+        'seats_cabin_first': None,
+        'gate_origin': None,
+        'gate_destination': None,
+        'terminal_origin': None,
+        'terminal_destination': None,
+        'type': 'Airline',
+        'origin.code': route_row['origin_icao'].to_numpy(),
+        'origin.code_icao': route_row['origin_icao'].to_numpy(),
+        'origin.code_iata': origin_iata,
+        'origin.code_lid': None,
+        'origin.timezone': None,
+        'origin.name': route_row['Origin Airport Name'].to_numpy(),
+        'origin.city': None,
+        'origin.airport_info_url': None,
+        'destination.code': route_row['destination_icao'].to_numpy(),
+        'destination.code_icao': route_row['destination_icao'].to_numpy(),
+        'destination.code_iata': destination_iata,
+        'destination.code_lid': None,
+        'destination.timezone': None,
+        'destination.name': route_row['Destination Airport Name'].to_numpy(),
+        'destination.city': None,
+        'destination.airport_info_url': None,
+    })
+
+
+def synthetic_dataset(scale=1.0, extra_metars_per_flight=0.0, seed=42):
+    """METAR history and flights at a multiple of the project's 220k-flight dataset.
+
+    As in FIN_2/FIN_3, METARs are those requested for each flight's departure and arrival,
+    so every flight has a report at both ends within the merge tolerance.
+
+    Args:
+        scale (float): Multiple of BASE_FLIGHTS
+        extra_metars_per_flight (float): Additional unanchored reports per flight
+        seed (int): Random seed (same seed, same data)
+
+    Returns:
+        tuple: (metar_data_df, flights_df) raw DataFrames
+    """
+    routes = load_routes()
+    n_flights = int(BASE_FLIGHTS * scale)
+    flights_df = synthetic_flights(n_flights, routes, seed=seed + 1)
+
+    stations = np.concatenate([flights_df['origin.code_icao'].to_numpy(), flights_df['destination.code_icao'].to_numpy()])
+    times = pd.to_datetime(pd.concat([flights_df['scheduled_out'], flights_df['scheduled_on']]), utc=True).dt.tz_localize(None)
+    metar_data_df = synthetic_metars(0, None, seed=seed, anchors=(stations, times))
+    if extra_metars_per_flight:
+        extra = synthetic_metars(int(n_flights * extra_metars_per_flight), sorted(set(stations)), seed=seed + 2)
+        metar_data_df = pd.concat([metar_data_df, extra], ignore_index=True)
+    return metar_data_df, flights_df
@@ -0,0 +1,391 @@
+import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import joblib
+import avwx
+
+from metar_cleaning import (condition_categories, map_conditions_to_categories, normalize_altimeter,
+                            normalize_visibility, parse_and_categorize_clouds_numeric, flight_rules_mapping)
+from ml_pipeline import passthrough_features
+
+# Forecast periods of TAFs as validity intervals per station, looked up for many flights at once.
+# Each TAF is decoded into prevailing periods (the initial conditions, FM and BECMG groups), which
+# partition its validity, and temporary periods (TEMPO, INTER and PROBxx groups) on top of them.
+# The periods of all TAFs sit on one time axis shifted by TAF (KEY_SPAN minutes apart), where they
+# are sorted and disjoint, so one np.searchsorted over their start minutes answers every (TAF, time)
+# lookup of a query at once.
+
+# Minutes between the time axes of two TAFs (about 190 years, more than any timestamp since 1970)
+KEY_SPAN = 10**8
+
+# Longest time from a TAF's issue to the end of its validity (30h TAFs are issued up to an hour or so ahead)
+MAX_TAF_SPAN_MINUTES = 36 * 60
+
+TEMPORARY_TYPES = ('TEMPO', 'INTER')
+
+# Pressure tendency columns of the model input (TAFs have none, they are all 0)
+PRESSURE_TENDENCIES = [col[:-len('_departure')] for col in passthrough_features
+                       if col.startswith('pressure_tendency_')]
+
+# Columns of metar_cleaning a TAF does not forecast (NaN, imputed by the model pipeline)
+NOT_FORECAST = ['temperature', 'dewpoint', 'relative_humidity', 'pressure_altitude', 'density_altitude']
+
+CLOUD_LAYERS = 6
+
+
+def _value(number):
+    return None if number is None else number.value
+
+
+def _line_elements(line, visibility_units):
+    """Weather groups present in one forecast line (missing groups are not in the dict)."""
+    tokens = line.raw.split()
+    elements = {}
+    if line.wind_speed is not None or line.wind_direction is not None:
+        # Wind is one group: a new wind without gust has no gust
+        elements['wind_speed'] = _value(line.wind_speed)
+        elements['wind_gust'] = _value(line.wind_gust)
+        elements['wind_variable_direction'] = list(line.wind_variable_direction or [])
+    if line.visibility is not None:
+        visibility = line.visibility.value
+        if visibility is None and line.visibility.repr.startswith('P'):
+            # P6SM (or P9999): more than the 9999 m metar_cleaning clips to
+            visibility = 9999
+        elif visibility is not None and visibility_units == 'm' and visibility <= 10:
+            # normalize_visibility reads values up to 10 as statute miles
+            visibility = visibility / 1609.34
+        elements['visibility'] = visibility
+    if line.wx_codes or 'NSW' in tokens:
+        elements['wx_codes'] = [{'value': code.value} for code in line.wx_codes]
+    if line.clouds or {'NSC', 'SKC', 'CAVOK'} & set(tokens):
+        elements['clouds'] = [{'type': c.type, 'base': c.base, 'modifier': c.modifier} for c in line.clouds]
+    if line.altimeter is not None:
+        elements['altimeter'] = _value(line.altimeter)
+    return elements
+
+
+def _period_features(elements, flight_rules):
+    # Same columns, encodings and clipping as metar_cleaning / clean_metar_record
+    features = {'wind_variable_change': int(len(elements.get('wind_variable_direction', [])) > 0)}
+    categories = map_conditions_to_categories(elements.get('wx_codes', []))
+    for category in condition_categories:
+        features[f"wx_code_{category.replace(' ', '_')}"] = int(category in categories)
+    for tendency in PRESSURE_TENDENCIES:
+        features[tendency] = 0
+    for column in NOT_FORECAST:
+        features[column] = np.nan
+
+    # Missing wind means calm
+    for column in ['wind_speed', 'wind_gust']:
+        value = elements.get(column)
+        features[column] = 0.0 if value is None else float(value)
+
+    altimeter = elements.get('altimeter')
+    altimeter_hpa = None if altimeter is None else normalize_altimeter(altimeter)
+    features['altimeter_hpa'] = np.nan if altimeter_hpa is None else altimeter_hpa
+    visibility = elements.get('visibility')
+    features['visibility_meters'] = np.nan if visibility is None else min(max(normalize_visibility(visibility), 50), 9999)
+    features['remarks_info.sea_level_pressure'] = np.nan
+
+    clouds = parse_and_categorize_clouds_numeric(elements.get('clouds', []))
+    for layer in range(1, CLOUD_LAYERS + 1):
+        for field in ['type', 'altitude_category']:
+            features[f'clouds_layer_{layer}_{field}'] = clouds.get(f'clouds_layer_{layer}_{field}', 0)
+
+    features['flight_rules'] = flight_rules_mapping.get(flight_rules, np.nan)
+    return features
+
+
+def decode_taf(raw, issued=None):
+    """Forecast periods of one TAF, each with the metar_cleaning feature columns.
+
+    A BECMG group changes only the groups it reports, so its period inherits the others from the
+    prevailing conditions before it; temporary groups (TEMPO, INTER, PROBxx) inherit the same way
+    but do not change the prevailing conditions.
+
+    Args:
+        raw (str): TAF report
+        issued (date): Date of issue (the report only has the day of the month)
+
+    Returns:
+        list: One dict per period with 'station', 'issue_time', 'valid_from', 'valid_to',
+            'period_type', 'probability', 'start', 'end', 'raw' and the feature columns
+
+    Raises:
+        ValueError: If the report cannot be decoded
+    """
+    try:
+        taf = avwx.Taf.from_report(raw, issued=issued)
+    except avwx.exceptions.BadStation as e:
+        raise ValueError(str(e)) from e
+    if taf is None or taf.data is None or taf.data.start_time is None or taf.data.end_time is None:
+        raise ValueError(f"Cannot decode TAF: {raw[:40]}")
+
+    def naive(timestamp):
+        return None if timestamp is None or timestamp.dt is None else timestamp.dt.replace(tzinfo=None)
+
+    header = {'station': taf.data.station, 'issue_time': naive(taf.data.time),
+              'valid_from': naive(taf.data.start_time), 'valid_to': naive(taf.data.end_time), 'raw': raw}
+    periods = []
+    prevailing = {}
+    for line in taf.data.forecast:
+        start, end = naive(line.start_time), naive(line.end_time)
+        if start is None:
+            continue
+        elements = _line_elements(line, taf.units.visibility)
+        probability = _value(line.probability)
+        temporary = line.type in TEMPORARY_TYPES or probability is not None
+        if temporary or line.type != 'FROM':
+            # Only FM groups (and the initial conditions) replace every group
+            elements = dict(prevailing, **elements)
+        if not temporary:
+            prevailing = elements
+        period_type = f'PROB{probability}' if probability is not None and line.type == 'FROM' else line.type
+        periods.append(dict(header, period_type=period_type, probability=probability, temporary=temporary,
+                            start=start, end=end, **_period_features(elements, line.flight_rules)))
+    return periods
+
+
+def _decode_chunk(chunk):
+    """Worker: decoded periods of (raw, issue date) pairs, with the number of undecodable reports."""
+    periods, failed = [], 0
+    for raw, issued in chunk:
+        try:
+            periods.extend(decode_taf(raw, issued))
+        except Exception:
+            failed += 1
+    return periods, failed
+
+
+def decode_tafs(taf_data_df, chunk_size=2000, n_jobs=None):
+    """Decode a TAF table (e.g. an AVWX export) into forecast periods across a process pool.
+
+    Args:
+        taf_data_df (DataFrame): 'raw' TAFs and, when available, their issue time in 'time.dt'
+        chunk_size (int): Reports per worker task
+        n_jobs (int): Worker processes (defaults to os.cpu_count())
+
+    Returns:
+        tuple: (periods DataFrame, number of reports that could not be decoded)
+    """
+    raws = taf_data_df['raw'].drop_duplicates()
+    if 'time.dt' in taf_data_df.columns:
+        issued = pd.to_datetime(taf_data_df.loc[raws.index, 'time.dt'], utc=True).dt.date
+        issued = [None if pd.isna(d) else d for d in issued]
+    else:
+        issued = [None] * len(raws)
+    pairs = list(zip(raws, issued))
+    chunks = [pairs[start:start + chunk_size] for start in range(0, len(pairs), chunk_size)]
+
+    with ProcessPoolExecutor(max_workers=n_jobs or os.cpu_count()) as pool:
+        results = list(pool.map(_decode_chunk, chunks))
+    periods = pd.DataFrame([period for chunk_periods, _ in results for period in chunk_periods])
+    return periods, sum(failed for _, failed in results)
+
+
+def _minutes(times):
+    # Minutes since 1970 of naive UTC timestamps (flooring keeps left-closed intervals exact)
+    return np.asarray(pd.DatetimeIndex(times).as_unit('ns').asi8 // 60_000_000_000, dtype=np.int64)
+
+
+def _to_naive_utc(times):
+    return pd.to_datetime(pd.Series(times), utc=True).dt.tz_localize(None)
+
+
+class _IntervalIndex:
+    """Left-closed periods on the shifted time axis, sorted and disjoint (see KEY_SPAN)."""
+
+    def __init__(self, segments):
+        offset = segments['taf_id'].to_numpy(np.int64) * KEY_SPAN
+        self.left = offset + _minutes(segments['start'])
+        self.right = offset + _minutes(segments['end'])
+
+    def get_indexer(self, keys):
+        # Position of the period containing each key, -1 where none does
+        position = np.searchsorted(self.left, keys, side='right') - 1
+        inside = (position >= 0) & (keys < self.right[np.maximum(position, 0)])
+        return np.where(inside, position, -1)
+
+
+class TafStore:
+    """Forecast periods of many TAFs, indexed for "forecast valid at this time" lookups.
+
+    A lookup takes the latest TAF of the station issued at or before the time (minus a lead
+    time) whose validity covers the time, then the period of that TAF the time falls in. A TAF
+    issued before its validity starts (e.g. 05Z for 06Z-12Z) leaves the time to an earlier TAF.
+
+    Args:
+        periods (DataFrame): Output of ``decode_tafs`` (or of several ``decode_taf`` calls)
+    """
+
+    def __init__(self, periods):
+        self.feature_columns = [c for c in periods.columns if c not in
+                                ('station', 'issue_time', 'valid_from', 'valid_to', 'period_type', 'probability',
+                                 'temporary', 'start', 'end', 'raw')]
+
+        # One row per TAF (amended TAFs are separate reports issued later)
+        periods = periods.sort_values(['station', 'issue_time', 'raw', 'start'], kind='stable')
+        tafs = periods.drop_duplicates(['station', 'issue_time', 'raw'])[
+            ['station', 'issue_time', 'valid_from', 'valid_to', 'raw']].reset_index(drop=True)
+        tafs['taf_id'] = np.arange(len(tafs))
+        periods = periods.merge(tafs[['station', 'issue_time', 'raw', 'taf_id']], on=['station', 'issue_time', 'raw'])
+        self.tafs = tafs
+        self.stations = pd.Index(sorted(tafs['station'].unique()))
+        self._taf_keys = (self.stations.get_indexer(tafs['station']).astype(np.int64) * KEY_SPAN
+                          + _minutes(tafs['issue_time']))
+
+        # Prevailing periods last until the next one starts (a BECMG period starts after its
+        # transition, the conditions before it hold until then) or the end of the TAF
+        base = periods[~periods['temporary']].sort_values(['taf_id', 'start'], kind='stable').reset_index(drop=True)
+        next_start = base.groupby('taf_id')['start'].shift(-1)
+        base['end'] = next_start.fillna(base['valid_to'])
+        self.base = base[base['start'] < base['end']].reset_index(drop=True)
+        self._base_index = _IntervalIndex(self.base)
+
+        self.temporary = self._worst_temporary(periods[periods['temporary']])
+        self._temporary_index = _IntervalIndex(self.temporary)
+
+    @staticmethod
+    def _worst_temporary(temporary):
+        """Split overlapping temporary periods into disjoint segments holding the worst one."""
+        # Segments between consecutive period bounds of each TAF
+        bounds = pd.concat([temporary[['taf_id', 'start']], temporary[['taf_id', 'end']].rename(columns={'end': 'start'})])
+        segments = bounds.drop_duplicates().sort_values(['taf_id', 'start'])
+        segments['end'] = segments.groupby('taf_id')['start'].shift(-1)
+        segments = segments.dropna(subset=['end'])
+
+        # Periods covering each segment (a TAF has a handful), keeping the worst flight rules
+        covering = segments.merge(temporary.rename(columns={'start': '_start', 'end': '_end'}), on='taf_id')
+        covering = covering[(covering['_start'] <= covering['start']) & (covering['_end'] > covering['start'])]
+        worst = covering.sort_values('flight_rules', ascending=False, kind='stable').drop_duplicates(['taf_id', 'start'])
+        return worst.sort_values(['taf_id', 'start'])[temporary.columns].reset_index(drop=True)
+
+    def __len__(self):
+        return len(self.tafs)
+
+    def forecast_at(self, stations, times, lead='0h', include_temporary=False):
+        """Forecast conditions valid at each (station, time), in one vectorized query.
+
+        Args:
+            stations (array): ICAO code of each query
+            times (array): Time of each query (e.g. scheduled departures; naive times are UTC)
+            lead (str): Only use TAFs issued at least this long before the time
+            include_temporary (bool): Use a TEMPO/INTER/PROB period instead of the prevailing
+                conditions when it has worse flight rules
+
+        Returns:
+            DataFrame: One row per query, in order, with 'station', 'raw' (the TAF), 'time.dt'
+                (its issue time), 'period_type' and the feature columns; NaN when no TAF covers it
+        """
+        times = _to_naive_utc(times)
+        valid = times.notna().to_numpy()
+        minutes = np.where(valid, _minutes(times.fillna(pd.Timestamp(0))), 0)
+        codes = self.stations.get_indexer(np.asarray(stations, dtype=object)).astype(np.int64)
+
+        # Latest TAF of the station issued by then
+        issued_by = minutes - int(pd.Timedelta(lead).total_seconds() // 60)
+        position = np.searchsorted(self._taf_keys, codes * KEY_SPAN + issued_by, side='right') - 1
+        taf_ids = np.where(position >= 0, position, 0)
+        found = valid & (codes >= 0) & (position >= 0) & (self._taf_keys[taf_ids] // KEY_SPAN == codes)
+
+        # Period of that TAF the time falls in; when its validity has not started (or is over),
+        # step back to the previous TAF of the station, as long as it is recent enough to cover the time
+        segment = np.full(len(minutes), -1, dtype=np.int64)
+        pending = np.flatnonzero(found)
+        while len(pending):
+            segment[pending] = self._base_index.get_indexer(taf_ids[pending] * KEY_SPAN + minutes[pending])
+            pending = pending[segment[pending] < 0]
+            previous = taf_ids[pending] - 1
+            earlier = np.maximum(previous, 0)
+            usable = ((previous >= 0) & (self._taf_keys[earlier] // KEY_SPAN == codes[pending])
+                      & (self._taf_keys[earlier] % KEY_SPAN >= minutes[pending] - MAX_TAF_SPAN_MINUTES))
+            pending = pending[usable]
+            taf_ids[pending] = previous[usable]
+        matched = segment >= 0
+        keys = taf_ids * KEY_SPAN + minutes
+        columns = ['station', 'raw', 'period_type'] + self.feature_columns
+        result = self.base[columns].iloc[np.where(matched, segment, 0)].reset_index(drop=True)
+
+        if include_temporary and len(self.temporary):
+            overlay = np.where(matched, self._temporary_index.get_indexer(keys), -1)
+            temporary = self.temporary[columns].iloc[np.where(overlay >= 0, overlay, 0)].reset_index(drop=True)
+            worse = (overlay >= 0) & (temporary['flight_rules'].to_numpy() > result['flight_rules'].to_numpy())
+            result = result.mask(pd.Series(worse), temporary)
+
+        result.insert(2, 'time.dt', self.tafs['issue_time'].to_numpy()[taf_ids])
+        return result.where(pd.Series(matched), np.nan)
+
+    def save(self, path):
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path):
+        return joblib.load(path)
+
+
+def merge_taf_to_flights(flights, taf_store, lead='0h', include_temporary=False, drop_unmatched=True):
+    """Attach the TAF forecast valid at the scheduled departure and arrival times.
+
+    The output has the layout of ``preprocessing.merge_metar_to_flights`` so ``preprocess_for_ml``
+    and a pipeline trained on METARs take it unchanged: 'METAR_<side>' holds the TAF and
+    'METAR_<side>_time_delta' the time from its issue to the flight.
+
+    Args:
+        flights (DataFrame): Output of ``prepare_flights``
+        taf_store (TafStore): Decoded TAFs
+        lead (str): Only use TAFs issued at least this long before the flight (e.g. '6h' to score
+            six hours ahead)
+        include_temporary (bool): See ``TafStore.forecast_at``
+        drop_unmatched (bool): Drop flights without a departure forecast (the model needs one)
+
+    Returns:
+        DataFrame: Flights with departure and arrival forecast columns
+    """
+    flights = flights.reset_index(drop=True)
+    for side, station_column, time_column in [('departure', 'origin.code_icao', 'scheduled_out'),
+                                              ('arrival', 'destination.code_icao', 'scheduled_on')]:
+        flight_times = _to_naive_utc(flights[time_column])
+        forecast = taf_store.forecast_at(flights[station_column], flight_times, lead, include_temporary)
+        forecast = forecast.drop(columns='period_type')
+        forecast[f'METAR_{side}_time_delta'] = flight_times - forecast['time.dt']
+
+        renamed = {'raw': f'METAR_{side}'}
+        renamed.update({c: f'{c}_{side}' for c in forecast.columns if c not in ('raw', f'METAR_{side}_time_delta')})
+        flights = pd.concat([flights, forecast.rename(columns=renamed)], axis=1)
+
+    if drop_unmatched:
+        flights = flights.dropna(subset=['METAR_departure']).reset_index(drop=True)
+    return flights
+
+
+if __name__ == '__main__':
+    # Usage: python taf_store.py taf_data.csv taf_store.joblib [--flights flightaware_data.csv --lead 6h --output flights_taf.csv]
+    parser = argparse.ArgumentParser(description='Decode TAFs into a store of forecast periods.')
+    parser.add_argument('tafs', help="CSV with the 'raw' TAFs and their issue time in 'time.dt'")
+    parser.add_argument('store', help='store file to write (joblib)')
+    parser.add_argument('--flights', default=None, help='FlightAware flight records to attach forecasts to')
+    parser.add_argument('--lead', default='0h')
+    parser.add_argument('--include-temporary', action='store_true')
+    parser.add_argument('--output', default=None, help='CSV of the flights with their forecasts')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    periods, failed = decode_tafs(pd.read_csv(args.tafs))
+    taf_store = TafStore(periods)
+    taf_store.save(args.store)
+    print(f"{len(taf_store)} TAFs ({failed} not decoded), {len(taf_store.base)} prevailing and "
+          f"{len(taf_store.temporary)} temporary periods in {time.perf_counter() - start:.1f} s")
+
+    if args.flights:
+        from preprocessing import prepare_flights
+        flights = prepare_flights(pd.read_csv(args.flights, low_memory=False))
+        start = time.perf_counter()
+        merged = merge_taf_to_flights(flights, taf_store, args.lead, args.include_temporary, drop_unmatched=False)
+        print(f"Forecasts for {merged['METAR_departure'].notna().sum()} of {len(merged)} departures "
+              f"in {time.perf_counter() - start:.2f} s")
+        if args.output:
+            merged.to_csv(args.output, index=False)
@@ -0,0 +1,241 @@
+import os
+import time
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import precision_score, recall_score, f1_score, fbeta_score, roc_auc_score
+
+from ml_pipeline import build_pipeline_rf_rus
+
+# Read-only feature matrix attached once per worker process (see _attach_matrix)
+_SHARED = {}
+
+
+def period_index(df):
+    """Ordinal departure week used to order flights in time.
+
+    Uses the raw 'scheduled_out' timestamp when present, else the calendar 'departure_year' of
+    the FIN_6 output with its ISO 'week_no' (ISO weeks 52/53 falling in January are moved to the
+    start of the year, week 1 falling in December to its end).
+
+    Args:
+        df (DataFrame): Pre-processed flight data
+
+    Returns:
+        Series: Integer period per flight (larger is later)
+
+    Raises:
+        ValueError: If df has neither 'scheduled_out' nor 'departure_year' (weeks of different
+            years would be mixed up)
+    """
+    if 'scheduled_out' in df.columns:
+        scheduled_out = pd.to_datetime(df['scheduled_out'])
+        return (scheduled_out.dt.isocalendar().year.astype(int) * 100
+                + scheduled_out.dt.isocalendar().week.astype(int))
+
+    if 'departure_year' not in df.columns:
+        raise ValueError("Flights need 'scheduled_out' or 'departure_year' to be ordered in time; "
+                         "re-run preprocessing.preprocess_for_ml")
+    week = df['week_no'].astype(int)
+    week = week.where(~((df['departure_month'] == 1) & (week >= 52)), 0)
+    week = week.where(~((df['departure_month'] == 12) & (week == 1)), 53)
+    return df['departure_year'].astype(int) * 100 + week
+
+
+def rolling_time_folds(period, n_splits=5, test_periods=None, train_window=None):
+    """Forward-chaining folds over ordered periods (train on the past, test on the next block).
+
+    Args:
+        period (Series or array): Ordinal period per row, e.g. from ``period_index``
+        n_splits (int): Number of test blocks
+        test_periods (int): Periods per test block; defaults to splitting the periods into
+            n_splits + 1 equal blocks
+        train_window (int): If given, only the last train_window periods before the test block
+            are used for training (rolling); otherwise the training window expands
+
+    Returns:
+        list: (train_rows, test_rows) integer position arrays, oldest fold first
+    """
+    period = np.asarray(period)
+    periods = np.unique(period)
+    if test_periods is None:
+        test_periods = max(1, len(periods) // (n_splits + 1))
+    if len(periods) <= n_splits * test_periods:
+        raise ValueError(f"Only {len(periods)} periods available for {n_splits} folds of {test_periods} periods")
+
+    folds = []
+    for k in range(n_splits, 0, -1):
+        test_start = len(periods) - k * test_periods
+        test_block = periods[test_start:test_start + test_periods]
+        train_block = periods[:test_start]
+        if train_window is not None:
+            train_block = train_block[-train_window:]
+        train_rows = np.flatnonzero(np.isin(period, train_block))
+        test_rows = np.flatnonzero(np.isin(period, test_block))
+        folds.append((train_rows, test_rows))
+    return folds
+
+
+def _encode_matrix(X, y):
+    """Pack X and y into one float64 matrix; non-numeric columns become factorized codes."""
+    columns = list(X.columns)
+    matrix = np.empty((len(X), len(columns) + 1), dtype=np.float64)
+    labels = {}
+    for i, column in enumerate(columns):
+        values = X[column]
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            matrix[:, i] = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            codes, uniques = pd.factorize(values)
+            matrix[:, i] = codes
+            labels[column] = np.asarray(uniques, dtype=object)
+    matrix[:, -1] = np.asarray(y, dtype=np.float64)
+    return matrix, columns, labels
+
+
+def _attach_matrix(path, columns, labels):
+    # Memory-mapped read-only: every worker shares the same page-cache copy of the matrix
+    _SHARED['matrix'] = np.load(path, mmap_mode='r')
+    _SHARED['columns'] = columns
+    _SHARED['labels'] = labels
+
+
+def _frame_for_rows(rows):
+    """Rebuild the original feature frame (labels and NaNs included) for a subset of rows."""
+    block = np.asarray(_SHARED['matrix'][rows])
+    data = {}
+    for i, column in enumerate(_SHARED['columns']):
+        if column in _SHARED['labels']:
+            codes = block[:, i].astype(np.int64)
+            values = _SHARED['labels'][column].take(np.where(codes < 0, 0, codes))
+            values[codes < 0] = np.nan
+            data[column] = values
+        else:
+            data[column] = block[:, i]
+    return pd.DataFrame(data), block[:, -1].astype(int)
+
+
+def _fit_and_score(task):
+    """Worker: fit a fresh pipeline on the task's train rows and score its test rows."""
+    start = time.perf_counter()
+    X_train, y_train = _frame_for_rows(task['train_rows'])
+    X_test, y_test = _frame_for_rows(task['test_rows'])
+
+    pipeline = task['pipeline_factory']()
+    pipeline.fit(X_train, y_train)
+    proba = pipeline.predict_proba(X_test)[:, 1]
+
+    return {'scope': task['scope'],
+            'scope_value': task['scope_value'],
+            'fold': task['fold'],
+            'test_rows': task['test_rows'],
+            'proba': proba,
+            'fit_seconds': time.perf_counter() - start}
+
+
+def _metrics(y_true, proba, threshold):
+    y_pred = (proba >= threshold).astype(int)
+    return {'n_test': len(y_true),
+            'positive_rate': float(np.mean(y_true)) if len(y_true) else np.nan,
+            'precision': precision_score(y_true, y_pred, zero_division=0),
+            'recall': recall_score(y_true, y_pred, zero_division=0),
+            'f1': f1_score(y_true, y_pred, zero_division=0),
+            'f2': fbeta_score(y_true, y_pred, beta=2, zero_division=0),
+            'roc_auc': roc_auc_score(y_true, proba) if len(np.unique(y_true)) == 2 else np.nan}
+
+
+def evaluate_time_folds(X, y, period, n_splits=5, test_periods=None, train_window=None,
+                        specialist_by=None, min_specialist_rows=200, threshold=0.5,
+                        pipeline_factory=build_pipeline_rf_rus, n_jobs=None):
+    """Time-based cross-validation of the global model, plus optional specialist models.
+
+    Every (scope, fold) pair is an independent task in a process pool. X and y are written once
+    to a memory-mapped matrix that all workers read without copying, and tasks are submitted
+    largest first so the wall time approaches that of the slowest single task.
+
+    Args:
+        X (DataFrame): Feature matrix (e.g. ``ml_pipeline.select_model_features(df)``)
+        y (Series or array): Binary delay labels
+        period (Series or array): Ordinal time period per row (see ``period_index``)
+        n_splits (int): Number of forward-chaining folds
+        test_periods (int): Periods per test block (see ``rolling_time_folds``)
+        train_window (int): Rolling training window in periods; None for expanding
+        specialist_by (str): Optional column, e.g. 'route_code' or 'origin_sub_region'; one
+            specialist model per value is trained on that value's rows of each fold
+        min_specialist_rows (int): Skip specialist folds with fewer training rows
+        threshold (float): Probability threshold for the delayed class
+        pipeline_factory (callable): Module-level function returning an unfitted pipeline
+        n_jobs (int): Worker processes (defaults to os.cpu_count())
+
+    Returns:
+        tuple: (fold_metrics, route_metrics) DataFrames. fold_metrics has one row per scope,
+            scope value and fold; route_metrics compares global and specialist predictions
+            per 'route_code' over all test folds.
+    """
+    X = X.reset_index(drop=True)
+    y = np.asarray(y).astype(int)
+    period = np.asarray(period)
+    folds = rolling_time_folds(period, n_splits=n_splits, test_periods=test_periods, train_window=train_window)
+
+    tasks = []
+    for k, (train_rows, test_rows) in enumerate(folds):
+        tasks.append({'scope': 'global', 'scope_value': 'all', 'fold': k,
+                      'train_rows': train_rows, 'test_rows': test_rows,
+                      'pipeline_factory': pipeline_factory})
+
+    if specialist_by is not None:
+        groups = X[specialist_by].to_numpy()
+        for value in pd.unique(groups):
+            in_group = groups == value
+            for k, (train_rows, test_rows) in enumerate(folds):
+                group_train = train_rows[in_group[train_rows]]
+                group_test = test_rows[in_group[test_rows]]
+                if len(group_train) < min_specialist_rows or len(group_test) == 0:
+                    continue
+                if len(np.unique(y[group_train])) < 2:
+                    continue
+                tasks.append({'scope': specialist_by, 'scope_value': value, 'fold': k,
+                              'train_rows': group_train, 'test_rows': group_test,
+                              'pipeline_factory': pipeline_factory})
+
+    # Longest tasks first, so short ones fill in around them
+    tasks.sort(key=lambda task: len(task['train_rows']), reverse=True)
+
+    matrix, columns, labels = _encode_matrix(X, y)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        matrix_path = os.path.join(tmp_dir, 'features.npy')
+        np.save(matrix_path, matrix)
+        del matrix
+
+        with ProcessPoolExecutor(max_workers=n_jobs or os.cpu_count(),
+                                 initializer=_attach_matrix,
+                                 initargs=(matrix_path, columns, labels)) as pool:
+            results = list(pool.map(_fit_and_score, tasks))
+
+    # Per-fold metrics
+    fold_rows = []
+    for result in results:
+        y_test = y[result['test_rows']]
+        fold_rows.append({'scope': result['scope'], 'scope_value': result['scope_value'],
+                          'fold': result['fold'], 'fit_seconds': result['fit_seconds'],
+                          **_metrics(y_test, result['proba'], threshold)})
+    fold_metrics = pd.DataFrame(fold_rows).sort_values(['scope', 'scope_value', 'fold']).reset_index(drop=True)
+
+    # Per-route view over all test folds, global model vs. specialists
+    predictions = pd.concat([
+        pd.DataFrame({'model': 'global' if r['scope'] == 'global' else 'specialist',
+                      'row': r['test_rows'], 'proba': r['proba']})
+        for r in results
+    ], ignore_index=True)
+    predictions['route_code'] = X['route_code'].to_numpy()[predictions['row']]
+    predictions['true_label'] = y[predictions['row']]
+
+    route_rows = []
+    for (model, route), group in predictions.groupby(['model', 'route_code']):
+        route_rows.append({'model': model, 'route_code': route,
+                           **_metrics(group['true_label'].to_numpy(), group['proba'].to_numpy(), threshold)})
+    route_metrics = pd.DataFrame(route_rows)
+
+    return fold_metrics, route_metrics
@@ -0,0 +1,241 @@
+import sys
+import time
+import functools
+import threading
+import collections
+
+import numpy as np
+import pandas as pd
+import joblib
+import avwx
+
+from preprocessing import prepare_flights, add_weather_features
+
+# Weather axes of a what-if sweep (cleaned METAR columns, as in metar_cleaning) and their default values
+WEATHER_AXES = {
+    'visibility_meters': [50, 400, 800, 1600, 2400, 3200, 4800, 6400, 8000, 9999],
+    'wind_speed': [0, 5, 10, 15, 20, 25, 30, 40],
+    'wind_gust': [0, 15, 20, 25, 30, 35, 40, 50],
+    'flight_rules': [1, 2, 3, 4],
+    'temperature': [-20, -10, -5, 0, 5, 10, 20, 30, 40],
+    'clouds_layer_1_altitude_category': [0, 1, 2, 3, 4],
+}
+
+AXIS_LABELS = {
+    'visibility_meters': 'Visibility (m)',
+    'wind_speed': 'Wind Speed (kt)',
+    'wind_gust': 'Wind Gust (kt)',
+    'flight_rules': 'Flight Rules (1 VFR - 4 LIFR)',
+    'temperature': 'Temperature (°C)',
+    'clouds_layer_1_altitude_category': 'Lowest Cloud Layer (0 none - 4 vertical)',
+}
+
+# Base weather when none is given: calm, clear and VFR; the rest is imputed by the pipeline
+DEFAULT_WEATHER = {'wind_speed': 5.0, 'wind_gust': 0.0, 'wind_variable_change': 0, 'visibility_meters': 9999.0,
+                   'flight_rules': 1, 'clouds_layer_1_type': 0, 'clouds_layer_1_altitude_category': 0}
+
+# Lowest visibility (m) of each flight rules category (VFR > 5 SM, MVFR 3-5 SM, IFR 1-3 SM, LIFR < 1 SM)
+VISIBILITY_RULES = [(8047, 1), (4828, 2), (1609, 3), (0, 4)]
+
+
+def grid_spec(**axes):
+    """Hashable grid specification: axis -> values (None for the default values of WEATHER_AXES).
+
+    Example: ``grid_spec(visibility_meters=None, wind_gust=[0, 20, 40])``
+
+    Returns:
+        tuple: ((axis, (values...)), ...) in the given order
+    """
+    spec = []
+    for axis, values in axes.items():
+        if values is None:
+            if axis not in WEATHER_AXES:
+                raise ValueError(f"No default values for axis {axis}")
+            values = WEATHER_AXES[axis]
+        spec.append((axis, tuple(float(v) for v in values)))
+    return tuple(spec)
+
+
+def _freeze(value):
+    # Hashable version of a context (nested dicts and lists); NaN becomes None, as NaN != NaN
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+@functools.lru_cache(maxsize=1024)
+def station_iata(icao):
+    # IATA code for the region look-ups of prepare_flights (offline avwx station database)
+    try:
+        return avwx.Station.from_icao(icao).iata
+    except avwx.exceptions.BadStation:
+        return None
+
+
+def visibility_flight_rules(visibility_meters):
+    """Flight rules category (1 VFR to 4 LIFR) set by the visibility alone."""
+    visibility_meters = np.asarray(visibility_meters, dtype=np.float64)
+    return np.select([visibility_meters >= limit for limit, _ in VISIBILITY_RULES],
+                     [rules for _, rules in VISIBILITY_RULES], default=4)
+
+
+def planned_flight(route, departure_time, operator, aircraft_type, filed_ete_minutes):
+    """Flight columns of a planned departure, derived exactly as for the training data.
+
+    Args:
+        route (str): 'ORIG-DEST' ICAO route
+        departure_time: Scheduled departure (UTC), e.g. '2025-01-15 07:00'
+        operator (str): Operator ICAO code
+        aircraft_type (str): Aircraft type designator
+        filed_ete_minutes (float): Filed flight time
+
+    Returns:
+        DataFrame: One row, output of preprocessing.prepare_flights
+    """
+    origin, destination = route.split('-')
+    return prepare_flights(pd.DataFrame([{
+        'blocked': False,
+        'position_only': False,
+        'ident_icao': operator,
+        'operator_icao': operator,
+        'aircraft_type': aircraft_type,
+        'origin.code_icao': origin,
+        'destination.code_icao': destination,
+        'origin.code_iata': station_iata(origin),
+        'destination.code_iata': station_iata(destination),
+        'filed_ete': filed_ete_minutes * 60,  # Seconds, as in the FlightAware data
+        'scheduled_out': pd.Timestamp(departure_time),
+        'departure_delay': np.nan,
+        'arrival_delay': np.nan,
+    }]))
+
+
+def base_flight(route, departure_time, operator, aircraft_type, filed_ete_minutes, weather=None):
+    """Model input row of a planned departure and its departure weather, before weather features.
+
+    Args:
+        route, departure_time, operator, aircraft_type, filed_ete_minutes: See ``planned_flight``
+        weather (dict): Cleaned departure weather without suffix (e.g. from
+            ``metar_cleaning.clean_metar_record``); missing columns use DEFAULT_WEATHER or are imputed
+
+    Returns:
+        DataFrame: One row, output of preprocessing.prepare_flights plus '<column>_departure' weather
+    """
+    flight = planned_flight(route, departure_time, operator, aircraft_type, filed_ete_minutes)
+    weather = dict(DEFAULT_WEATHER, **(weather or {}))
+    return flight.assign(**{f'{column}_departure': value for column, value in weather.items()})
+
+
+def expand_grid(base, grid):
+    """Repeat a base flight over every combination of the grid's weather values.
+
+    Visibility also sets the flight rules (unless they are an axis): the base flight rules are
+    kept when they are worse than the base visibility alone explains (a low ceiling).
+
+    Args:
+        base (DataFrame): One row, see ``base_flight``
+        grid (tuple): See ``grid_spec``
+
+    Returns:
+        DataFrame: One row per grid point (first axis varies slowest), with the weather features
+    """
+    axes = [axis for axis, _ in grid]
+    mesh = np.meshgrid(*[np.asarray(values) for _, values in grid], indexing='ij')
+    frame = base.iloc[np.zeros(mesh[0].size, dtype=np.int64)].reset_index(drop=True)
+    for axis, values in zip(axes, mesh):
+        frame[f'{axis}_departure'] = values.ravel()
+
+    if 'visibility_meters' in axes and 'flight_rules' not in axes:
+        base_rules = base['flight_rules_departure'].iloc[0]
+        rules = visibility_flight_rules(frame['visibility_meters_departure'])
+        if base_rules > visibility_flight_rules(base['visibility_meters_departure'].iloc[0]):
+            rules = np.maximum(rules, base_rules)
+        frame['flight_rules_departure'] = rules
+
+    # wx_sum, LIFR_binary and low_cloud_ceiling follow the swept columns
+    return add_weather_features(frame)
+
+
+class WhatIfSweeper:
+    """Delay probability surfaces of a trained pipeline over weather grids, memoized.
+
+    Each sweep scores its whole grid with one predict_proba call; results are kept in an LRU
+    of max_entries sweeps keyed by (route, context, grid spec), shared by the threads of all
+    dashboard sessions (a lock guards the LRU, the scoring runs outside it).
+
+    Args:
+        pipeline (Pipeline): Fitted ``pipeline_rf_rus``
+        max_entries (int): Sweeps kept in memory
+    """
+
+    def __init__(self, pipeline, max_entries=128):
+        self.pipeline = pipeline
+        self.feature_names = list(pipeline.feature_names_in_)
+        self.delayed_class = list(pipeline.classes_).index(1)
+        self.max_entries = max_entries
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def sweep(self, route, context, grid):
+        """Delay probability at every point of a weather grid.
+
+        Args:
+            route (str): 'ORIG-DEST' ICAO route
+            context (dict): 'departure_time', 'operator', 'aircraft_type', 'filed_ete_minutes' and
+                optionally 'weather' (see ``base_flight``)
+            grid (tuple): See ``grid_spec``
+
+        Returns:
+            DataFrame: One column per axis plus 'delay_probability' (do not modify, it is shared)
+        """
+        key = (route, _freeze(context), grid)
+        with self._lock:
+            if key in self._cache:
+                self.hits += 1
+                self._cache.move_to_end(key)
+                return self._cache[key]
+            self.misses += 1
+
+        frame = expand_grid(base_flight(route, **context), grid)
+        # Pressure tendencies that were not reported are 0 in the one-hot columns
+        X = frame.reindex(columns=self.feature_names)
+        tendencies = [c for c in self.feature_names if c.startswith('pressure_tendency_')]
+        X[tendencies] = X[tendencies].fillna(0)
+        probability = self.pipeline.predict_proba(X)[:, self.delayed_class]
+
+        result = frame[[f'{axis}_departure' for axis, _ in grid]].copy()
+        result.columns = [axis for axis, _ in grid]
+        result['delay_probability'] = probability
+
+        with self._lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return result
+
+    def surface(self, route, context, grid):
+        """Two-axis sweep as a matrix: first axis on the rows, second on the columns."""
+        if len(grid) != 2:
+            raise ValueError("A surface needs exactly two axes")
+        (row_axis, _), (column_axis, _) = grid
+        return self.sweep(route, context, grid).pivot(index=row_axis, columns=column_axis,
+                                                      values='delay_probability')
+
+
+if __name__ == '__main__':
+    # Usage: python what_if.py pipeline_rf_rus_model.pkl LFPO-LSZH "2025-01-15 07:00" AFR A320 [visibility_meters wind_gust]
+    sweeper = WhatIfSweeper(joblib.load(sys.argv[1]))
+    context = {'departure_time': sys.argv[3], 'operator': sys.argv[4], 'aircraft_type': sys.argv[5],
+               'filed_ete_minutes': 70}
+    axes = sys.argv[6:8] if len(sys.argv) > 7 else ['visibility_meters', 'wind_gust']
+    grid = grid_spec(**{axis: None for axis in axes})
+    start = time.perf_counter()
+    surface = sweeper.surface(sys.argv[2], context, grid)
+    print(f"{surface.size} scenarios scored in {(time.perf_counter() - start) * 1000:.0f} ms")
+    print(surface.round(2).to_string())
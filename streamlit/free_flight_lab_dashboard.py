@@ -2,19 +2,12 @@ import streamlit as st
 
 st.set_page_config(page_icon="airplane", page_title="Free Flight Lab", layout="wide")
 
-import pandas as pd
-import numpy as np
-import folium
-from streamlit_folium import st_folium
-import colorsys
-from matplotlib import colormaps
-import matplotlib.colors as mcolors
-import streamlit_depdelay_graph as rene
-import streamlit_stats_graphs as rene2
 from streamlit_option_menu import option_menu
-import streamlit_metar_parse as smp
-import plotly.express as px
-from copy import deepcopy
+import streamlit_perf as sp
+
+# Modules and datasets are imported / loaded by the page that needs them, so the landing and
+# Contact pages do not wait for folium, avwx, scikit-learn or the map data (see
+# streamlit_import_profile.py for the measured import times per page)
 
 # Define the navigation menu
 selected = option_menu(
@@ -26,31 +19,28 @@ selected = option_menu(
     orientation="horizontal"
 )
 
-# Load the data
-@st.cache_data
-def load_data(path):
-    df = pd.read_csv(path)
-    return df
-
-df_raw = load_data(path='streamlit/streamlit_data/streamlit_map_1_depdelays_per_airport.csv')
-df = deepcopy(df_raw)
+# Timing / memory breakdown of this rerun (developer panel with FFL_PERF=1, see streamlit_perf.py)
+sp.start_rerun(selected)
 
-df_names_routes_raw = load_data(path='streamlit/streamlit_data/streamlit_map_1_names_routes.csv')
-df_names_routes = deepcopy(df_names_routes_raw)
 
-df_metar_raw = load_data(path='streamlit/streamlit_data/streamlit_map_2_ml_results.csv')
-df_metar = deepcopy(df_metar_raw)
+def load_delays_per_airport():
+    # Load the data (once per process, shared across reruns without copying)
+    df_raw = sdl.load_dataset('depdelays_per_airport')
 
-df_route_cities_raw = load_data(path='streamlit/streamlit_data/streamlit_map_2_route_cities.csv')
-df_route_cities = deepcopy(df_route_cities_raw)
-
-# Rename columns for better readability
-df = df.drop(columns='Unnamed: 0')
-df.rename(columns={'delayed_count':'Delayed Flights','num_flights':'Number of Flights','delay_percentage':'Percentage of Departure Delays'}, inplace=True)
+    # Rename columns for better readability
+    return df_raw.rename(columns={'delayed_count':'Delayed Flights','num_flights':'Number of Flights','delay_percentage':'Percentage of Departure Delays'})
 
 
 # ---------- First Page: Free Flight Lab ----------
 if selected == "Free Flight Lab":
+    with sp.section('imports'):
+        import plotly.express as px
+        import streamlit_data_loader as sdl
+
+    with sp.section('data load'):
+        df_metar = sdl.load_dataset('ml_results')
+        df_route_cities = sdl.load_dataset('route_cities')
+
     st.title("Predicting weather-related flight delays")
     st.write("""
     - We analyze delays at origin airports when departures are delayed by more than 15 minutes beyond the scheduled time. 
@@ -58,13 +48,8 @@ if selected == "Free Flight Lab":
     - The dataset includes 220,000 flights across 64 routes over three years, with over 1,000 flights considered per route.
     - To predict delays, we utilize a Random Forest algorithm. 
     - These predictions are designed to help professionals in the aviation industry take proactive measures to address potential flight delays.""")
-    # Load the data (You may need to adjust this path to your file)
-    @st.cache_data
-    def load_data():
-        return pd.read_csv("streamlit/streamlit_data/streamlit_map_2_ml_results.csv")
-
-    # Load data
-    df_raw = load_data()
+    # ML results are loaded once per process (see streamlit_data_loader)
+    df_raw = df_metar
 
     # --- First plot: Delayed flights by route ---
 
@@ -134,17 +119,30 @@ if selected == "Free Flight Lab":
     )
 
     # Display the plot in Streamlit
-    st.plotly_chart(fig)
+    with sp.section('plotly_chart'):
+        st.plotly_chart(fig)
 
 
 # ---------- Delay Map Page ----------
 
 elif selected == "Delay Map":
+    with sp.section('imports'):
+        from streamlit_folium import st_folium
+        import streamlit_data_loader as sdl
+        import streamlit_delay_cube as sdc
+        import streamlit_delay_map as sdm
+
+    with sp.section('data load'):
+        df = load_delays_per_airport()
+        df_names_routes = sdl.load_dataset('names_routes')
+        df_route_cities = sdl.load_dataset('route_cities')
+
     PAGE_TITLE = 'Delays Per Airport'
     PAGE_SUB_TITLE = 'Departure delays of selected aiports and routes, ranging from 2022 to 2024'
 
     st.title(PAGE_TITLE)
     st.caption(PAGE_SUB_TITLE)
+    @sp.timed('display_airport_facts', label_arg='metric_title')
     def display_airport_facts(df, icao, metric_title, graph_selection={}):
         if metric_title == 'Airport Name':
             name = df[df['origin.code_icao'] == icao].iloc[0]['origin_airport_name']
@@ -189,72 +187,26 @@ elif selected == "Delay Map":
             selected_routes = st.session_state.get("Routes", [])
             # selected_operators = st.session_state.get("Operator", [])
             # selected_aircraft = st.session_state.get("Aircraft", [])
-            fig = rene.departure_delay_prog_for_route_group(df,icao,regionalize=False,routes=graph_selection["ICAO_route"]) #, operators=graph_selection["operator_icao"], aircraft_types=graph_selection["aircraft_type"])
-            st.plotly_chart(fig, use_container_width=True)
+            fig = sdc.departure_delay_prog_from_cube(sdc.load_delay_cube(),icao,regionalize=False,routes=graph_selection["ICAO_route"]) #, operators=graph_selection["operator_icao"], aircraft_types=graph_selection["aircraft_type"])
+            with sp.section('plotly_chart'):
+                st.plotly_chart(fig, use_container_width=True)
         else:
             metric = df[df["origin.code_icao"] == icao][metric_title]
             st.metric(metric_title,metric)
 
     def display_map(df,df_airport_info):
-        # Exponential scaling function for normalization
-        def exponential_normalization(value, min_val, max_val, base=3):
-            if min_val == max_val:
-                return 0  # Prevent division by zero
-            return (np.log1p(value - min_val) / np.log1p(max_val - min_val)) / np.log(base)
-
-        # Set up color map with exponential normalization
-        min_delay, max_delay = df['Percentage of Departure Delays'].min(), df['Percentage of Departure Delays'].max()
-
-        colormap = colormaps['RdYlGn']
-
-        # Function to get exponential normalized color
-        def get_exponential_color(value):
-            normalized_value = exponential_normalization(value, min_delay, max_delay)
-            color = colormap(1 - normalized_value)  # Invert scale for color mapping
-            return mcolors.rgb2hex(color)
-
-        # Function to enhance color saturation
-        def enhance_saturation(hex_color, factor=1.5):
-            rgb = mcolors.hex2color(hex_color)
-            h, l, s = colorsys.rgb_to_hls(*rgb)
-            s = min(1, s * factor)  # Ensure saturation doesn't exceed 1
-            enhanced_rgb = colorsys.hls_to_rgb(h, l, s)
-            return mcolors.rgb2hex(enhanced_rgb)
-
-        # Create a map centered around a central location
-        m = folium.Map(location=[48.3328, -8.7853], zoom_start=2, tiles='CartoDB positron')
-
-        # Add circle markers for each airport
-        for idx, row in df.iterrows():
-            color = get_exponential_color(row['Percentage of Departure Delays'])
-            saturated_color = enhance_saturation(color, factor=1.5)
-            size = row['Number of Flights'] / 500  # Adjust dot size
-            popup_html = f"""
-            <div style="font-family: Arial, sans-serif; font-size: 14px;">
-                <strong>{row['origin.code_icao']}</strong><br>
-                <span style="color: #d9534f;">{row['Percentage of Departure Delays']:.1f}% delayed</span><br>
-                <span>{row['Number of Flights']} flights</span>
-            </div>
-            """
-            popup = folium.Popup(popup_html, max_width=250)
-            folium.CircleMarker(
-                location=(row['origin_airport_lat'], row['origin_airport_lon']),
-                radius=size,
-                color=saturated_color,
-                weight=1,
-                fill=True,
-                fill_color=saturated_color,
-                fill_opacity=0.6,
-                tooltip=df_airport_info[df_airport_info['origin.code_icao'] == row["origin.code_icao"]].iloc[0]['origin_airport_name'],
-                popup=f"{row['origin.code_icao']}\n{row['Percentage of Departure Delays']:.1f}% delayed\n{row['Number of Flights']} flights"
-            ).add_to(m)
-
         col_map1, col_map2 = st.columns([1, 0.000001])
         
         # Display the map
         with col_map1:
             st.markdown('## Map of Flight Delays')
-            st_map = st_folium(m,width=1200,height=500)
+            # Clustered mode also shows every airport of the airport list, with or without departures
+            import streamlit_airport_index as sai
+            all_airports = sai.load_airport_locations() if st.toggle('Show all airports (clustered)') else None
+            # Circle marker per airport (colors, sizes and tooltips computed once per dataset)
+            m = sdm.delay_map(df, df_airport_info, all_airports=all_airports)
+            with sp.section('st_folium'):
+                st_map = st_folium(m,width=1200,height=500)
 
         # st.write(st_map)
         # st.write('latitude:',st_map["last_object_clicked"]["lat"])
@@ -263,16 +215,17 @@ elif selected == "Delay Map":
             clicked_lat = st_map["last_object_clicked"]["lat"]
             clicked_lng = st_map["last_object_clicked"]["lng"]
 
-            # Compute the Euclidean distance between the clicked point and each airport's coordinates.
-            # (For short distances, this is a reasonable approximation.)
-            distances = np.sqrt(
-                (df['origin_airport_lat'] - clicked_lat) ** 2 +
-                (df['origin_airport_lon'] - clicked_lng) ** 2
-            )
-
-            # Identify the row (airport) with the minimum distance.
-            closest_idx = distances.idxmin()
-            current_icao = df.loc[closest_idx, 'origin.code_icao']
+            # Nearest airport marker (great-circle distance, cached ball tree); in clustered mode that
+            # includes the airports without departures
+            nearest = sai.airport_index(df, all_airports).nearest(clicked_lat, clicked_lng)
+            if nearest is None:
+                raise LookupError('No airport near the clicked point')
+            current_icao = nearest[0]
+            if not (df['origin.code_icao'] == current_icao).any():
+                name = all_airports.loc[all_airports['origin.code_icao'] == current_icao, 'origin_airport_name'].iloc[0]
+                st.markdown(f'### {name} ({current_icao})')
+                st.write('No departures from this airport in the dataset.')
+                return
 
             # DISPLAY FACTS
             st.markdown('### Airport Facts')
@@ -371,10 +324,25 @@ elif selected == "Delay Map":
 
 # ---------- Additional Pages (Delay Prediction, Contact) ----------
 elif selected == "Prediction":
+    with sp.section('imports'):
+        from streamlit_folium import st_folium
+        import streamlit_data_loader as sdl
+        import streamlit_delay_map as sdm
+        import streamlit_stats_graphs as rene2
+        import streamlit_metar_parse as smp
+        import streamlit_route_index as sri
+
+    with sp.section('data load'):
+        df = load_delays_per_airport()
+        df_names_routes = sdl.load_dataset('names_routes')
+        df_metar = sdl.load_dataset('ml_results')
+        df_route_cities = sdl.load_dataset('route_cities')
+
     st.title("Delay Prediction")
     st.caption("Predicting flight delays, given a weather report.")
     # st.caption("NOTE: All of the probability values on this page are conditional probabilities, based on the input features of our model. It is not a prediction of the total delay probability.")
    
+    @sp.timed('display_airport_facts', label_arg='metric_title')
     def display_airport_facts(df, icao, metric_title, graph_selection={}, threshold=0.5):
         if metric_title == 'Airport Name':
             name = df[df['origin.code_icao'] == icao].iloc[0]['origin_airport_name']
@@ -409,13 +377,14 @@ elif selected == "Prediction":
 
                 stats,_,_,_ = rene2.streamlit_prediction_stats(df_metar,current_selection,threshold)
                 
-                stats.rename(columns={
+                # The stats are shared with other reruns, so rename into a new frame
+                stats = stats.rename(columns={
                     "route": "Route",
                     "total_flights": "Total Flights",
                     "total_delayed": "Delayed Flights",
                     "total_ontime": "On Time Flights",
                     "percent_delayed": "Percentage Delayed"
-                }, inplace=True)
+                })
 
                 stats['Percentage Delayed'] = stats['Percentage Delayed'].apply(lambda x: f"{x:.1%}")
 
@@ -427,11 +396,12 @@ elif selected == "Prediction":
                 return {selected_column: current_selection}
         
         elif metric_title == 'METAR':
-            # Get METAR and corresponding ML_index
-            current_metars_indeces_list = df[df['route_code'] == graph_selection['ICAO_route']][['METAR_departure_ref', 'ML_index']]
+            # METARs of the route and their rows (METAR -> row position), from the cached route index
+            metar_index = sri.build_metar_index(df, sdl.data_key(df))
+            metar_to_row_dict = sri.route_metars(metar_index, graph_selection['ICAO_route'])
 
-            # Convert to dictionary for lookup (METAR -> ML_index)
-            metar_to_index_dict = dict(zip(current_metars_indeces_list['METAR_departure_ref'], current_metars_indeces_list['ML_index']))
+            # Decode the route's METARs in the background, so the Weather Report shows without parsing
+            smp.predecode_metars(tuple(metar_to_row_dict))
 
             # Define a unique key for the selectbox widget
             multiselect_key = "multiselect_metar"
@@ -444,12 +414,13 @@ elif selected == "Prediction":
             current_selection = st.selectbox(
                 label="Choose Weather Report Departure Reference:",
                 label_visibility="collapsed",
-                options=list(metar_to_index_dict.keys()),  # Use METAR references as dropdown options
+                options=list(metar_to_row_dict.keys()),  # Use METAR references as dropdown options
                 key=multiselect_key,
             )
 
             # Get the corresponding ML_index
-            current_index = metar_to_index_dict.get(current_selection, None)
+            current_row = metar_to_row_dict.get(current_selection, None)
+            current_index = None if current_row is None else int(df['ML_index'].iat[current_row])
 
             return {'METAR':current_selection,'ML_index':current_index}            
 
@@ -460,7 +431,8 @@ elif selected == "Prediction":
             threshold = st.slider("Set Probability Threshold:", 0.5, 1.0, 0.5, 0.1)
             _,fig,_,_ = rene2.streamlit_prediction_stats(df,graph_selection['ICAO_route'], threshold)
             # st.write(type(fig))
-            st.plotly_chart(fig, use_container_width=True)
+            with sp.section('plotly_chart'):
+                st.plotly_chart(fig, use_container_width=True)
             return threshold
 
         elif metric_title == 'Pie Charts':
@@ -468,8 +440,9 @@ elif selected == "Prediction":
             st.caption(f"Route: {graph_selection['ICAO_route']}")
             _,_,pie1,pie2 = rene2.streamlit_prediction_stats(df,graph_selection['ICAO_route'], threshold)
             # st.write(type(fig))
-            st.plotly_chart(pie1, use_container_width=True)
-            st.plotly_chart(pie2, use_container_width=True)
+            with sp.section('plotly_chart'):
+                st.plotly_chart(pie1, use_container_width=True)
+                st.plotly_chart(pie2, use_container_width=True)
 
         elif metric_title == 'Weather Report':
             if graph_selection['METAR'] is None:
@@ -487,12 +460,78 @@ elif selected == "Prediction":
 
         elif metric_title == 'Delay Prediction':
             try:
-                probability = round((df[df['ML_index'] == graph_selection['ML_index']]['predicted_prob_class_1'].iloc[0])*100,1)
+                # Row of the selected ML_index from the cached position array
+                row = sri.ml_position(sri.build_metar_index(df, sdl.data_key(df)), graph_selection['ML_index'])
+                probability = round((df['predicted_prob_class_1'].iat[row])*100,1)
                 st.write(f"Conditional Probability of Delay on Departure:")
                 st.markdown(f"## {probability}%")
             except:
                 st.write('Select a METAR for more details...')
 
+        elif metric_title == 'Live Prediction':
+            # scikit-learn and the model are only loaded once a route is shown
+            import pandas as pd
+            import streamlit_live_prediction as slp
+
+            predictor = slp.load_predictor()
+            if predictor is None:
+                st.write('Live predictions need the trained model (pipeline_rf_rus_model.pkl in streamlit/streamlit_data).')
+                return
+            route = graph_selection.get('ICAO_route')
+            if not route:
+                st.write('Select a route for more details...')
+                return
+
+            # Flight details (most frequent operator and aircraft type of the route first)
+            operators, aircraft_types = slp.route_fleet(df, sdl.data_key(df), route)
+            cols_flight = st.columns([2,2,2,2,2])
+            operator = cols_flight[0].selectbox("Operator:", operators or ['Not Available'], key="live_operator")
+            aircraft_type = cols_flight[1].selectbox("Aircraft Type:", aircraft_types or ['Not Available'], key="live_aircraft")
+            departure_date = cols_flight[2].date_input("Departure Date (UTC):", key="live_date")
+            departure_time = cols_flight[3].time_input("Departure Time (UTC):", key="live_time")
+            filed_ete = cols_flight[4].number_input("Flight Time (min):", min_value=10, max_value=1200, value=120, step=5, key="live_ete")
+
+            # Paste a METAR, or start from the selected / current one
+            if st.button("Use Current METAR"):
+                st.session_state["live_metar"] = slp.current_metar(icao) or ''
+            elif graph_selection.get('METAR') and st.session_state.get("live_metar_selected") != graph_selection['METAR']:
+                # Follow the Weather Report selection until another one is chosen
+                st.session_state["live_metar"] = st.session_state["live_metar_selected"] = graph_selection['METAR']
+            metar_string = st.text_input("Departure METAR:", key="live_metar", placeholder=f"{icao} 011200Z ...")
+
+            if metar_string:
+                try:
+                    probability, timings = slp.live_prediction(
+                        predictor, metar_string, route,
+                        pd.Timestamp.combine(departure_date, departure_time),
+                        operator, aircraft_type, filed_ete)
+                    st.write(f"Conditional Probability of Delay on Departure:")
+                    st.markdown(f"## {round(probability*100,1)}%")
+                    st.caption(f"Computed in {sum(timings.values()):.0f} ms")
+                except Exception as e:
+                    st.write(f"This METAR cannot be scored: {e}")
+
+            # What-if: the same flight over a grid of weather, starting from the METAR above
+            import what_if
+            st.markdown('##### What-if Weather')
+            axes = list(what_if.WEATHER_AXES)
+            cols_axes = st.columns([2,2,4])
+            row_axis = cols_axes[0].selectbox("Rows:", axes, index=axes.index('visibility_meters'),
+                                              format_func=what_if.AXIS_LABELS.get, key="what_if_rows")
+            column_axis = cols_axes[1].selectbox("Columns:", [axis for axis in axes if axis != row_axis],
+                                                 format_func=what_if.AXIS_LABELS.get, key="what_if_columns")
+            try:
+                context = {'departure_time': pd.Timestamp.combine(departure_date, departure_time),
+                           'operator': operator, 'aircraft_type': aircraft_type, 'filed_ete_minutes': filed_ete,
+                           'weather': slp.metar_weather(metar_string) if metar_string else None}
+                fig = slp.what_if_figure(slp.load_sweeper(), route, context,
+                                         what_if.grid_spec(**{row_axis: None, column_axis: None}))
+                with sp.section('plotly_chart'):
+                    st.plotly_chart(fig, use_container_width=True)
+                st.caption('Other weather as in the METAR above (calm and clear without one).')
+            except Exception as e:
+                st.write(f"This weather cannot be swept: {e}")
+
             # airport_name = df[df['origin.code_icao'] == icao].iloc[0]['origin_airport_name']
 
 
@@ -503,80 +542,34 @@ elif selected == "Prediction":
 
 
     def display_map(df,df_airport_info):
-        # Exponential scaling function for normalization
-        def exponential_normalization(value, min_val, max_val, base=3):
-            if min_val == max_val:
-                return 0  # Prevent division by zero
-            return (np.log1p(value - min_val) / np.log1p(max_val - min_val)) / np.log(base)
-
-        # Set up color map with exponential normalization
-        min_delay, max_delay = df['Percentage of Departure Delays'].min(), df['Percentage of Departure Delays'].max()
-
-        colormap = colormaps['RdYlGn']
-
-        # Function to get exponential normalized color
-        def get_exponential_color(value):
-            normalized_value = exponential_normalization(value, min_delay, max_delay)
-            color = colormap(1 - normalized_value)  # Invert scale for color mapping
-            return mcolors.rgb2hex(color)
-
-        # Function to enhance color saturation
-        def enhance_saturation(hex_color, factor=1.5):
-            rgb = mcolors.hex2color(hex_color)
-            h, l, s = colorsys.rgb_to_hls(*rgb)
-            s = min(1, s * factor)  # Ensure saturation doesn't exceed 1
-            enhanced_rgb = colorsys.hls_to_rgb(h, l, s)
-            return mcolors.rgb2hex(enhanced_rgb)
-
-        # Create a map centered around a central location
-        m = folium.Map(location=[48.3328, -8.7853], zoom_start=2, tiles='CartoDB positron')
-        
-        # Add circle markers for each airport
-        for idx, row in df.iterrows():
-            color = get_exponential_color(row['Percentage of Departure Delays'])
-            saturated_color = enhance_saturation(color, factor=1.5)
-            size = row['Number of Flights'] / 500  # Adjust dot size
-            popup_html = f"""
-            <div style="font-family: Arial, sans-serif; font-size: 14px;">
-                <strong>{row['origin.code_icao']}</strong><br>
-                <span style="color: #d9534f;">{row['Percentage of Departure Delays']:.1f}% delayed</span><br>
-                <span>{row['Number of Flights']} flights</span>
-            </div>
-            """
-            popup = folium.Popup(popup_html, max_width=250)
-            folium.CircleMarker(
-                location=(row['origin_airport_lat'], row['origin_airport_lon']),
-                radius=size,
-                color=saturated_color,
-                weight=1,
-                fill=True,
-                fill_color=saturated_color,
-                fill_opacity=0.6,
-                tooltip=df_airport_info[df_airport_info['origin.code_icao'] == row["origin.code_icao"]].iloc[0]['origin_airport_name'],
-                popup=popup
-            ).add_to(m)
-
         col_map1, col_map2 = st.columns([1, 0.000001])
         
         # Display the map
         with col_map1:
             st.markdown('## Map of Flight Delays')
-            st_map = st_folium(m,width=1200,height=500)
+            # Clustered mode also shows every airport of the airport list, with or without departures
+            import streamlit_airport_index as sai
+            all_airports = sai.load_airport_locations() if st.toggle('Show all airports (clustered)') else None
+            # Circle marker per airport (colors, sizes and tooltips computed once per dataset)
+            m = sdm.delay_map(df, df_airport_info, html_popup=True, all_airports=all_airports)
+            with sp.section('st_folium'):
+                st_map = st_folium(m,width=1200,height=500)
         
         try:
             clicked_lat = st_map["last_object_clicked"]["lat"]
             clicked_lng = st_map["last_object_clicked"]["lng"]
 
-            # Compute the Euclidean distance between the clicked point and each airport's coordinates.
-            # (For short distances, this is a reasonable approximation.)
-            distances = np.sqrt(
-                (df['origin_airport_lat'] - clicked_lat) ** 2 +
-                (df['origin_airport_lon'] - clicked_lng) ** 2
-            )
-
-            # Identify the row (airport) with the minimum distance.
-            closest_idx = distances.idxmin()
-            current_icao = df.loc[closest_idx, 'origin.code_icao']
+            # Nearest airport marker (great-circle distance, cached ball tree); in clustered mode that
+            # includes the airports without departures
+            nearest = sai.airport_index(df, all_airports).nearest(clicked_lat, clicked_lng)
+            if nearest is None:
+                raise LookupError('No airport near the clicked point')
+            current_icao = nearest[0]
+            if not (df['origin.code_icao'] == current_icao).any():
+                name = all_airports.loc[all_airports['origin.code_icao'] == current_icao, 'origin_airport_name'].iloc[0]
+                st.markdown(f'### {name} ({current_icao})')
+                st.write('No departures from this airport in the dataset.')
+                return
 
             with st.container(border=1):
                 display_airport_facts(df_airport_info, current_icao, "Airport Name")
@@ -627,6 +620,13 @@ elif selected == "Prediction":
                 with st.container(border=1):
                     st.markdown('#### Delay Prediction')
                     display_airport_facts(df_metar, current_icao, 'Delay Prediction', current_selection)
+
+            st.markdown("---")
+
+            # Third Row: Live prediction for a pasted METAR
+            with st.container(border=1):
+                st.markdown('#### Live Prediction')
+                display_airport_facts(df_names_routes, current_icao, 'Live Prediction', current_selection)
         except Exception as e:
             # st.write(e)
             st.write('Select an airport on the map for more details...')              
@@ -705,3 +705,7 @@ elif selected == "Contact":
 
     #     st.write("### SHAP et XGBoost")
     #     st.audio("data/songs/SHAP et XGBoost.mp3", format="audio/mp3")
+
+
+# Log this rerun and show the developer panel (only with FFL_PERF=1, or ?perf=1 when FFL_PERF_QUERY=1)
+sp.finish_rerun()
@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import streamlit_perf as sp
+
+AIRPORT_CODES_PATH = 'example_data/airport_codes.csv'
+
+EARTH_RADIUS_KM = 6371.0
+
+# Clicks further than this from every airport are ignored (about two marker widths at zoom 2)
+CLICK_RADIUS_KM = 250.0
+
+
+def normalize_longitude(lng):
+    # Leaflet keeps counting past +/-180 when the map is panned around the globe
+    return (np.asarray(lng, dtype=np.float64) + 180.0) % 360.0 - 180.0
+
+
+class AirportIndex:
+    """Ball tree over airport coordinates with great-circle (haversine) distances.
+
+    Unlike a Euclidean distance in degrees, the haversine distance is correct across the
+    antimeridian and at high latitudes, and a query costs O(log n) instead of a scan of every airport.
+    Airports without coordinates are left out of the index.
+    """
+
+    def __init__(self, icao, lat, lon):
+        # Imported on first use: the map pages only need scikit-learn once an airport is clicked
+        from sklearn.neighbors import BallTree
+
+        coordinates = np.column_stack([np.asarray(lat, dtype=np.float64), normalize_longitude(lon)])
+        located = np.isfinite(coordinates).all(axis=1)
+        self.icao = np.asarray(icao, dtype=str)[located]
+        # A ball tree cannot be built over no points
+        self.tree = BallTree(np.radians(coordinates[located]), metric='haversine') if located.any() else None
+
+    def __len__(self):
+        return len(self.icao)
+
+    def nearest(self, lat, lng, max_distance_km=CLICK_RADIUS_KM):
+        """Nearest airport to a point.
+
+        Args:
+            lat (float): Latitude in degrees
+            lng (float): Longitude in degrees (any multiple of 360 off is fine)
+            max_distance_km (float): Search radius
+
+        Returns:
+            tuple: (ICAO code, distance in km), or None if no airport is within the radius
+        """
+        if self.tree is None:
+            return None
+        point = np.radians([[lat, float(normalize_longitude(lng))]])
+        distance, position = self.tree.query(point, k=1)
+        distance_km = distance[0, 0] * EARTH_RADIUS_KM
+        if distance_km > max_distance_km:
+            return None
+        return str(self.icao[position[0, 0]]), float(distance_km)
+
+    def within(self, lat, lng, radius_km=CLICK_RADIUS_KM):
+        """ICAO codes of every airport within radius_km of a point, nearest first."""
+        if self.tree is None:
+            return []
+        point = np.radians([[lat, float(normalize_longitude(lng))]])
+        positions, distances = self.tree.query_radius(point, r=radius_km / EARTH_RADIUS_KM, return_distance=True)
+        return self.icao[positions[0][np.argsort(distances[0], kind='stable')]].tolist()
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+@sp.cache_miss('airport_index')
+def _cached_airport_index(_df, data_version):
+    return AirportIndex(_df['origin.code_icao'], _df['origin_airport_lat'], _df['origin_airport_lon'])
+
+
+@sp.timed('airport_index')
+def airport_index(df, all_airports=None):
+    """Click index of the airports on a map, built once per set of airports.
+
+    Args:
+        df (DataFrame): Airports with 'origin.code_icao', 'origin_airport_lat' and 'origin_airport_lon'
+        all_airports (DataFrame): Clustered mode: the airports shown without departures too (see
+            ``load_airport_locations``), so a click on their marker does not pick a neighbour
+
+    Returns:
+        AirportIndex: Shared index
+    """
+    columns = ['origin.code_icao', 'origin_airport_lat', 'origin_airport_lon']
+    airports = df[columns]
+    if all_airports is not None:
+        others = all_airports[~all_airports['origin.code_icao'].isin(airports['origin.code_icao'])]
+        airports = pd.concat([airports, others[columns]], ignore_index=True)
+    data_version = int(pd.util.hash_pandas_object(airports.astype({'origin.code_icao': str}), index=False).sum())
+    return _cached_airport_index(airports, data_version)
+
+
+@sp.timed('load_airport_locations')
+@st.cache_resource(show_spinner=False)
+@sp.cache_miss('load_airport_locations')
+def load_airport_locations(path=AIRPORT_CODES_PATH):
+    """Every airport of the project's airport list, located with the avwx station database.
+
+    Args:
+        path (str): CSV with IATA 'Code', 'Name', 'Country' and 'Region' columns
+
+    Returns:
+        DataFrame: 'origin.code_icao', 'origin_airport_name', 'origin_airport_lat', 'origin_airport_lon',
+            'Country' and 'Region' of the airports avwx knows
+    """
+    # Imported on first use (the station database takes a while to load)
+    import avwx
+
+    airports = pd.read_csv(path)
+    rows = []
+    for airport in airports.itertuples(index=False):
+        try:
+            station = avwx.Station.from_iata(airport.Code)
+        except avwx.exceptions.BadStation:
+            continue
+        rows.append({'origin.code_icao': station.icao,
+                     'origin_airport_name': airport.Name,
+                     'origin_airport_lat': station.latitude,
+                     'origin_airport_lon': station.longitude,
+                     'Country': airport.Country,
+                     'Region': airport.Region})
+    return pd.DataFrame(rows)
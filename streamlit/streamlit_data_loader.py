@@ -0,0 +1,120 @@
+import os
+import weakref
+import streamlit as st
+import pandas as pd
+
+import streamlit_perf as sp
+
+# With copy-on-write, frames handed out by the loader can be filtered, renamed or assigned to
+# freely: pandas copies lazily on the first write instead of the dashboard deep-copying upfront.
+pd.set_option("mode.copy_on_write", True)
+
+DATA_DIR = 'streamlit/streamlit_data'
+
+# Dashboard datasets: CSV file exported by the notebooks and the compact dtypes to load it with.
+# Columns missing from a file are ignored, so the same table covers older exports.
+DATASETS = {
+    'depdelays_per_airport': ('streamlit_map_1_depdelays_per_airport.csv', {
+        'origin.code_icao': 'category',
+        'delayed_count': 'int32',
+        'num_flights': 'int32',
+        'origin_airport_lat': 'float64',
+        'origin_airport_lon': 'float64',
+        'delay_percentage': 'float64',
+    }),
+    'names_routes': ('streamlit_map_1_names_routes.csv', {
+        'origin.code_icao': 'category',
+        'destination.code_icao': 'category',
+        'ICAO_route': 'category',
+        'operator_icao': 'category',
+        'aircraft_type': 'category',
+        'origin_region': 'category',
+        'departure_delay_binary': 'category',
+        'origin_airport_name': 'category',
+        'origin_airport_location': 'category',
+    }),
+    'ml_results': ('streamlit_map_2_ml_results.csv', {
+        'route_code': 'category',
+        'origin.code_icao': 'category',
+        'true_label': 'int8',
+        'predicted_label': 'int8',
+        'predicted_prob_class_1': 'float32',
+        'TP': 'bool',
+        'FP': 'bool',
+        'TN': 'bool',
+        'FN': 'bool',
+        'ML_index': 'int32',
+    }),
+    'route_cities': ('streamlit_map_2_route_cities.csv', {
+        'route_code': 'category',
+        'origin.icao_code': 'category',
+    }),
+}
+
+
+# Content key of every keyed frame by id(), removed when the frame is garbage collected
+_data_keys = {}
+
+
+def data_key(df):
+    """Content key of a frame, for the cached helpers that take it unhashed (``_df`` arguments).
+
+    The key hashes the values (pd.util.hash_pandas_object), the columns and the length. It is
+    computed once per frame object and forgotten when the frame is garbage collected, so a new
+    frame at the address of a freed one is hashed again. Keyed frames must not be modified in
+    place (the loader's frames never are).
+
+    Args:
+        df (DataFrame): Frame passed to a cached helper
+
+    Returns:
+        tuple: Hashable key, equal for frames with the same content
+    """
+    key = _data_keys.get(id(df))
+    if key is None:
+        key = (len(df), tuple(df.columns), int(pd.util.hash_pandas_object(df, index=True).sum()))
+        _data_keys[id(df)] = key
+        weakref.finalize(df, _data_keys.pop, id(df), None)
+    return key
+
+
+def _read_csv(csv_path, dtypes):
+    columns = pd.read_csv(csv_path, nrows=0).columns
+    df = pd.read_csv(csv_path, dtype={c: t for c, t in dtypes.items() if c in columns})
+    # Drop the index column written by df.to_csv in the notebooks
+    return df.drop(columns='Unnamed: 0', errors='ignore')
+
+
+@sp.timed('load_dataset')
+@st.cache_resource(show_spinner=False)
+@sp.cache_miss('load_dataset')
+def load_dataset(name, data_dir=DATA_DIR):
+    """Load a dashboard dataset once per process.
+
+    The CSV is converted to Parquet next to it on first use (and again whenever the CSV is newer),
+    and the Parquet file is read afterwards. The cached frame is shared by every session and rerun
+    without copying; callers must not modify it in place (copy-on-write makes ordinary pandas
+    operations safe).
+
+    Args:
+        name (str): Key of DATASETS
+        data_dir (str): Directory of the dashboard data
+
+    Returns:
+        DataFrame: Dataset with compact dtypes (categorical ICAO codes, float32 probabilities)
+    """
+    csv_name, dtypes = DATASETS[name]
+    csv_path = os.path.join(data_dir, csv_name)
+    parquet_path = os.path.splitext(csv_path)[0] + '.parquet'
+
+    if os.path.exists(parquet_path) and (not os.path.exists(csv_path)
+                                         or os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)):
+        return pd.read_parquet(parquet_path)
+
+    df = _read_csv(csv_path, dtypes)
+    try:
+        df.to_parquet(parquet_path, index=False)
+    except OSError:
+        # Read-only deployment: keep serving from the CSV
+        pass
+    return df
@@ -0,0 +1,163 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import streamlit_data_loader as sdl
+import streamlit_perf as sp
+from streamlit_depdelay_graph import plot_weekly_departures
+
+DATA_DIR = 'streamlit/streamlit_data'
+CUBE_PATH = os.path.join(DATA_DIR, 'streamlit_map_1_delay_cube.npz')
+
+# Dimensions of the cube: (column of the per-flight table, key in the cube)
+DIMENSIONS = [('origin.code_icao', 'origin'),
+              ('ICAO_route', 'route'),
+              ('operator_icao', 'operator'),
+              ('aircraft_type', 'aircraft_type'),
+              ('year_week', 'week')]
+
+# Per-airport attributes used for the graph title and regional shading
+ORIGIN_ATTRIBUTES = ['origin_region', 'origin_airport_name', 'origin_airport_location']
+
+
+def build_delay_cube(df_raw):
+    """Count departures by (origin, route, operator, aircraft type, week, delayed flag).
+
+    Only combinations that occur are stored (one entry per non-empty cell), sorted by origin so an
+    airport is a contiguous slice.
+
+    Args:
+        df_raw (DataFrame): Per-flight table of the Delay Map page (FIN_9 'names_routes' export)
+
+    Returns:
+        dict: Code arrays per dimension, 'delayed' flags, 'count', 'origin_offsets' and the
+            labels of every dimension (labels_<key>), plus the per-origin attributes
+    """
+    cube = {}
+    codes = []
+    for column, key in DIMENSIONS:
+        values = df_raw[column]
+        if key == 'week':
+            values = pd.to_datetime(values)
+        values = values.to_numpy() if key == 'week' else np.asarray(values.astype(str), dtype=str)
+        labels, value_codes = np.unique(values, return_inverse=True)
+        cube[f'labels_{key}'] = labels
+        codes.append(value_codes.astype(np.int32))
+    delayed = (df_raw['departure_delay_binary'] == 'delayed').to_numpy().astype(np.int32)
+    codes.append(delayed)
+
+    # One row per occupied cell, origin first so airports are contiguous
+    cells = pd.DataFrame(np.column_stack(codes), columns=[key for _, key in DIMENSIONS] + ['delayed'])
+    cells = cells.groupby(list(cells.columns), sort=True).size().reset_index(name='count')
+    for column in cells.columns:
+        dtype = np.int8 if column == 'delayed' else np.int32
+        cube[column] = cells[column].to_numpy(dtype=dtype)
+    cube['origin_offsets'] = np.searchsorted(cube['origin'], np.arange(len(cube['labels_origin']) + 1))
+
+    # Airport attributes, aligned with labels_origin
+    first_rows = df_raw.assign(_origin=df_raw['origin.code_icao'].astype(str)).drop_duplicates('_origin').set_index('_origin')
+    for column in ORIGIN_ATTRIBUTES:
+        if column in first_rows.columns:
+            cube[column] = np.asarray(first_rows[column].reindex(cube['labels_origin']).astype(str), dtype=str)
+    return cube
+
+
+def save_delay_cube(cube, path=CUBE_PATH):
+    np.savez(path, **cube)
+
+
+def read_delay_cube(path=CUBE_PATH):
+    with np.load(path, allow_pickle=False) as data:
+        return {key: data[key] for key in data.files}
+
+
+@sp.timed('load_delay_cube')
+@st.cache_resource(show_spinner=False)
+@sp.cache_miss('load_delay_cube')
+def load_delay_cube(path=CUBE_PATH):
+    """Delay cube of the dashboard, built from the 'names_routes' dataset on first use.
+
+    Returns:
+        dict: See ``build_delay_cube``
+    """
+    csv_path = os.path.join(DATA_DIR, sdl.DATASETS['names_routes'][0])
+    if os.path.exists(path) and (not os.path.exists(csv_path) or os.path.getmtime(path) >= os.path.getmtime(csv_path)):
+        return read_delay_cube(path)
+
+    cube = build_delay_cube(sdl.load_dataset('names_routes'))
+    try:
+        save_delay_cube(cube, path)
+    except OSError:
+        # Read-only deployment: rebuild once per process instead
+        pass
+    return cube
+
+
+def weekly_delay_counts(cube, icao_dep, regionalize=False, routes=[], operators=[], aircraft_types=[]):
+    """Weekly delayed / on-time departures for an airport (or its region) and optional filters.
+
+    Args:
+        cube (dict): Output of ``build_delay_cube`` / ``load_delay_cube``
+        icao_dep (str): Origin airport ICAO code
+        regionalize (bool): Use every airport of the origin's region (filters are then ignored,
+            as in ``departure_delay_prog_for_route_group``)
+        routes (list): 'ORIG-DEST' ICAO routes to keep (all if empty)
+        operators (list): Operator ICAO codes to keep (all if empty)
+        aircraft_types (list): Aircraft types to keep (all if empty)
+
+    Returns:
+        DataFrame: 'delayed', 'on_time' and 'total' per week with departures, indexed by week start
+    """
+    origin = int(np.searchsorted(cube['labels_origin'], icao_dep))
+    if origin >= len(cube['labels_origin']) or cube['labels_origin'][origin] != icao_dep:
+        raise KeyError(f"No departures from {icao_dep} in the delay cube")
+
+    if regionalize:
+        origins = np.flatnonzero(cube['origin_region'] == cube['origin_region'][origin])
+    else:
+        origins = [origin]
+
+    n_weeks = len(cube['labels_week'])
+    counts = np.zeros(2 * n_weeks, dtype=np.int64)
+    for o in origins:
+        start, stop = cube['origin_offsets'][o], cube['origin_offsets'][o + 1]
+        mask = np.ones(stop - start, dtype=bool)
+        if not regionalize:
+            for key, values in [('route', routes), ('operator', operators), ('aircraft_type', aircraft_types)]:
+                if len(values) > 0:
+                    mask &= np.isin(cube[key][start:stop], np.flatnonzero(np.isin(cube[f'labels_{key}'], list(values))))
+        # Sum the selected cells per (week, delayed flag)
+        cells = cube['week'][start:stop][mask].astype(np.int64) * 2 + cube['delayed'][start:stop][mask]
+        counts += np.bincount(cells, weights=cube['count'][start:stop][mask], minlength=2 * n_weeks).astype(np.int64)
+
+    counts = counts.reshape(n_weeks, 2)
+    df_weekly = pd.DataFrame({'delayed': counts[:, 1], 'on_time': counts[:, 0]},
+                             index=pd.DatetimeIndex(cube['labels_week'], name='year_week'))
+    df_weekly['total'] = df_weekly.sum(axis=1)
+    # Only weeks with departures, like the groupby/pivot on the per-flight table
+    return df_weekly[df_weekly['total'] > 0].astype(float)
+
+
+def origin_attributes(cube, icao_dep):
+    """Region, airport name and location of an origin airport."""
+    origin = int(np.searchsorted(cube['labels_origin'], icao_dep))
+    return {column: cube[column][origin] for column in ORIGIN_ATTRIBUTES if column in cube}
+
+
+@sp.timed('departure_delay_prog_from_cube')
+def departure_delay_prog_from_cube(cube, icao_dep, regionalize=False, routes=[], operators=[], aircraft_types=[]):
+    # Same figure as departure_delay_prog_for_route_group, from the pre-aggregated counts
+    df_pivot_weekly = weekly_delay_counts(cube, icao_dep, regionalize, routes, operators, aircraft_types)
+    return plot_weekly_departures(df_pivot_weekly, origin_attributes(cube, icao_dep), icao_dep,
+                                  regionalize, routes, operators, aircraft_types)
+
+
+if __name__ == '__main__':
+    # Usage: python streamlit/streamlit_delay_cube.py [names_routes.csv] [cube.npz]  (from the repo root)
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(DATA_DIR, sdl.DATASETS['names_routes'][0])
+    cube_path = sys.argv[2] if len(sys.argv) > 2 else CUBE_PATH
+    cube = build_delay_cube(pd.read_csv(csv_path))
+    save_delay_cube(cube, cube_path)
+    print(f"{len(cube['count'])} cells for {cube['count'].sum()} departures saved to {cube_path}")
@@ -0,0 +1,198 @@
+import numpy as np
+import pandas as pd
+import folium
+from folium.plugins import MarkerCluster
+import streamlit as st
+from matplotlib import colormaps
+
+import streamlit_perf as sp
+import streamlit_data_loader as sdl
+
+# Map view shared by the Delay Map and Prediction pages
+MAP_LOCATION = [48.3328, -8.7853]
+MAP_ZOOM = 2
+MAP_TILES = 'CartoDB positron'
+
+# Airports without departures in the dataset (clustered mode)
+NO_DATA_COLOR = '#9e9e9e'
+NO_DATA_RADIUS = 3
+
+
+def exponential_normalization(values, min_val, max_val, base=3):
+    # Exponential scaling function for normalization
+    if min_val == max_val:
+        return np.zeros_like(values, dtype=np.float64)  # Prevent division by zero
+    return (np.log1p(values - min_val) / np.log1p(max_val - min_val)) / np.log(base)
+
+
+def _rgb_to_hls(rgb):
+    # Vectorized colorsys.rgb_to_hls over an (n, 3) array
+    r, g, b = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+    maxc, minc = rgb.max(axis=1), rgb.min(axis=1)
+    sumc, rangec = maxc + minc, maxc - minc
+    l = sumc / 2.0
+    grey = rangec == 0
+    safe_range = np.where(grey, 1.0, rangec)
+    s = np.where(l <= 0.5, rangec / np.where(grey, 1.0, sumc), rangec / np.where(grey, 1.0, 2.0 - maxc - minc))
+    rc, gc, bc = (maxc - r) / safe_range, (maxc - g) / safe_range, (maxc - b) / safe_range
+    h = np.select([r == maxc, g == maxc], [bc - gc, 2.0 + rc - bc], default=4.0 + gc - rc)
+    h = (h / 6.0) % 1.0
+    return np.where(grey, 0.0, h), l, np.where(grey, 0.0, s)
+
+
+def _hls_to_rgb(h, l, s):
+    # Vectorized colorsys.hls_to_rgb
+    m2 = np.where(l <= 0.5, l * (1.0 + s), l + s - (l * s))
+    m1 = 2.0 * l - m2
+
+    def channel(hue):
+        hue = hue % 1.0
+        return np.select([hue < 1/6, hue < 0.5, hue < 2/3],
+                         [m1 + (m2 - m1) * hue * 6.0, m2, m1 + (m2 - m1) * (2/3 - hue) * 6.0], default=m1)
+
+    rgb = np.column_stack([channel(h + 1/3), channel(h), channel(h - 1/3)])
+    return np.where((s == 0)[:, None], l[:, None], rgb)
+
+
+def _to_hex(rgb):
+    # Same rounding as matplotlib.colors.rgb2hex
+    channels = np.round(rgb * 255).astype(int)
+    return np.array(['#%02x%02x%02x' % tuple(c) for c in channels])
+
+
+def marker_colors(delay_percentages, colormap='RdYlGn', saturation_factor=1.5):
+    """Marker color of every airport: exponential normalization, inverted colormap, saturated.
+
+    Args:
+        delay_percentages (array): Percentage of departure delays per airport
+        colormap (str): Matplotlib colormap name
+        saturation_factor (float): Saturation multiplier (capped at 1)
+
+    Returns:
+        ndarray: Hex color strings
+    """
+    values = np.asarray(delay_percentages, dtype=np.float64)
+    normalized = exponential_normalization(values, values.min(), values.max())
+    rgb = colormaps[colormap](1 - normalized)[:, :3]  # Invert scale for color mapping
+    # The colors go through hex (8 bits per channel) before the saturation step
+    rgb = np.round(rgb * 255) / 255
+    h, l, s = _rgb_to_hls(rgb)
+    return _to_hex(_hls_to_rgb(h, l, np.minimum(1, s * saturation_factor)))
+
+
+@st.cache_resource(show_spinner=False)
+def airport_names(_df_airport_info, data_key):
+    """Airport name per ICAO code (first occurrence), looked up once per dataset version."""
+    return (_df_airport_info[['origin.code_icao', 'origin_airport_name']]
+            .drop_duplicates('origin.code_icao')
+            .astype(str)
+            .set_index('origin.code_icao')['origin_airport_name'])
+
+
+def marker_table(df, airport_names):
+    """Location, radius, color, tooltip and popup text of every airport marker, in one pass.
+
+    Args:
+        df (DataFrame): Per-airport delays ('origin.code_icao', coordinates, 'Number of Flights',
+            'Percentage of Departure Delays')
+        airport_names (Series): Airport name per ICAO code (tooltips)
+
+    Returns:
+        DataFrame: One row per airport
+    """
+    icao = df['origin.code_icao'].astype(str)
+    percentage = df['Percentage of Departure Delays'].to_numpy(dtype=np.float64)
+    flights = df['Number of Flights'].to_numpy()
+    return pd.DataFrame({
+        'icao': icao.to_numpy(),
+        'lat': df['origin_airport_lat'].to_numpy(dtype=np.float64),
+        'lon': df['origin_airport_lon'].to_numpy(dtype=np.float64),
+        'radius': flights / 500,  # Adjust dot size
+        'color': marker_colors(percentage),
+        'tooltip': icao.map(airport_names).to_numpy(),
+        'percentage': percentage,
+        'flights': flights,
+    })
+
+
+def no_data_markers(airports, exclude):
+    """Grey markers for the airports of the airport list that have no departures in the dataset.
+
+    Args:
+        airports (DataFrame): Output of ``streamlit_airport_index.load_airport_locations``
+        exclude (array): ICAO codes that already have a delay marker
+
+    Returns:
+        DataFrame: Same columns as ``marker_table``
+    """
+    airports = airports[~airports['origin.code_icao'].isin(exclude)]
+    return pd.DataFrame({
+        'icao': airports['origin.code_icao'].to_numpy(dtype=str),
+        'lat': airports['origin_airport_lat'].to_numpy(dtype=np.float64),
+        'lon': airports['origin_airport_lon'].to_numpy(dtype=np.float64),
+        'radius': float(NO_DATA_RADIUS),
+        'color': NO_DATA_COLOR,
+        'tooltip': airports['origin_airport_name'].to_numpy(dtype=str),
+        'percentage': np.nan,
+        'flights': 0,
+    })
+
+
+def _popup(marker, html_popup):
+    if np.isnan(marker.percentage):
+        return f"{marker.icao}\nNo departures in the dataset"
+    if not html_popup:
+        return f"{marker.icao}\n{marker.percentage:.1f}% delayed\n{marker.flights} flights"
+    popup_html = f"""
+            <div style="font-family: Arial, sans-serif; font-size: 14px;">
+                <strong>{marker.icao}</strong><br>
+                <span style="color: #d9534f;">{marker.percentage:.1f}% delayed</span><br>
+                <span>{marker.flights} flights</span>
+            </div>
+            """
+    return folium.Popup(popup_html, max_width=250)
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+@sp.cache_miss('delay_map')
+def _cached_delay_map(_markers, data_version, html_popup, clustered):
+    m = folium.Map(location=MAP_LOCATION, zoom_start=MAP_ZOOM, tiles=MAP_TILES)
+    # Clustered mode: nearby markers merge into one bubble until zoomed in, so the browser only
+    # draws a few dozen shapes however many airports are loaded
+    layer = MarkerCluster(disable_clustering_at_zoom=6).add_to(m) if clustered else m
+    for marker in _markers.itertuples(index=False):
+        folium.CircleMarker(
+            location=(marker.lat, marker.lon),
+            radius=marker.radius,
+            color=marker.color,
+            weight=1,
+            fill=True,
+            fill_color=marker.color,
+            fill_opacity=0.6,
+            tooltip=marker.tooltip,
+            popup=_popup(marker, html_popup)
+        ).add_to(layer)
+    return m
+
+
+@sp.timed('delay_map')
+def delay_map(df, df_airport_info, html_popup=False, all_airports=None):
+    """Folium map of airport delays, built once per data version and popup style.
+
+    Args:
+        df (DataFrame): Per-airport delays (see ``marker_table``)
+        df_airport_info (DataFrame): Table with 'origin.code_icao' and 'origin_airport_name'
+        html_popup (bool): Styled HTML popups (Prediction page) instead of plain text (Delay Map page)
+        all_airports (DataFrame): Clustered mode: also show these airports (see
+            ``streamlit_airport_index.load_airport_locations``) and cluster every marker
+
+    Returns:
+        folium.Map: Shared map object, not to be modified by the caller
+    """
+    names = airport_names(df_airport_info, sdl.data_key(df_airport_info))
+    markers = marker_table(df, names)
+    clustered = all_airports is not None
+    if clustered:
+        markers = pd.concat([markers, no_data_markers(all_airports, markers['icao'])], ignore_index=True)
+    data_version = int(pd.util.hash_pandas_object(markers, index=False).sum())
+    return _cached_delay_map(markers, data_version, html_popup, clustered)
@@ -1,8 +1,18 @@
 import plotly.graph_objects as go
 import pandas as pd
 
+import streamlit_perf as sp
+
+
+@sp.timed('departure_delay_prog_for_route_group')
 def departure_delay_prog_for_route_group(df_raw, icao_dep,regionalize=False,routes=[], operators=[], aircraft_types=[]):
     # TODO: Consider regional option, how to visualize. and how to integrate into streamlit
+    df_pivot_weekly, origin_attributes = weekly_departures(df_raw, icao_dep, regionalize, routes, operators, aircraft_types)
+    return plot_weekly_departures(df_pivot_weekly, origin_attributes, icao_dep, regionalize, routes, operators, aircraft_types)
+
+
+def weekly_departures(df_raw, icao_dep, regionalize=False, routes=[], operators=[], aircraft_types=[]):
+    # Weekly delayed / on-time / total departures from the per-flight table, plus the origin attributes of the title
     if regionalize:
         # Extract all rows where the 'origin_region' is the same as the 'origin_region' corresponding to the input 'icao_dep'
         df_filtered = df_raw[df_raw['origin_region'] == df_raw[df_raw['origin.code_icao'] == icao_dep]['origin_region'].iloc[0]]
@@ -30,6 +40,14 @@ def departure_delay_prog_for_route_group(df_raw, icao_dep,regionalize=False,rout
 
     df_pivot_weekly.index = pd.to_datetime(df_pivot_weekly.index)
 
+    origin_attributes = {'origin_region': df_filtered['origin_region'].iloc[0]}
+    if not regionalize:
+        origin_attributes['origin_airport_name'] = df_filtered['origin_airport_name'].iloc[0]
+        origin_attributes['origin_airport_location'] = df_filtered['origin_airport_location'].iloc[0]
+    return df_pivot_weekly, origin_attributes
+
+
+def plot_weekly_departures(df_pivot_weekly, origin_attributes, icao_dep, regionalize=False, routes=[], operators=[], aircraft_types=[]):
     # Initialize Figure
     fig = go.Figure()
 
@@ -44,7 +62,7 @@ def departure_delay_prog_for_route_group(df_raw, icao_dep,regionalize=False,rout
     # Shade in timeframtes of interest with conditionality on 'origin_region' 
     seasonality = ''
     # 'Africa & Middle East': 'Ramadan' -> sandybrown, 0.3 
-    if df_filtered['origin_region'].iloc[0] == 'Africa & Middle East':
+    if origin_attributes['origin_region'] == 'Africa & Middle East':
         seasonality = 'Ramadan Periods'
         # Ramadan 2022
         fig.add_vrect(x0="2022-04-02", x1="2022-05-01", fillcolor="sandybrown", opacity=0.3, layer="below", line_width=0)
@@ -60,7 +78,7 @@ def departure_delay_prog_for_route_group(df_raw, icao_dep,regionalize=False,rout
         fig.add_annotation(x="2022-08-15", y=0, text="Post-Covid Recovery", showarrow=False, font=dict(size=10, color='black'))
 
     # 'Asia Pacific': 'Monsoon' -> mediumseagreen, 0.2
-    elif df_filtered['origin_region'].iloc[0] == 'Asia Pacific':
+    elif origin_attributes['origin_region'] == 'Asia Pacific':
         seasonality = 'Monsoon seasons'
         # Monsoon 2022
         fig.add_vrect(x0="2022-05-15", x1="2022-10-15", fillcolor="mediumseagreen", opacity=0.3, layer="below", line_width=0)
@@ -141,11 +159,11 @@ def departure_delay_prog_for_route_group(df_raw, icao_dep,regionalize=False,rout
     
     # Region Dependent Parameters
     if regionalize:
-        region_name = df_filtered['origin_region'].iloc[0]
+        region_name = origin_attributes['origin_region']
         title_text = f"Weekly Departures in Dataset for {region_name} region<br><sup>Routes: {routes} -- Operators: {operators} -- Aircraft: {aircraft_types}</sup>"
     else:
-        airport_name = df_filtered['origin_airport_name'].iloc[0]
-        airport_location = df_filtered['origin_airport_location'].iloc[0]
+        airport_name = origin_attributes['origin_airport_name']
+        airport_location = origin_attributes['origin_airport_location']
         title_text = f"Weekly Departures in Dataset: {airport_name} ({icao_dep}) - {airport_location}<br><sup>Routes: {routes} -- Operators: {operators} -- Aircraft: {aircraft_types}</sup>"
 
     # Update Layout
@@ -0,0 +1,75 @@
+import os
+import sys
+import json
+import subprocess
+import pandas as pd
+
+STREAMLIT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Modules imported by each page of free_flight_lab_dashboard.py, in import order
+# (Streamlit itself, the navigation menu and streamlit_perf are shared by every page)
+PAGE_MODULES = {
+    'Free Flight Lab': ['plotly.express', 'streamlit_data_loader'],
+    'Delay Map': ['streamlit_folium', 'streamlit_data_loader', 'streamlit_delay_cube', 'streamlit_delay_map'],
+    'Delay Map (airport clicked)': ['streamlit_folium', 'streamlit_data_loader', 'streamlit_delay_cube',
+                                    'streamlit_delay_map', 'streamlit_airport_index', 'sklearn.neighbors'],
+    'Prediction': ['streamlit_folium', 'streamlit_data_loader', 'streamlit_delay_map', 'streamlit_stats_graphs',
+                   'streamlit_metar_parse', 'streamlit_route_index'],
+    'Prediction (live panel)': ['streamlit_folium', 'streamlit_data_loader', 'streamlit_delay_map',
+                                'streamlit_stats_graphs', 'streamlit_metar_parse', 'streamlit_route_index',
+                                'streamlit_airport_index', 'sklearn.neighbors', 'streamlit_live_prediction'],
+    'Contact': [],
+}
+
+# Every page before the imports were moved into the pages
+EAGER_MODULES = ['pandas', 'streamlit_folium', 'streamlit_stats_graphs', 'streamlit_metar_parse',
+                 'streamlit_data_loader', 'streamlit_delay_cube', 'streamlit_delay_map', 'streamlit_airport_index',
+                 'sklearn.neighbors', 'streamlit_route_index', 'streamlit_live_prediction', 'plotly.express']
+
+_TIMER = """
+import sys, time, json, importlib
+sys.path.insert(0, {path!r})
+timings = []
+for module in ['streamlit', 'streamlit_option_menu', 'streamlit_perf'] + {modules!r}:
+    start = time.perf_counter()
+    importlib.import_module(module)
+    timings.append((module, (time.perf_counter() - start) * 1000))
+print(json.dumps(timings))
+"""
+
+
+def page_import_times(modules, repeat=3):
+    """Incremental import time of each module in a fresh interpreter (median of `repeat` runs).
+
+    Args:
+        modules (list): Modules in import order (after streamlit and the menu)
+        repeat (int): Fresh interpreters to time
+
+    Returns:
+        DataFrame: 'module' and 'ms' (time of that import given the previous ones)
+    """
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', _TIMER.format(path=STREAMLIT_DIR, modules=modules)],
+                                capture_output=True, text=True, check=True, cwd=STREAMLIT_DIR).stdout
+        runs.append(pd.DataFrame(json.loads(output.strip().splitlines()[-1]), columns=['module', 'ms']))
+    return pd.concat(runs).groupby('module', sort=False)['ms'].median().reset_index()
+
+
+def import_profile(repeat=3):
+    """Import time breakdown of every page, plus the former eager imports for comparison.
+
+    Returns:
+        DataFrame: 'page', 'module' and 'ms'
+    """
+    pages = dict(PAGE_MODULES, **{'All pages (eager imports)': EAGER_MODULES})
+    frames = [page_import_times(modules, repeat).assign(page=page) for page, modules in pages.items()]
+    return pd.concat(frames)[['page', 'module', 'ms']]
+
+
+if __name__ == '__main__':
+    # Usage: python streamlit/streamlit_import_profile.py [repeat]
+    profile = import_profile(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
+    for page, modules in profile.groupby('page', sort=False):
+        print(f"\n{page}: {modules['ms'].sum():.0f} ms")
+        print(modules[['module', 'ms']].round(0).to_string(index=False))
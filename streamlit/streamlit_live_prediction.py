@@ -0,0 +1,172 @@
+import os
+import sys
+import time
+import functools
+import dataclasses
+import numpy as np
+import joblib
+import avwx
+import streamlit as st
+
+import streamlit_metar_parse as smp
+import streamlit_perf as sp
+
+# The METAR cleaning, flight pre-processing and single-row scorer live with the notebooks
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'notebooks'))
+from metar_cleaning import clean_metar_record
+from preprocessing import add_weather_features
+from fast_predict import compile_pipeline
+from what_if import WhatIfSweeper, AXIS_LABELS, planned_flight
+
+# Trained pipeline saved by FIN_7_Machine_Learning_Training.ipynb
+MODEL_PATH = 'streamlit/streamlit_data/pipeline_rf_rus_model.pkl'
+
+
+@sp.timed('load_predictor')
+@st.cache_resource(show_spinner=False)
+@sp.cache_miss('load_predictor')
+def load_predictor(path=MODEL_PATH):
+    """Trained pipeline compiled for single-row scoring, loaded once per process.
+
+    Returns:
+        FastPredictor: See fast_predict.compile_pipeline, or None if the model file is not deployed
+    """
+    if not os.path.exists(path):
+        return None
+    return compile_pipeline(joblib.load(path))
+
+
+@sp.timed('load_sweeper')
+@st.cache_resource(show_spinner=False)
+@sp.cache_miss('load_sweeper')
+def load_sweeper(path=MODEL_PATH):
+    """What-if weather sweeper of the trained pipeline (its memo is shared by all sessions).
+
+    Returns:
+        WhatIfSweeper: See what_if.WhatIfSweeper, or None if the model file is not deployed
+    """
+    predictor = load_predictor(path)
+    if predictor is None:
+        return None
+    return WhatIfSweeper(predictor.pipeline)
+
+
+@st.cache_data(show_spinner=False, ttl=600)
+def current_metar(icao):
+    """Latest METAR of a station (fetched at most every 10 minutes), or None if unavailable."""
+    report = avwx.Metar(icao)
+    try:
+        report.update()
+    except Exception:
+        return None
+    return report.raw
+
+
+@st.cache_resource(show_spinner=False, max_entries=256)
+def route_fleet(_df_names_routes, data_key, route):
+    """Operators and aircraft types flying a route, most frequent first.
+
+    Args:
+        _df_names_routes (DataFrame): Delay Map flights with 'ICAO_route', 'operator_icao' and
+            'aircraft_type' (not hashed by Streamlit)
+        data_key: Identifies the dataset version (see streamlit_data_loader.data_key)
+        route (str): 'ORIG-DEST' ICAO route
+
+    Returns:
+        tuple: (operators, aircraft types)
+    """
+    flights = _df_names_routes[_df_names_routes['ICAO_route'] == route]
+    return (flights['operator_icao'].astype(str).value_counts().index.tolist(),
+            flights['aircraft_type'].astype(str).value_counts().index.tolist())
+
+
+@functools.lru_cache(maxsize=256)
+def flight_features(route, departure_time, operator, aircraft_type, filed_ete_minutes):
+    """Flight columns of a planned departure (see what_if.planned_flight), memoized.
+
+    Changing only the METAR does not derive them again (do not modify the result).
+
+    Returns:
+        DataFrame: One row, output of preprocessing.prepare_flights
+    """
+    return planned_flight(route, departure_time, operator, aircraft_type, filed_ete_minutes)
+
+
+@sp.timed('live_prediction')
+def live_prediction(predictor, metar_string, route, departure_time, operator, aircraft_type, filed_ete_minutes):
+    """Probability of a departure delay for a planned flight and a raw departure METAR.
+
+    The METAR is decoded with streamlit_metar_parse (memoized), cleaned with
+    metar_cleaning.clean_metar_record, joined to the flight features and scored by the FastPredictor.
+
+    Args:
+        predictor (FastPredictor): Output of ``load_predictor``
+        metar_string (str): Raw METAR of the origin airport
+        route, departure_time, operator, aircraft_type, filed_ete_minutes: See ``what_if.planned_flight``
+
+    Returns:
+        tuple: (probability of a delay, milliseconds spent per step)
+
+    Raises:
+        ValueError: If the METAR is not from the origin airport or cannot be used by the model
+    """
+    timings = {}
+    start = time.perf_counter()
+
+    metar_string = metar_string.strip()
+    if metar_string.split()[0] != route.split('-')[0]:
+        raise ValueError(f"The METAR is not from the origin airport {route.split('-')[0]}")
+    record = dataclasses.asdict(smp.metar_data(metar_string))
+    timings['decode'] = (time.perf_counter() - start) * 1000
+
+    weather = clean_metar_record(record, suffix='_departure')
+    timings['clean'] = (time.perf_counter() - start) * 1000 - sum(timings.values())
+
+    flight = flight_features(route, departure_time, operator, aircraft_type, filed_ete_minutes)
+    row = add_weather_features(flight.assign(**weather)).iloc[0]
+    # Pressure tendencies that were not reported are 0 in the one-hot columns; anything else
+    # missing is imputed by the pipeline
+    features = {name: row.get(name, 0 if name.startswith('pressure_tendency_') else np.nan)
+                for name in predictor.feature_names_in_}
+    timings['features'] = (time.perf_counter() - start) * 1000 - sum(timings.values())
+
+    probability = predictor.predict_proba_one(features)[list(predictor.classes_).index(1)]
+    timings['score'] = (time.perf_counter() - start) * 1000 - sum(timings.values())
+    return float(probability), timings
+
+
+def metar_weather(metar_string):
+    """Cleaned weather of a raw METAR, without suffix (the base weather of a what-if sweep)."""
+    record = dataclasses.asdict(smp.metar_data(metar_string.strip()))
+    return clean_metar_record(record)
+
+
+@sp.timed('what_if_surface')
+def what_if_figure(sweeper, route, context, grid):
+    """Heatmap of the delay probability over a two-axis weather grid.
+
+    Args:
+        sweeper (WhatIfSweeper): Output of ``load_sweeper``
+        route (str): 'ORIG-DEST' ICAO route
+        context (dict): See ``WhatIfSweeper.sweep``
+        grid (tuple): Two axes, see ``what_if.grid_spec``
+
+    Returns:
+        Figure: Plotly heatmap, rows are the first axis
+    """
+    import plotly.graph_objects as go
+
+    surface = sweeper.surface(route, context, grid)
+    (row_axis, _), (column_axis, _) = grid
+    fig = go.Figure(go.Heatmap(
+        z=surface.to_numpy() * 100,
+        x=[f'{value:g}' for value in surface.columns],
+        y=[f'{value:g}' for value in surface.index],
+        colorscale='RdYlGn_r', zmin=0, zmax=100,
+        colorbar=dict(title='Delay (%)'),
+        hovertemplate=f'{AXIS_LABELS[column_axis]}: %{{x}}<br>{AXIS_LABELS[row_axis]}: %{{y}}'
+                      '<br>Probability of Delay: %{z:.1f}%<extra></extra>'))
+    fig.update_layout(xaxis_title=AXIS_LABELS[column_axis], yaxis_title=AXIS_LABELS[row_axis],
+                      xaxis_type='category', yaxis_type='category', height=400,
+                      margin=dict(l=0, r=0, t=30, b=0))
+    return fig
@@ -1,7 +1,29 @@
+import functools
+from concurrent.futures import ThreadPoolExecutor
 import avwx
 
+import streamlit_perf as sp
+
+# Decoded reports kept in memory (shared by every session of the dashboard process)
+METAR_CACHE_SIZE = 4096
+
+# Single background worker for pre-decoding, so route changes never compete with each other
+_predecode_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="metar-predecode")
+
+
+@sp.timed('parse_metar')
 def parse_metar(metar_string):
-    """Convert a METAR string into a user-friendly format."""
+    """Convert a METAR string into a user-friendly format.
+
+    Decoding is memoized: the same report is only parsed once per process.
+    """
+    # Copy, so callers cannot alter the cached entry
+    return dict(_decode_metar(metar_string))
+
+
+@functools.lru_cache(maxsize=METAR_CACHE_SIZE)
+def metar_data(metar_string):
+    """Parsed avwx MetarData of a raw METAR string (memoized, do not modify the result)."""
     # Extract station ICAO code (first part of METAR string)
     station = metar_string.split()[0]
 
@@ -12,7 +34,14 @@ def parse_metar(metar_string):
     report.parse(metar_string)
 
     # Extract attributes correctly
-    data = report.data  # MetarData object
+    return report.data  # MetarData object
+
+
+@functools.lru_cache(maxsize=METAR_CACHE_SIZE)
+@sp.cache_miss('parse_metar')
+def _decode_metar(metar_string):
+    station = metar_string.split()[0]
+    data = metar_data(metar_string)
 
     # Convert units
     def knots_to_kmh(knots):
@@ -37,4 +66,31 @@ def parse_metar(metar_string):
         "💧 Dew Point": f"{data.dewpoint.value}°C ({celsius_to_fahrenheit(data.dewpoint.value)}°F)" if data.dewpoint else "N/A",
         "📉 Pressure": f"{data.altimeter.value} hPa (Standard pressure: 1013 hPa)" if data.altimeter else "N/A",
         "☁️ Clouds": ", ".join([f"{c.repr[:3]} clouds at {int(c.repr[3:])*100} feet" for c in data.clouds]) if data.clouds else "Clear skies",
-    }
\ No newline at end of file
+    }
+
+
+def _predecode(metar_strings):
+    # Decoding ahead of the reruns is not a parse_metar cache miss
+    sp.background_thread()
+    for metar_string in metar_strings:
+        try:
+            _decode_metar(metar_string)
+        except Exception:
+            # Reports avwx cannot parse are reported when selected, as before
+            pass
+
+
+@functools.lru_cache(maxsize=64)
+def predecode_metars(metar_strings):
+    """Decode a batch of METARs in a background thread, warming the parse_metar cache.
+
+    Calling it again with the same batch (e.g. on every rerun while a route is selected) returns
+    the running or finished job instead of starting a new one.
+
+    Args:
+        metar_strings (tuple): Raw METAR strings, e.g. every METAR_departure_ref of a route
+
+    Returns:
+        Future: Completes when the whole batch is decoded
+    """
+    return _predecode_executor.submit(_predecode, metar_strings)
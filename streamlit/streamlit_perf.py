@@ -0,0 +1,273 @@
+import os
+import sys
+import json
+import time
+import inspect
+import logging
+import threading
+import functools
+import contextlib
+import collections
+import tracemalloc
+import weakref
+import streamlit as st
+
+# Developer panel and per-rerun log: set FFL_PERF=1, or set FFL_PERF_QUERY=1 and open the dashboard
+# with ?perf=1 (visitors cannot turn the slow memory tracing on unless the deployment allows it)
+PERF_ENV = 'FFL_PERF'
+PERF_QUERY_ENV = 'FFL_PERF_QUERY'
+PERF_QUERY_PARAM = 'perf'
+
+# JSON lines log of every instrumented rerun (stderr when not set)
+PERF_LOG_ENV = 'FFL_PERF_LOG'
+
+# Reruns shown in the developer panel history
+PANEL_HISTORY = 20
+
+logger = logging.getLogger('free_flight_lab.perf')
+
+# Calls of the timed helpers and executions of their cached bodies, for the whole process
+_calls = collections.Counter()
+_misses = collections.Counter()
+
+# Rerun being instrumented in this script thread (each session reruns in its own thread)
+_local = threading.local()
+
+# Instrumented reruns in progress in any session; tracemalloc stops once there are none. Weak, so
+# a rerun interrupted before finish_rerun (st.stop, a new rerun) leaves with its script thread
+_active = weakref.WeakSet()
+_tracing_lock = threading.Lock()
+
+# True while tracemalloc runs because start_rerun started it (tracing started by anything else,
+# e.g. the render benchmark, is left alone)
+_owns_tracing = False
+
+
+class _Rerun:
+    def __init__(self, page):
+        self.page = page
+        self.started = time.time()
+        self.start = time.perf_counter()
+        self.sections = []
+        self.stack = []
+        self.peak = 0
+        self.calls = collections.Counter()
+        self.misses = collections.Counter()
+
+
+def _env_flag(name):
+    return os.environ.get(name, '') not in ('', '0')
+
+
+def enabled():
+    """True when the developer panel was asked for (FFL_PERF=1, or ?perf=1 if FFL_PERF_QUERY=1)."""
+    if _env_flag(PERF_ENV):
+        return True
+    if not _env_flag(PERF_QUERY_ENV):
+        return False
+    try:
+        return st.query_params.get(PERF_QUERY_PARAM, '0') not in ('', '0')
+    except Exception:
+        # Not running inside a Streamlit script (e.g. the notebooks import the graph helpers)
+        return False
+
+
+def _configure_logger():
+    if logger.handlers:
+        return
+    path = os.environ.get(PERF_LOG_ENV)
+    handler = logging.FileHandler(path) if path else logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def _stop_tracing_when_idle():
+    global _owns_tracing
+    with _tracing_lock:
+        if not _active and _owns_tracing:
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            _owns_tracing = False
+
+
+def start_rerun(page):
+    """Start timing a rerun of the dashboard (no-op unless the developer panel is enabled).
+
+    Memory is traced with tracemalloc while instrumented reruns are running, which makes the
+    dashboard noticeably slower; keep it for development. Tracing is only stopped again if this
+    module started it. tracemalloc traces the whole process,
+    so reruns of other sessions running at the same time add to the memory figures.
+    """
+    previous = getattr(_local, 'rerun', None)
+    _local.rerun = None
+    if previous is not None:
+        # The previous rerun of this thread never reached finish_rerun
+        _active.discard(previous)
+    if not enabled():
+        _stop_tracing_when_idle()
+        return
+    global _owns_tracing
+    rerun = _Rerun(page)
+    with _tracing_lock:
+        _active.add(rerun)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _owns_tracing = True
+        tracemalloc.reset_peak()
+    _configure_logger()
+    _local.rerun = rerun
+
+
+@contextlib.contextmanager
+def section(name):
+    """Time a block of the current rerun, with the peak of the memory allocated inside it.
+
+    Sections can be nested; outside an instrumented rerun this does nothing.
+    """
+    rerun = getattr(_local, 'rerun', None)
+    if rerun is None:
+        yield
+        return
+
+    record = {'section': name, 'depth': len(rerun.stack), 'ms': None, 'peak_kib': None}
+    rerun.sections.append(record)
+    # tracemalloc has a single peak, so every section restarts it and hands its own peak to its parent
+    current, peak = tracemalloc.get_traced_memory()
+    rerun.peak = max(rerun.peak, peak)
+    if rerun.stack:
+        rerun.stack[-1]['child_peak'] = max(rerun.stack[-1]['child_peak'], peak)
+    tracemalloc.reset_peak()
+    frame = {'start_memory': current, 'child_peak': 0}
+    rerun.stack.append(frame)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record['ms'] = (time.perf_counter() - start) * 1000
+        rerun.stack.pop()
+        peak = max(tracemalloc.get_traced_memory()[1], frame['child_peak'])
+        record['peak_kib'] = max(peak - frame['start_memory'], 0) / 1024
+        rerun.peak = max(rerun.peak, peak)
+        if rerun.stack:
+            rerun.stack[-1]['child_peak'] = max(rerun.stack[-1]['child_peak'], peak)
+        tracemalloc.reset_peak()
+
+
+def timed(name, label_arg=None):
+    """Decorator: count the calls of a dashboard helper and time each one as a section.
+
+    Place it above ``st.cache_resource`` (or ``functools.lru_cache``) so cache hits are timed too,
+    and ``cache_miss`` with the same name below it to get the hit rate.
+
+    Args:
+        name (str): Section and cache statistics name
+        label_arg (str): Argument whose value is appended to the section name (e.g. 'metric_title')
+    """
+    def decorate(func):
+        signature = inspect.signature(func) if label_arg else None
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            _calls[name] += 1
+            rerun = getattr(_local, 'rerun', None)
+            if rerun is None:
+                return func(*args, **kwargs)
+            rerun.calls[name] += 1
+            label = name
+            if signature is not None:
+                label = f"{name}: {signature.bind(*args, **kwargs).arguments.get(label_arg)}"
+            with section(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def cache_miss(name):
+    """Decorator for the body of a cached function: counts the calls the cache did not answer."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if getattr(_local, 'background', False):
+                return func(*args, **kwargs)
+            _misses[name] += 1
+            rerun = getattr(_local, 'rerun', None)
+            if rerun is not None:
+                rerun.misses[name] += 1
+            return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def background_thread():
+    """Mark the current thread as a background worker: the cache entries it fills ahead of the
+    reruns are not counted as misses."""
+    _local.background = True
+
+
+def cache_stats():
+    """Calls, cache misses and hit rate of every cached helper since the process started.
+
+    Returns:
+        list: One dict per helper with 'helper', 'calls', 'misses' and 'hit_rate'
+    """
+    return [{'helper': name, 'calls': _calls[name], 'misses': _misses[name],
+             'hit_rate': max(1 - _misses[name] / _calls[name], 0.0) if _calls[name] else None}
+            for name in sorted(_misses)]
+
+
+def finish_rerun():
+    """Log the rerun as one JSON line and show the developer panel.
+
+    Returns:
+        dict: The logged record, or None if the rerun was not instrumented
+    """
+    rerun = getattr(_local, 'rerun', None)
+    _local.rerun = None
+    if rerun is None:
+        return None
+
+    record = {
+        'time': rerun.started,
+        'page': rerun.page,
+        'total_ms': (time.perf_counter() - rerun.start) * 1000,
+        # Process-wide: includes the allocations of concurrent reruns ('concurrent_reruns')
+        'peak_traced_kib': max(rerun.peak, tracemalloc.get_traced_memory()[1]) / 1024,
+        'concurrent_reruns': len(_active) - 1,
+        'sections': rerun.sections,
+        'cache': {name: {'calls': rerun.calls[name], 'misses': rerun.misses[name]}
+                  for name in sorted(set(rerun.calls) | set(rerun.misses))},
+    }
+    _active.discard(rerun)
+    _stop_tracing_when_idle()
+    logger.info(json.dumps(record, default=str))
+    dev_panel(record)
+    return record
+
+
+def dev_panel(record):
+    """Per-rerun breakdown, recent reruns and cache hit rates, at the bottom of the page."""
+    history = st.session_state.setdefault('perf_history', [])
+    history.append({'page': record['page'], 'total_ms': round(record['total_ms'], 1),
+                    'sections_ms': round(sum(s['ms'] for s in record['sections'] if s['depth'] == 0), 1)})
+    del history[:-PANEL_HISTORY]
+
+    with st.expander(f"Performance: {record['total_ms']:.0f} ms for this rerun", expanded=False):
+        st.markdown('##### Sections')
+        # Nested sections are indented with em spaces (plain leading spaces are trimmed)
+        st.dataframe([{'section': '\u2003' * s['depth'] + s['section'],
+                       'ms': round(s['ms'], 1),
+                       'process peak KiB': round(s['peak_kib'], 1)} for s in record['sections']],
+                     use_container_width=True, hide_index=True)
+        st.caption('Memory is traced for the whole process'
+                   + (f", {record['concurrent_reruns']} other rerun(s) ran at the same time"
+                      if record['concurrent_reruns'] else '') + '.')
+        st.markdown('##### Cache hit rates (this rerun / since start)')
+        this_rerun = record['cache']
+        st.dataframe([dict(stats, rerun_calls=this_rerun.get(stats['helper'], {}).get('calls', 0),
+                           rerun_misses=this_rerun.get(stats['helper'], {}).get('misses', 0))
+                      for stats in cache_stats()],
+                     use_container_width=True, hide_index=True)
+        st.markdown(f'##### Last {len(history)} reruns')
+        st.dataframe(history, use_container_width=True, hide_index=True)
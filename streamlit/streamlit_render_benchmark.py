@@ -0,0 +1,323 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+import streamlit as st
+import streamlit_option_menu
+import streamlit_folium
+from streamlit.testing.v1 import AppTest
+
+STREAMLIT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(STREAMLIT_DIR)
+DASHBOARD_PATH = os.path.join(STREAMLIT_DIR, 'free_flight_lab_dashboard.py')
+
+# The synthetic data generator and the dashboard frames of the pipeline benchmark live with the notebooks
+sys.path.insert(0, STREAMLIT_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, 'notebooks'))
+
+import streamlit_data_loader as sdl
+
+AIRPORT = 'LFPO'
+
+# Render-time budgets (median ms of the warm passes) per (page, interaction), and peak traced memory
+# of any interaction in the first (cold) pass; roughly 5x the medians of a laptop (100-300 ms)
+BUDGETS_MS = {
+    ('Free Flight Lab', 'open page'): 1500,
+    ('Delay Map', 'open page'): 1500,
+    ('Delay Map', f'pick {AIRPORT}'): 2000,
+    ('Prediction', 'open page'): 1500,
+    ('Prediction', f'pick {AIRPORT}'): 2000,
+    ('Prediction', 'change route'): 1500,
+    ('Prediction', 'move threshold'): 1500,
+    ('Prediction', 'select METAR'): 1500,
+    ('Contact', 'open page'): 500,
+}
+BUDGET_PEAK_MIB = 1024
+
+# Elements an interaction must render (minimum counts of element types and widget keys): the pages
+# catch their own exceptions and show a fallback message instead, which would otherwise pass
+PREDICTION_ELEMENTS = {'plotly_chart': 3, 'keys': ['selectbox_ICAO_route', 'multiselect_metar']}
+EXPECTED_ELEMENTS = {
+    ('Delay Map', f'pick {AIRPORT}'): {'metric': 4, 'plotly_chart': 1, 'keys': ['multiselect_ICAO_route']},
+    ('Prediction', f'pick {AIRPORT}'): PREDICTION_ELEMENTS,
+    ('Prediction', 'change route'): PREDICTION_ELEMENTS,
+    ('Prediction', 'move threshold'): PREDICTION_ELEMENTS,
+    ('Prediction', 'select METAR'): PREDICTION_ELEMENTS,
+}
+
+# Fallback messages of a failed section, per interaction once an airport is picked (a METAR is only
+# expected once one is selected)
+FALLBACK_MESSAGES = ['Select an airport on the map', 'Select a route', 'No graph available']
+METAR_FALLBACK_MESSAGES = ['Select a METAR', 'Weather Report not available']
+
+
+class _Components:
+    # Custom components do not render headless: the menu returns the page under test and the map
+    # returns the last click of the scenario
+    page = None
+    click = None
+
+
+def _patch_components():
+    streamlit_option_menu.option_menu = lambda *args, **kwargs: _Components.page
+    streamlit_folium.st_folium = lambda *args, **kwargs: _Components.click
+
+
+def _airport_click(data_root, icao=AIRPORT):
+    airports = pd.read_csv(os.path.join(data_root, sdl.DATA_DIR, sdl.DATASETS['depdelays_per_airport'][0]))
+    airport = airports[airports['origin.code_icao'] == icao].iloc[0]
+    return {'last_object_clicked': {'lat': float(airport['origin_airport_lat']),
+                                    'lng': float(airport['origin_airport_lon'])}}
+
+
+def _pick_airport(at, click):
+    _Components.click = click
+
+
+def _change_route(at, click):
+    routes = at.selectbox(key='selectbox_ICAO_route')
+    routes.select_index(1 if len(routes.options) > 1 else 0)
+
+
+def _move_threshold(at, click):
+    next(s for s in at.slider if s.label.startswith('Set Probability Threshold')).set_value(0.7)
+
+
+def _select_metar(at, click):
+    metars = at.selectbox(key='multiselect_metar')
+    metars.select_index(1 if len(metars.options) > 1 else 0)
+
+
+# Pages and the interactions scripted on them, in order (each page starts a new session)
+SCENARIOS = [
+    ('Free Flight Lab', [('open page', None)]),
+    ('Delay Map', [('open page', None), (f'pick {AIRPORT}', _pick_airport)]),
+    ('Prediction', [('open page', None), (f'pick {AIRPORT}', _pick_airport), ('change route', _change_route),
+                    ('move threshold', _move_threshold), ('select METAR', _select_metar)]),
+    ('Contact', [('open page', None)]),
+]
+
+
+def synthetic_dashboard_data(data_root, scale=0.05, seed=42):
+    """Write the four dashboard datasets, built from synthetic flights, under data_root/streamlit/streamlit_data.
+
+    Predicted probabilities are drawn around the true labels (no model is trained), and each test
+    flight gets the last synthetic METAR of its origin before departure.
+
+    Args:
+        data_root (str): Directory the dashboard is run from
+        scale (float): Multiple of the project's 220k-flight dataset
+        seed (int): Random seed of the synthetic data
+
+    Returns:
+        dict: Rows per dataset
+    """
+    from synthetic_data import synthetic_dataset
+    from preprocessing import prepare_flights
+    from pipeline_benchmark import dashboard_frames
+
+    metars, flights = synthetic_dataset(scale=scale, seed=seed)
+    flights = flights.dropna(subset=['scheduled_out', 'ident_icao', 'registration', 'aircraft_type'])
+    prepared = prepare_flights(flights)
+    prepared['route_code'] = prepared['origin.code_icao'] + '-' + prepared['destination.code_icao']
+    delayed = (prepared['departure_delay'] >= 15*60).to_numpy().astype(int)
+
+    # Last 20% of the departures play the test set of FIN_7
+    rng = np.random.default_rng(seed)
+    test = prepared.sort_values('scheduled_out').iloc[int(len(prepared) * 0.8):]
+    y_test = delayed[prepared.index.get_indexer(test.index)]
+    proba = np.clip(rng.beta(2, 5, len(test)) + 0.35 * y_test, 0, 1)
+    df_names_routes, df_ml_results = dashboard_frames(flights, test, y_test, proba)
+
+    reports = metars[['station', 'time.dt', 'raw']].assign(
+        time=pd.to_datetime(metars['time.dt'], utc=True).dt.tz_localize(None)).sort_values('time')
+    departures = pd.DataFrame({'station': test['origin.code_icao'].to_numpy(),
+                               'time': pd.to_datetime(test['scheduled_out'], utc=True).dt.tz_localize(None).to_numpy(),
+                               'row': np.arange(len(test))}).sort_values('time')
+    refs = pd.merge_asof(departures, reports[['station', 'time', 'raw']], on='time', by='station').sort_values('row')
+    df_ml_results['origin.code_icao'] = test['origin.code_icao'].to_numpy()
+    df_ml_results['METAR_departure_ref'] = refs['raw'].to_numpy()
+    df_ml_results['ML_index'] = np.arange(len(df_ml_results))
+    df_ml_results = df_ml_results.dropna(subset=['METAR_departure_ref'])
+
+    # Airport coordinates and city names of the shipped tables, airport names for unknown routes
+    shipped_dir = os.path.join(REPO_DIR, sdl.DATA_DIR)
+    # The shipped CSVs have an unnamed index column, pipeline_runner exports do not
+    shipped_airports = pd.read_csv(os.path.join(shipped_dir, sdl.DATASETS['depdelays_per_airport'][0]))
+    shipped_airports = shipped_airports.drop(columns='Unnamed: 0', errors='ignore')
+    counts = df_names_routes.groupby('origin.code_icao').agg(
+        delayed_count=('departure_delay_binary', lambda x: (x == 'delayed').sum()),
+        num_flights=('departure_delay_binary', 'size')).reset_index()
+    counts['delay_percentage'] = counts['delayed_count'] / counts['num_flights'] * 100
+    df_airports = counts.merge(shipped_airports[['origin.code_icao', 'origin_airport_lat', 'origin_airport_lon']])
+    df_airports = df_airports[['origin.code_icao', 'delayed_count', 'num_flights', 'origin_airport_lat',
+                               'origin_airport_lon', 'delay_percentage']]
+
+    shipped_cities = pd.read_csv(os.path.join(shipped_dir, sdl.DATASETS['route_cities'][0]))
+    shipped_cities = shipped_cities.drop(columns='Unnamed: 0', errors='ignore')
+    routes = df_names_routes.drop_duplicates('ICAO_route')
+    df_route_cities = pd.DataFrame({'route_code': routes['ICAO_route'].to_numpy(),
+                                    'origin': routes['origin.name'].to_numpy(),
+                                    'destination': routes['destination.name'].to_numpy(),
+                                    'origin.icao_code': routes['origin.code_icao'].to_numpy()})
+    df_route_cities = pd.concat([shipped_cities, df_route_cities[~df_route_cities['route_code'].isin(shipped_cities['route_code'])]
+                                 .assign(route_cities=lambda d: d['origin'] + ' - ' + d['destination'])],
+                                ignore_index=True)
+
+    data_dir = os.path.join(data_root, sdl.DATA_DIR)
+    os.makedirs(data_dir, exist_ok=True)
+    tables = {'depdelays_per_airport': df_airports, 'names_routes': df_names_routes,
+              'ml_results': df_ml_results, 'route_cities': df_route_cities}
+    for name, table in tables.items():
+        table.to_csv(os.path.join(data_dir, sdl.DATASETS[name][0]), index=False)
+    return {name: len(table) for name, table in tables.items()}
+
+
+def _link_assets(data_root):
+    # Images, songs, the airport list and the trained model, as in the repository
+    for path in ['streamlit/streamlit_img', 'streamlit/streamlit_songs', 'example_data',
+                 'streamlit/streamlit_data/pipeline_rf_rus_model.pkl']:
+        source, target = os.path.join(REPO_DIR, path), os.path.join(data_root, path)
+        if not os.path.exists(source) or os.path.exists(target):
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            os.symlink(source, target)
+        except OSError:
+            # No symlinks (e.g. Windows without developer mode)
+            shutil.copytree(source, target) if os.path.isdir(source) else shutil.copy2(source, target)
+
+
+def _page_problems(at, page, interaction):
+    """Expected elements missing from a rendered interaction and fallback messages it shows."""
+    expected = EXPECTED_ELEMENTS.get((page, interaction))
+    if expected is None:
+        return []
+    problems = [f"{len(at.get(element))} {element} elements, expected {count}"
+                for element, count in expected.items() if element != 'keys' and len(at.get(element)) < count]
+    keys = {widget.key for widget in list(at.selectbox) + list(at.multiselect)}
+    problems += [f"no '{key}' widget" for key in expected.get('keys', []) if key not in keys]
+    fallbacks = FALLBACK_MESSAGES + (METAR_FALLBACK_MESSAGES if interaction == 'select METAR' else [])
+    shown = {message for message in fallbacks for text in at.markdown if message in text.value}
+    problems += [f"shows '{message}...'" for message in sorted(shown)]
+    return problems
+
+
+def _run_pass(data_root, traced):
+    click = _airport_click(data_root)
+    rows = []
+    for page, interactions in SCENARIOS:
+        _Components.page, _Components.click = page, None
+        at = AppTest.from_file(DASHBOARD_PATH, default_timeout=300)
+        for interaction, action in interactions:
+            if action is not None:
+                action(at, click)
+            if traced:
+                tracemalloc.start()
+            start = time.perf_counter()
+            at.run()
+            ms = (time.perf_counter() - start) * 1000
+            peak_mib = None
+            if traced:
+                peak_mib = tracemalloc.get_traced_memory()[1] / 2**20
+                tracemalloc.stop()
+            errors = [str(e.value) for e in at.exception] + _page_problems(at, page, interaction)
+            rows.append({'page': page, 'interaction': interaction, 'ms': ms, 'peak_mib': peak_mib,
+                         'errors': '; '.join(errors)})
+    return pd.DataFrame(rows)
+
+
+def render_benchmark(data_root, repeat=3):
+    """Render time and peak memory of every scripted interaction, with the dashboard run from data_root.
+
+    The first pass starts from empty caches and traces memory (tracemalloc); the warm passes after it
+    are timed without tracing.
+
+    Args:
+        data_root (str): Directory containing streamlit/streamlit_data (the repository, or a synthetic copy)
+        repeat (int): Warm passes to take the median time of
+
+    Returns:
+        DataFrame: 'page', 'interaction', 'ms' (median of the warm passes), 'cold_ms' (first pass,
+            traced), 'peak_mib' and 'errors' (exceptions, missing elements and fallback messages,
+            see EXPECTED_ELEMENTS)
+    """
+    _patch_components()
+    working_dir = os.getcwd()
+    os.chdir(data_root)
+    try:
+        # The caches are per process; start every dataset from scratch
+        st.cache_resource.clear()
+        st.cache_data.clear()
+        cold = _run_pass(data_root, traced=True)
+        warm = pd.concat([_run_pass(data_root, traced=False) for _ in range(repeat)])
+    finally:
+        os.chdir(working_dir)
+
+    keys = ['page', 'interaction']
+    medians = warm.groupby(keys, sort=False)['ms'].median().reset_index()
+    errors = pd.concat([cold, warm]).groupby(keys, sort=False)['errors'].agg(lambda e: '; '.join(sorted(set(e) - {''})))
+    report = medians.merge(cold[keys + ['ms', 'peak_mib']].rename(columns={'ms': 'cold_ms'}), on=keys)
+    return report.merge(errors.reset_index(), on=keys)
+
+
+def over_budget(report, budgets_ms=BUDGETS_MS, budget_peak_mib=BUDGET_PEAK_MIB, budget_scale=1.0):
+    """Rows of a render_benchmark report that exceed their budget, failed to render or have no
+    memory figure (a missing or zero peak means the tracing was stopped, not a cheap interaction)."""
+    budget = [budgets_ms.get((page, interaction), np.inf) * budget_scale
+              for page, interaction in zip(report['page'], report['interaction'])]
+    report = report.assign(budget_ms=budget)
+    peak = pd.to_numeric(report['peak_mib'], errors='coerce')
+    return report[(report['ms'] > report['budget_ms']) | (peak > budget_peak_mib * budget_scale)
+                  | peak.isna() | (peak <= 0) | (report['errors'] != '')]
+
+
+if __name__ == '__main__':
+    # Usage: python streamlit/streamlit_render_benchmark.py [--datasets shipped synthetic] [--synthetic-scale 0.05]
+    parser = argparse.ArgumentParser(description='Time the dashboard pages headless and check them against budgets.')
+    parser.add_argument('--datasets', nargs='+', default=['shipped', 'synthetic'], choices=['shipped', 'synthetic'])
+    parser.add_argument('--synthetic-scale', type=float, default=0.05,
+                        help='multiple of the 220k-flight project dataset')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--budget-scale', type=float, default=1.0, help='multiplies every budget (slow machines)')
+    parser.add_argument('--output', default=None, help='CSV of the full report')
+    args = parser.parse_args()
+
+    reports = []
+    for dataset in args.datasets:
+        if dataset == 'shipped':
+            missing = [csv for csv, _ in sdl.DATASETS.values() if not os.path.exists(os.path.join(REPO_DIR, sdl.DATA_DIR, csv))]
+            if missing:
+                print(f"Skipping the shipped data, missing from {sdl.DATA_DIR}: {', '.join(missing)}")
+                continue
+            report = render_benchmark(REPO_DIR, args.repeat)
+        else:
+            data_root = tempfile.mkdtemp(prefix='ffl_render_benchmark_')
+            try:
+                rows = synthetic_dashboard_data(data_root, scale=args.synthetic_scale)
+                _link_assets(data_root)
+                print(f"Synthetic data (scale {args.synthetic_scale}): {rows}")
+                report = render_benchmark(data_root, args.repeat)
+            finally:
+                shutil.rmtree(data_root, ignore_errors=True)
+        reports.append(report.assign(dataset=dataset))
+        print(f"\n{dataset}:")
+        print(reports[-1].drop(columns='dataset').round(1).to_string(index=False))
+
+    if not reports:
+        sys.exit("No dataset to benchmark")
+    report = pd.concat(reports, ignore_index=True)
+    if args.output:
+        report.to_csv(args.output, index=False)
+
+    failures = over_budget(report, budget_scale=args.budget_scale)
+    if len(failures):
+        print("\nOver budget:")
+        print(failures.round(1).to_string(index=False))
+        sys.exit(1)
+    print("\nAll interactions within budget")
@@ -0,0 +1,54 @@
+import streamlit as st
+import numpy as np
+import pandas as pd
+
+import streamlit_perf as sp
+
+
+@sp.timed('build_metar_index')
+@st.cache_resource(show_spinner=False)
+@sp.cache_miss('build_metar_index')
+def build_metar_index(_df_raw, data_key):
+    """Per-route METAR references and ML_index positions of the ML results, built once.
+
+    Args:
+        _df_raw (DataFrame): ML results with 'route_code', 'METAR_departure_ref' and 'ML_index'
+            (not hashed by Streamlit)
+        data_key: Identifies the ML results version the index is built for
+
+    Returns:
+        dict: 'routes': route -> {METAR reference: row position}, references in order of first
+            appearance and positions of their last row (like building a dict from the rows);
+            'ml_positions': row position of every ML_index (first row, -1 where absent)
+    """
+    rows = pd.DataFrame({
+        'route': _df_raw['route_code'].astype(str).to_numpy(),
+        'metar': _df_raw['METAR_departure_ref'].to_numpy(),
+        'position': np.arange(len(_df_raw)),
+    })
+    # Groups come out in order of first appearance, each with the position of its last row
+    last_rows = rows.groupby(['route', 'metar'], sort=False)['position'].last().reset_index()
+    routes = {route: dict(zip(group['metar'], group['position'].tolist()))
+              for route, group in last_rows.groupby('route', sort=False)}
+
+    # First row of every ML_index (np.unique returns the position of each value's first occurrence)
+    ml_index = _df_raw['ML_index'].to_numpy(dtype=np.int64)
+    values, first_rows = np.unique(ml_index, return_index=True)
+    first_rows = first_rows[values >= 0]
+    values = values[values >= 0]
+    ml_positions = np.full(values[-1] + 1 if len(values) else 0, -1, dtype=np.int64)
+    ml_positions[values] = first_rows
+    return {'routes': routes, 'ml_positions': ml_positions}
+
+
+def route_metars(index, route):
+    """METAR reference -> row position for every departure of a route (empty if unknown)."""
+    return index['routes'].get(str(route), {})
+
+
+def ml_position(index, ml_index):
+    """Row position of an ML_index, or None if it is not in the results."""
+    if ml_index is None or not 0 <= ml_index < len(index['ml_positions']):
+        return None
+    position = index['ml_positions'][ml_index]
+    return None if position < 0 else int(position)
@@ -1,61 +1,139 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
-import plotly.express as px
 
+import streamlit_perf as sp
+import streamlit_data_loader as sdl
+
+# Histogram bins of the predicted probabilities (20 bins of 0.05)
+PROBABILITY_BINS = np.linspace(0, 1, 21)
+
+# Index entry of a route without ML results (no probabilities, all counts 0)
+_NO_FLIGHTS = (np.empty(0), np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64))
+
+
+@st.cache_resource(show_spinner=False)
+def build_confusion_index(_df_raw, data_key):
+    """Per-route sorted probabilities with cumulative delayed / on-time counts, built once.
+
+    For a threshold t, the flights predicted on-time are the first searchsorted(t) of the route,
+    so TP/FP/TN/FN at any threshold are two array lookups.
+
+    Args:
+        _df_raw (DataFrame): ML results with 'route_code', 'true_label' and 'predicted_prob_class_1'
+            (not hashed by Streamlit)
+        data_key: Identifies the ML results version the index is built for
+
+    Returns:
+        dict: route -> (sorted probabilities, cumulative delayed count, cumulative on-time count);
+            the cumulative arrays start at 0 and have one more element than the probabilities
+    """
+    routes, codes = np.unique(_df_raw['route_code'].astype(str).to_numpy(), return_inverse=True)
+    probabilities = _df_raw['predicted_prob_class_1'].to_numpy(dtype=np.float64)
+    labels = _df_raw['true_label'].to_numpy(dtype=np.int64)
+
+    # Sort by route, then by probability, and slice each route out of the sorted arrays
+    order = np.lexsort((probabilities, codes))
+    probabilities, labels, codes = probabilities[order], labels[order], codes[order]
+    bounds = np.searchsorted(codes, np.arange(len(routes) + 1))
+
+    index = {}
+    for i, route in enumerate(routes):
+        route_labels = labels[bounds[i]:bounds[i + 1]]
+        cum_delayed = np.concatenate([[0], np.cumsum(route_labels == 1)])
+        cum_ontime = np.concatenate([[0], np.cumsum(route_labels == 0)])
+        index[route] = (probabilities[bounds[i]:bounds[i + 1]], cum_delayed, cum_ontime)
+    return index
+
+
+def confusion_counts(index, route, threshold):
+    """TP, FP, TN, FN of a route when flights with probability >= threshold are predicted delayed.
+
+    A route without ML results has all four counts 0.
+    """
+    probabilities, cum_delayed, cum_ontime = index.get(str(route), _NO_FLIGHTS)
+    k = np.searchsorted(probabilities, threshold, side='left')
+    FN, TN = int(cum_delayed[k]), int(cum_ontime[k])
+    TP, FP = int(cum_delayed[-1]) - FN, int(cum_ontime[-1]) - TN
+    return TP, FP, TN, FN
+
+
+def probability_histogram(index, route, threshold, bins=PROBABILITY_BINS):
+    """Flights per probability bin, split into predicted on-time (< threshold) and delayed.
+
+    A route without ML results has empty bins.
+    """
+    probabilities = index.get(str(route), _NO_FLIGHTS)[0]
+    below_edge = np.searchsorted(probabilities, bins, side='left')
+    # The last bin includes probability 1.0
+    below_edge[-1] = len(probabilities)
+    below_threshold = np.searchsorted(probabilities, np.minimum(bins, threshold), side='left')
+    total = np.diff(below_edge)
+    ontime = np.diff(below_threshold)
+    return ontime, total - ontime
+
+
+@sp.timed('streamlit_prediction_stats')
 def streamlit_prediction_stats(df_raw, route, threshold):
-    # Filter the dataframe for the given route
-    df_route = df_raw[df_raw['route_code'] == route].copy()
+    # The three calls per rerun (stats, histogram, pie charts) share one cached result
+    return _prediction_stats(df_raw, sdl.data_key(df_raw), route, threshold)
 
-    # Dynamically classify predictions based on the slider threshold
-    df_route['Prediction'] = df_route['predicted_prob_class_1'].apply(
-        lambda x: 'On-Time' if x < threshold else 'Delayed'
-    )
 
-    # Recalculate TP, FP, TN, FN based on the new threshold
-    df_route['TP_dynamic'] = (df_route['true_label'] == 1) & (df_route['predicted_prob_class_1'] >= threshold)
-    df_route['FP_dynamic'] = (df_route['true_label'] == 0) & (df_route['predicted_prob_class_1'] >= threshold)
-    df_route['TN_dynamic'] = (df_route['true_label'] == 0) & (df_route['predicted_prob_class_1'] < threshold)
-    df_route['FN_dynamic'] = (df_route['true_label'] == 1) & (df_route['predicted_prob_class_1'] < threshold)
+@st.cache_resource(show_spinner=False, max_entries=256)
+@sp.cache_miss('streamlit_prediction_stats')
+def _prediction_stats(_df_raw, data_key, route, threshold):
+    """Route stats, histogram and pie charts at a threshold, cached across reruns and sessions.
 
-    # Sum up dynamic TP, FP, TN, FN
-    TP = df_route['TP_dynamic'].sum()
-    FP = df_route['FP_dynamic'].sum()
-    TN = df_route['TN_dynamic'].sum()
-    FN = df_route['FN_dynamic'].sum()
+    The returned DataFrame and figures are shared by every caller of the cache entry, so callers
+    must not modify them in place (copy or rename into a new object first).
+    """
+    index = build_confusion_index(_df_raw, data_key)
+
+    # TP, FP, TN, FN at the slider threshold from the confusion-count index
+    TP, FP, TN, FN = confusion_counts(index, route, threshold)
+    total_flights = TP + FP + TN + FN
+    total_delayed = TP + FN
 
     # Calculate precision and recall
-    precision = df_route['TP'].sum() / (df_route['TP'].sum() + df_route['FP'].sum())
-    recall = df_route['TP'].sum() / (df_route['TP'].sum() + df_route['FN'].sum())
+    precision = TP / (TP + FP) if TP + FP > 0 else np.nan
+    recall = TP / (TP + FN) if TP + FN > 0 else np.nan
+
+    # Shares of all the route's flights (NaN for a route without ML results)
+    def share(count):
+        return count / total_flights if total_flights > 0 else np.nan
 
-    # Calculate accuracy dynamically
-        # Create a dataframe with the prediction stats for the given route
+    # Create a dataframe with the prediction stats for the given route
     df_route_stats = pd.DataFrame({
         'route': [route],
-        'total_flights': [df_route.shape[0]],
-        'total_delayed': [df_route['true_label'].sum()],
-        'total_ontime': [df_route['true_label'].count() - df_route['true_label'].sum()],
-        'percent_delayed': [df_route['true_label'].sum() / df_route['true_label'].count()],
-        'total_FP': [df_route['FP'].sum()],
-        'total_FN': [df_route['FN'].sum()],
-        'total_TP': [df_route['TP'].sum()],
-        'total_TN': [df_route['TN'].sum()],
-        'FP_rate': [df_route['FP'].sum() / df_route['true_label'].count()],
-        'FN_rate': [df_route['FN'].sum() / df_route['true_label'].count()],
-        'TP_rate': [df_route['TP'].sum() / df_route['true_label'].count()],
-        'TN_rate': [df_route['TN'].sum() / df_route['true_label'].count()],
-        'accuracy': [(df_route['TP'].sum() + df_route['TN'].sum()) / df_route['true_label'].count()],
+        'total_flights': [total_flights],
+        'total_delayed': [total_delayed],
+        'total_ontime': [total_flights - total_delayed],
+        'percent_delayed': [share(total_delayed)],
+        'total_FP': [FP],
+        'total_FN': [FN],
+        'total_TP': [TP],
+        'total_TN': [TN],
+        'FP_rate': [share(FP)],
+        'FN_rate': [share(FN)],
+        'TP_rate': [share(TP)],
+        'TN_rate': [share(TN)],
+        'accuracy': [share(TP + TN)],
         'precision': [precision],
         'recall': [recall],
         'f1_score': [2 * (precision * recall) / (precision + recall)]
     })
 
-    # Plotly Histogram
-    fig_hist = px.histogram(df_route, 
-                             x='predicted_prob_class_1', 
-                             nbins=20, 
-                             color='Prediction',
-                             color_discrete_map={'On-Time': 'cornflowerblue', 'Delayed': 'crimson'})
+    # Histogram of the predicted probabilities from the precomputed bin counts
+    ontime_counts, delayed_counts = probability_histogram(index, route, threshold)
+    bin_centers = (PROBABILITY_BINS[:-1] + PROBABILITY_BINS[1:]) / 2
+    bin_width = PROBABILITY_BINS[1] - PROBABILITY_BINS[0]
+    fig_hist = go.Figure()
+    fig_hist.add_trace(go.Bar(x=bin_centers, y=ontime_counts, width=bin_width, name='On-Time',
+                              marker_color='cornflowerblue'))
+    fig_hist.add_trace(go.Bar(x=bin_centers, y=delayed_counts, width=bin_width, name='Delayed',
+                              marker_color='crimson'))
+    fig_hist.update_layout(barmode='stack', bargap=0, legend_title_text='Prediction')
     fig_hist.update_xaxes(title_text='Probability of Delay', range=[0, 1])
     fig_hist.update_yaxes(title_text=f'No. of Predictions Made')
 